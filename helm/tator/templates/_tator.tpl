@@ -131,6 +131,8 @@ spec:
               {{- end }}
             - name: SCRATCH_STORAGE_CLASS
               value: {{ .Values.scratchStorageClass | default "nfs-client" | quote }}
+            - name: RENDER_MAX_TOTAL
+              value: {{ mul (.Values.renderWorkers | default 4) (.Values.renderReplicas | default 1) | quote }}
             {{- if hasKey .Values "slackToken" }}
             - name: TATOR_SLACK_TOKEN
               valueFrom:
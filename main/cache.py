@@ -2,6 +2,7 @@ import redis
 import json
 import os
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -98,7 +99,240 @@ class TatorCache:
         else:
             jobs = []
         return jobs
-            
+
+    def update_job(self, uid, fields):
+        """ Updates fields of a job stored with `set_job`. Used by jobs that report
+            their progress through the cache rather than through argo. The update is
+            not atomic, so only the process running the job should call this; other
+            processes request cancellation with `cancel_job`.
+        """
+        jobs = self.get_jobs_by_uid(uid)
+        if jobs is None:
+            raise ValueError(f"Job {uid} not found in cache!")
+        job = {**jobs[0], **fields}
+        self.rds.hset('jobs', uid, json.dumps(job))
+        return job
+
+    def cancel_job(self, uid):
+        """ Requests cancellation of a job that reports its progress through the
+            cache. The job checks the request with `job_cancelled`.
+        """
+        self.rds.set(f'job_cancel_{uid}', 1)
+
+    def job_cancelled(self, uid):
+        """ Returns whether cancellation of a job was requested.
+        """
+        return self.rds.exists(f'job_cancel_{uid}') > 0
+
+    def clear_job_cancel(self, uid):
+        """ Removes a cancellation request once a job has stopped.
+        """
+        self.rds.delete(f'job_cancel_{uid}')
+
+    def push_import(self, uid):
+        """ Queues an annotation import job for the import worker.
+        """
+        self.rds.rpush('imports', uid)
+
+    def pop_import(self, timeout=0):
+        """ Waits for an annotation import job and returns its UID, or None if
+            the timeout expires.
+        """
+        val = self.rds.blpop('imports', timeout=timeout)
+        if val:
+            val = val[1].decode()
+        return val
+
+    def get_snapshot_generation(self, media_id):
+        """ Returns the number of times annotation snapshots of a media have been
+            invalidated.
+        """
+        val = self.rds.get(f'snapshot_gen_{media_id}')
+        return int(val) if val else 0
+
+    def invalidate_snapshots(self, media_ids):
+        """ Invalidates annotation snapshots of the given media.
+        """
+        pipe = self.rds.pipeline()
+        for media_id in media_ids:
+            pipe.incr(f'snapshot_gen_{media_id}')
+        pipe.execute()
+
+    def get_snapshot(self, media_id, version):
+        """ Retrieves the record of an annotation snapshot, or None if it does not
+            exist or has been invalidated.
+        """
+        val = self.rds.hget(f'snapshots_{media_id}', version)
+        if val is None:
+            return None
+        record = json.loads(val.decode())
+        if record['generation'] != self.get_snapshot_generation(media_id):
+            return None
+        return record
+
+    def set_snapshot(self, media_id, version, record, retention):
+        """ Stores the record of an annotation snapshot. The record must include the
+            snapshot generation read before the snapshot was built. The object of a
+            replaced record is retired, and returned by `pop_retired_snapshots` once
+            `retention` seconds have passed.
+        """
+        script = self.rds.register_script("""
+            local old = redis.call('hget', KEYS[1], ARGV[1])
+            redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+            return old
+        """)
+        old = script(keys=[f'snapshots_{media_id}'], args=[version, json.dumps(record)])
+        if old is not None:
+            old_key = json.loads(old.decode())['key']
+            if old_key != record['key']:
+                self.rds.zadd(f'snapshots_retired_{media_id}',
+                              {old_key: time.time() + retention})
+
+    def pop_retired_snapshots(self, media_id):
+        """ Removes and returns object keys of retired annotation snapshots of a media
+            whose retention has passed.
+        """
+        key = f'snapshots_retired_{media_id}'
+        now = time.time()
+        pipe = self.rds.pipeline()
+        pipe.zrangebyscore(key, '-inf', now)
+        pipe.zremrangebyscore(key, '-inf', now)
+        retired, _ = pipe.execute()
+        return [old_key.decode() for old_key in retired]
+
+    def publish_annotation_event(self, project_id, media_id, event):
+        """ Publishes an annotation change event to subscribers of a media.
+        """
+        self.rds.publish(f'annotations_{project_id}_{media_id}', json.dumps(event))
+
+    def get_write_generation(self, project_id):
+        """ Returns the number of write operations recorded for a project. This is
+            used to validate cached list responses.
+        """
+        val = self.rds.get(f'write_gen_{project_id}')
+        return int(val) if val else 0
+
+    def bump_write_generation(self, project_id):
+        """ Records a write operation to a project.
+        """
+        self.rds.incr(f'write_gen_{project_id}')
+
+    def get_segment_index(self, path):
+        """ Returns a binary segment index for a segment info file, or None.
+        """
+        return self.rds.get(f'segment_index_{path}')
+
+    def set_segment_index(self, path, data, expiry=86400):
+        """ Stores a binary segment index for a segment info file.
+        """
+        self.rds.set(f'segment_index_{path}', data, ex=expiry)
+
+    def record_fragment_stats(self, hits, misses, hit_bytes, fetched_bytes):
+        """ Accumulates statistics of the media fragment cache.
+        """
+        pipe = self.rds.pipeline()
+        pipe.hincrby('fragment_stats', 'hits', hits)
+        pipe.hincrby('fragment_stats', 'misses', misses)
+        pipe.hincrby('fragment_stats', 'bytes_saved', hit_bytes)
+        pipe.hincrby('fragment_stats', 'bytes_fetched', fetched_bytes)
+        pipe.execute()
+
+    def get_fragment_stats(self):
+        """ Returns statistics of the media fragment cache, including the hit rate.
+        """
+        stats = {key.decode(): int(val)
+                 for key, val in self.rds.hgetall('fragment_stats').items()}
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_rate'] = stats.get('hits', 0) / lookups if lookups else 0.0
+        return stats
+
+    def acquire_render_lock(self, key, timeout):
+        """ Acquires the lock for computing a render without blocking. Returns the
+            lock, or None if another worker holds it. The lock expires after the
+            timeout in seconds if it is not released.
+        """
+        lock = self.rds.lock(f'render_lock_{key}', timeout=timeout)
+        if lock.acquire(blocking=False):
+            return lock
+        return None
+
+    def render_lock_held(self, key):
+        """ Returns true if a worker holds the lock for computing a render.
+        """
+        return bool(self.rds.exists(f'render_lock_{key}'))
+
+    def get_render_outcome(self, key):
+        """ Returns the shared outcome of a render, or None.
+        """
+        return self.rds.get(f'render_outcome_{key}')
+
+    def set_render_outcome(self, key, outcome, expiry=60):
+        """ Shares the outcome of a render with workers waiting for it.
+        """
+        self.rds.set(f'render_outcome_{key}', outcome, ex=expiry)
+
+    def clear_render_outcome(self, key):
+        """ Removes the shared outcome of a render.
+        """
+        self.rds.delete(f'render_outcome_{key}')
+
+    def record_encode_stats(self, render_format, frames, seconds):
+        """ Accumulates the number of frames and time spent encoding animations.
+        """
+        pipe = self.rds.pipeline()
+        pipe.hincrby('encode_stats', f'{render_format}_encodes', 1)
+        pipe.hincrby('encode_stats', f'{render_format}_frames', frames)
+        pipe.hincrbyfloat('encode_stats', f'{render_format}_seconds', seconds)
+        pipe.execute()
+
+    def get_encode_stats(self):
+        """ Returns statistics of animation encoding, including the encode time per
+            frame in milliseconds for each format.
+        """
+        stats = {key.decode(): float(val)
+                 for key, val in self.rds.hgetall('encode_stats').items()}
+        for render_format in ['gif', 'mp4']:
+            frames = stats.get(f'{render_format}_frames', 0)
+            seconds = stats.get(f'{render_format}_seconds', 0)
+            stats[f'{render_format}_ms_per_frame'] = 1000 * seconds / frames if frames else 0.0
+        return stats
+
+    def acquire_render_slot(self, token, limits, timeout):
+        """ Atomically takes a render slot in each of several pools if all of them
+            have capacity. Slots held longer than the timeout in seconds are assumed
+            to be leaked and are discarded.
+
+            limits: Dict mapping pool names to their maximum number of slots.
+
+            Returns true if the slots were taken.
+        """
+        script = self.rds.register_script("""
+            local now = tonumber(ARGV[1])
+            local timeout = tonumber(ARGV[2])
+            for idx, key in ipairs(KEYS) do
+                redis.call('zremrangebyscore', key, '-inf', now - timeout)
+                if redis.call('zcard', key) >= tonumber(ARGV[3 + idx]) then
+                    return 0
+                end
+            end
+            for _, key in ipairs(KEYS) do
+                redis.call('zadd', key, now, ARGV[3])
+                redis.call('expire', key, timeout)
+            end
+            return 1
+        """)
+        keys = [f'render_slots_{pool}' for pool in limits.keys()]
+        args = [time.time(), timeout, token, *limits.values()]
+        return bool(script(keys=keys, args=args))
+
+    def release_render_slot(self, token, pools):
+        """ Releases render slots taken with `acquire_render_slot`.
+        """
+        pipe = self.rds.pipeline()
+        for pool in pools:
+            pipe.zrem(f'render_slots_{pool}', token)
+        pipe.execute()
+
     def invalidate_all(self):
         """Invalidates all caches.
         """
@@ -0,0 +1,184 @@
+""" Server that pushes annotation change events to browsers.
+
+Write paths publish events to Redis channels named `annotations_<project>_<media>`.
+This server holds a single pattern subscription to those channels and fans events
+out to browsers subscribed with server-sent events. Browsers obtain a signed ticket
+for a media from the `AnnotationEvents` endpoint, so this server does not need
+database access.
+"""
+import asyncio
+import logging
+import os
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+# Salt used to sign subscription tickets.
+TICKET_SALT = 'annotation-events'
+
+# Maximum age of a subscription ticket in seconds when a connection is opened. Open
+# connections are not affected, and clients request a new ticket to reconnect.
+TICKET_MAX_AGE = 3600
+
+# Seconds between keepalive comments sent to idle connections.
+KEEPALIVE_INTERVAL = 15
+
+# Maximum number of queued events per connection. Connections that fall behind are
+# closed so that the browser reconnects and reloads annotations.
+MAX_QUEUED_EVENTS = 1000
+
+CHANNEL_PREFIX = 'annotations_'
+
+def make_ticket(project_id, media_id, user_id):
+    """ Returns a signed ticket granting access to events of a media.
+    """
+    return signing.dumps({'project': project_id, 'media': media_id, 'user': user_id},
+                         salt=TICKET_SALT)
+
+def channel_from_ticket(ticket):
+    """ Returns the channel name for a ticket, or raises `signing.BadSignature`.
+    """
+    data = signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_MAX_AGE)
+    return f"{CHANNEL_PREFIX}{data['project']}_{data['media']}"
+
+async def _read_reply(reader):
+    """ Reads one reply in the Redis serialization protocol.
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection to Redis closed!")
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode()
+    if kind == b'-':
+        raise ConnectionError(f"Redis error: {body.decode()}")
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        return [await _read_reply(reader) for _ in range(int(body))]
+    raise ConnectionError(f"Unexpected reply from Redis: {line}")
+
+class EventHub:
+    """ Fans out events from Redis to queues of connected clients.
+    """
+    def __init__(self):
+        self.queues = {}
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=MAX_QUEUED_EVENTS)
+        self.queues.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        queues = self.queues.get(channel, set())
+        queues.discard(queue)
+        if not queues:
+            self.queues.pop(channel, None)
+
+    def publish(self, channel, data):
+        for queue in list(self.queues.get(channel, [])):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Signal the connection to close.
+                self.unsubscribe(channel, queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def listen(self, host, port):
+        """ Subscribes to annotation channels and publishes messages until cancelled,
+            reconnecting if the Redis connection is lost.
+        """
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(b'*2\r\n$10\r\nPSUBSCRIBE\r\n'
+                             + f'${len(CHANNEL_PREFIX) + 1}\r\n{CHANNEL_PREFIX}*\r\n'.encode())
+                await writer.drain()
+                logger.info(f"Subscribed to Redis at {host}:{port}.")
+                while True:
+                    reply = await _read_reply(reader)
+                    if isinstance(reply, list) and reply[0] == b'pmessage':
+                        self.publish(reply[2].decode(), reply[3].decode())
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                logger.warning("Lost connection to Redis, reconnecting...", exc_info=True)
+                await asyncio.sleep(1)
+
+async def _respond(writer, status, body):
+    writer.write(f'HTTP/1.1 {status}\r\nContent-Type: text/plain\r\n'
+                 f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n{body}'.encode())
+    await writer.drain()
+    writer.close()
+
+async def handle_connection(hub, reader, writer):
+    """ Serves one HTTP connection as an event stream.
+    """
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2 or parts[0] != 'GET':
+            await _respond(writer, '405 Method Not Allowed', 'Only GET is supported.')
+            return
+        url = urlsplit(parts[1])
+        if url.path.rstrip('/').endswith('/healthz'):
+            await _respond(writer, '200 OK', 'OK')
+            return
+        ticket = parse_qs(url.query).get('ticket', [None])[0]
+        try:
+            channel = channel_from_ticket(ticket)
+        except (signing.BadSignature, TypeError):
+            await _respond(writer, '403 Forbidden', 'Invalid or expired ticket.')
+            return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        writer.close()
+        return
+
+    queue = hub.subscribe(channel)
+    try:
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nX-Accel-Buffering: no\r\n'
+                     b'Connection: keep-alive\r\n\r\n')
+        await writer.drain()
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                writer.write(b': keepalive\n\n')
+            else:
+                if data is None:
+                    break
+                writer.write(f'data: {data}\n\n'.encode())
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        hub.unsubscribe(channel, queue)
+        writer.close()
+
+def serve(host='0.0.0.0', port=8001):
+    """ Runs the event server until interrupted.
+    """
+    hub = EventHub()
+    loop = asyncio.get_event_loop()
+    redis_host = os.getenv('REDIS_HOST', 'localhost')
+    redis_port = int(os.getenv('REDIS_PORT', '6379'))
+    loop.create_task(hub.listen(redis_host, redis_port))
+    server = loop.run_until_complete(asyncio.start_server(
+        lambda reader, writer: handle_connection(hub, reader, writer), host, port))
+    logger.info(f"Serving annotation events on {host}:{port}...")
+    try:
+        loop.run_forever()
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
@@ -0,0 +1,14 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from main.cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Prints frame counts and encode time per frame of animations.'
+
+    def handle(self, **options):
+        stats = TatorCache().get_encode_stats()
+        for key, value in stats.items():
+            self.stdout.write(f"{key}: {value}")
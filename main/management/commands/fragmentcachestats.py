@@ -0,0 +1,14 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from main.cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Prints hit rate and byte counts of the media fragment cache.'
+
+    def handle(self, **options):
+        stats = TatorCache().get_fragment_stats()
+        for key, value in stats.items():
+            self.stdout.write(f"{key}: {value}")
@@ -0,0 +1,27 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.cache import TatorCache
+from main.rest._annotation_import import run_import
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Processes queued annotation imports.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=60,
+                            help='Seconds to wait for a job before checking connections.')
+
+    def handle(self, **options):
+        cache = TatorCache()
+        logger.info("Waiting for annotation imports...")
+        while True:
+            uid = cache.pop_import(timeout=options['timeout'])
+            close_old_connections()
+            if uid is None:
+                continue
+            logger.info(f"Starting import job {uid}...")
+            run_import(uid)
@@ -0,0 +1,19 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from main.events import serve
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Serves annotation change events to browsers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='0.0.0.0',
+                            help='Address to listen on.')
+        parser.add_argument('--port', type=int, default=8001,
+                            help='Port to listen on.')
+
+    def handle(self, **options):
+        serve(options['host'], options['port'])
@@ -0,0 +1,22 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from main.models import Localization
+from main.rest._annotation_update import update_has_children
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Sets the has_children flag of localizations that are parents of other localizations.'
+
+    def handle(self, **options):
+        BATCH_SIZE = 1000
+        parent_ids = Localization.objects.filter(deleted=False, parent__isnull=False)\
+                                         .values_list('parent', flat=True)\
+                                         .distinct()
+        parent_ids = list(parent_ids.iterator())
+        for start in range(0, len(parent_ids), BATCH_SIZE):
+            update_has_children(parent_ids[start:start + BATCH_SIZE])
+            logger.info(f"Updated {min(start + BATCH_SIZE, len(parent_ids))} of "
+                        f"{len(parent_ids)} parent localizations...")
+        logger.info(f"Updated a total of {len(parent_ids)} parent localizations!")
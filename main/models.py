@@ -1,6 +1,7 @@
 import json
 import os
 import traceback
+import threading
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db.models import Model
@@ -32,6 +33,10 @@ from django.contrib.postgres.fields import JSONField
 from django.core.validators import MinValueValidator
 from django.core.validators import RegexValidator
 from django.db.models import FloatField, Transform,UUIDField
+from django.db.models import Func
+from django.db.models import QuerySet
+from django.db.models import Index
+from django.db.models import Q
 from django.db.models.signals import post_save
 from django.db.models.signals import pre_delete
 from django.db.models.signals import post_delete
@@ -46,11 +51,12 @@ from django.db import transaction
 
 from .search import TatorSearch
 from .download import download_file
-from .store import get_tator_store, ObjectStore, get_storage_lookup
+from .store import get_tator_store, ObjectStore, get_storage_lookup, invalidate_tator_store
 from .cognito import TatorCognito
 
 from collections import UserDict
 
+import numpy as np
 import pytz
 import datetime
 import logging
@@ -159,6 +165,52 @@ class ModelDiffMixin(object):
 
         return change_dict
 
+class TransactionId(Func):
+    """ The ID of the current transaction, assigning one if necessary. """
+    function = "txid_current"
+    arity = 0
+
+    @property
+    def output_field(self):
+        return BigIntegerField()
+
+class ChangeTrackingQuerySet(QuerySet):
+    """
+    A queryset that records the ID of the writing transaction in `change_xid` for every
+    row it updates or creates, in the same statement as the write. Transaction IDs
+    order changes by commit for the annotation changes endpoints.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault("change_xid", TransactionId())
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.change_xid = TransactionId()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.change_xid = TransactionId()
+        return super().bulk_update(objs, [*fields, "change_xid"], *args, **kwargs)
+
+class ChangeTrackingMixin(object):
+    """
+    A model mixin that records the ID of the writing transaction in `change_xid` when
+    a row is saved. Models using it must define a `change_xid` field and use
+    `ChangeTrackingQuerySet` as their manager. Raw SQL writes must set `change_xid` to
+    `txid_current()` themselves.
+    """
+
+    def save(self, *args, **kwargs):
+        self.change_xid = TransactionId()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = [*kwargs["update_fields"], "change_xid"]
+        super().save(*args, **kwargs)
+
 
 class Depth(Transform):
     lookup_name = "depth"
@@ -447,6 +499,10 @@ class Bucket(Model):
             storage_type,
         )
 
+@receiver(post_save, sender=Bucket)
+@receiver(post_delete, sender=Bucket)
+def bucket_save(sender, instance, **kwargs):
+    invalidate_tator_store(instance.pk)
 
 class Project(Model):
     name = CharField(max_length=128)
@@ -627,17 +683,29 @@ class TemporaryFile(Model):
         self.eol_datetime = past
         self.save()
 
-    def from_local(path, name, project, user, lookup, hours, is_upload=False):
-        """ Given a local file create a temporary file storage object
-        :returns A saved TemporaryFile:
+    def get_local_path(project, name):
+        """ Returns a new path under MEDIA_ROOT for a temporary file, creating its
+        directory.
         """
         extension = os.path.splitext(name)[-1]
         destination_fp=os.path.join(settings.MEDIA_ROOT, f"{project.id}", f"{uuid.uuid1()}{extension}")
         os.makedirs(os.path.dirname(destination_fp), exist_ok=True)
-        if is_upload:
-            download_file(path, destination_fp)
+        return destination_fp
+
+    def from_local(path, name, project, user, lookup, hours, is_upload=False, in_place=False):
+        """ Given a local file create a temporary file storage object
+        :param in_place: If true, path was returned by get_local_path and is used
+                         without copying.
+        :returns A saved TemporaryFile:
+        """
+        if in_place:
+            destination_fp = path
         else:
-            shutil.copyfile(path, destination_fp)
+            destination_fp = TemporaryFile.get_local_path(project, name)
+            if is_upload:
+                download_file(path, destination_fp)
+            else:
+                shutil.copyfile(path, destination_fp)
 
         now = datetime.datetime.utcnow()
         eol =  now + datetime.timedelta(hours=hours)
@@ -1149,7 +1217,7 @@ def media_post_delete(sender, instance, **kwargs):
                     path = obj['segment_info']
                     safe_delete(path)
 
-class Localization(Model, ModelDiffMixin):
+class Localization(ChangeTrackingMixin, Model, ModelDiffMixin):
     project = ForeignKey(Project, on_delete=SET_NULL, null=True, blank=True, db_column='project')
     meta = ForeignKey(LocalizationType, on_delete=SET_NULL, null=True, blank=True, db_column='meta')
     """ Meta points to the defintion of the attribute field. That is
@@ -1193,6 +1261,29 @@ class Localization(Model, ModelDiffMixin):
     parent = ForeignKey("self", on_delete=SET_NULL, null=True, blank=True,db_column='parent')
     """ Pointer to localization in which this one was generated from """
     deleted = BooleanField(default=False)
+    has_children = BooleanField(default=False)
+    """ Indicates whether a localization that is not deleted has this one as its parent. """
+    change_xid = BigIntegerField(default=0, editable=False)
+    """ ID of the transaction that last wrote this localization. """
+
+    objects = ChangeTrackingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Supports lookup of clones that override localizations in base versions.
+            Index(fields=['parent', 'version'], condition=Q(deleted=False),
+                  name='localization_override_idx'),
+            # Supports retrieval of localizations excluding parents.
+            Index(fields=['media', 'version', 'frame'],
+                  condition=Q(deleted=False, has_children=False),
+                  name='localization_leaf_idx'),
+            # Supports per-frame fetches of localizations by media and version.
+            Index(fields=['media', 'version', 'frame'], condition=Q(deleted=False),
+                  name='localization_frame_idx'),
+            # Supports retrieval of changes since a watermark.
+            Index(fields=['project', 'change_xid', 'id'],
+                  name='localization_changes_idx'),
+        ]
 
 @receiver(post_save, sender=Localization)
 def localization_save(sender, instance, created, **kwargs):
@@ -1207,7 +1298,7 @@ def localization_delete(sender, instance, **kwargs):
     if instance.thumbnail_image:
         instance.thumbnail_image.delete()
 
-class State(Model, ModelDiffMixin):
+class State(ChangeTrackingMixin, Model, ModelDiffMixin):
     """
     A State is an event that occurs, potentially independent, from that of
     a media element. It is associated with 0 (1 to be useful) or more media
@@ -1246,6 +1337,20 @@ class State(Model, ModelDiffMixin):
                            related_name='extracted',
                            db_column='extracted')
     deleted = BooleanField(default=False)
+    change_xid = BigIntegerField(default=0, editable=False)
+    """ ID of the transaction that last wrote this state. """
+
+    objects = ChangeTrackingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Supports retrieval of changes since a watermark.
+            Index(fields=['project', 'change_xid', 'id'], name='state_changes_idx'),
+            # Supports retrieval of states from a chain of versions.
+            Index(fields=['project', 'version'], condition=Q(deleted=False),
+                  name='state_version_idx'),
+        ]
+
     def selectOnMedia(media_id):
         return State.objects.filter(media__in=media_id)
 
@@ -1257,33 +1362,88 @@ def state_save(sender, instance, created, **kwargs):
 def state_delete(sender, instance, **kwargs):
     TatorSearch().delete_document(instance)
 
+def compute_segments(frames):
+    """ Returns a list of [start, stop] pairs for runs of consecutive frames.
+    """
+    frames = np.unique(np.asarray(frames, dtype=np.int64))
+    if frames.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(frames) != 1)
+    starts = np.concatenate((frames[:1], frames[breaks + 1]))
+    stops = np.concatenate((frames[breaks], frames[-1:]))
+    return np.stack((starts, stops), axis=1).tolist()
+
+def update_state_segments(state_ids):
+    """ Recomputes segments for a set of states from the frames of their localizations
+        and associates each state with the media of its localizations. Uses one query
+        to read frames and a fixed number of queries to write results.
+    """
+    state_ids = list(state_ids)
+    if not state_ids:
+        return
+    rows = State.localizations.through.objects\
+                .filter(state_id__in=state_ids, localization__frame__isnull=False,
+                        localization__media__isnull=False)\
+                .values_list('state_id', 'localization__frame', 'localization__media')
+    rows = np.array(list(rows), dtype=np.int64).reshape(-1, 3)
+    rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+    bounds = np.flatnonzero(np.diff(rows[:, 0])) + 1
+    now = datetime.datetime.now(datetime.timezone.utc)
+    states = []
+    media_relations = []
+    for group in np.split(rows, bounds) if rows.size else []:
+        state_id = int(group[0, 0])
+        states.append(State(id=state_id, segments=compute_segments(group[:, 1]),
+                            modified_datetime=now))
+        media_relations += [State.media.through(state_id=state_id, media_id=int(media_id))
+                            for media_id in np.unique(group[:, 2])]
+    with_localizations = set(state.id for state in states)
+    states += [State(id=state_id, segments=[], modified_datetime=now)
+               for state_id in state_ids if state_id not in with_localizations]
+    with transaction.atomic():
+        State.objects.bulk_update(states, ['segments', 'modified_datetime'], batch_size=1000)
+        State.media.through.objects.filter(state_id__in=with_localizations).delete()
+        State.media.through.objects.bulk_create(media_relations, batch_size=1000)
+
+# States whose segments should be recomputed when the current transaction commits.
+_pending_segments = threading.local()
+
+def _flush_segments():
+    """ Recomputes segments of all pending states. The first commit hook to run
+        processes every pending state, so later hooks from the same transaction
+        have nothing left to do.
+    """
+    pending = getattr(_pending_segments, 'state_ids', None)
+    if pending:
+        _pending_segments.state_ids = set()
+        update_state_segments(pending)
+
+def _schedule_segments(state_ids):
+    """ Defers segment computation to transaction commit so that each state is only
+        processed once per transaction, regardless of how many m2m changes it sees.
+        States changed in a transaction or savepoint that was rolled back may still be
+        recomputed, which is harmless because segments are computed from committed data.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        update_state_segments(state_ids)
+        return
+    if getattr(_pending_segments, 'state_ids', None) is None:
+        _pending_segments.state_ids = set()
+    _pending_segments.state_ids.update(state_ids)
+    transaction.on_commit(_flush_segments)
+
 @receiver(m2m_changed, sender=State.localizations.through)
-def calc_segments(sender, **kwargs):
-    instance=kwargs['instance']
-    sortedLocalizations=Localization.objects.filter(pk__in=instance.localizations.all()).order_by('frame')
-
-    #Bring up related media to association
-    instance.media.set(sortedLocalizations.all().values_list('media', flat=True))
-    segmentList=[]
-    current=[None,None]
-    last=None
-    for localization in sortedLocalizations:
-        if current[0] is None:
-            current[0] = localization.frame
-            last = current[0]
-        else:
-            if localization.frame - 1 == last:
-                last = localization.frame
-            else:
-                current[1] = last
-                segmentList.append(current.copy())
-                current[0] = localization.frame
-                current[1] = None
-                last = localization.frame
-    if current[1] is None:
-        current[1] = last
-        segmentList.append(current)
-    instance.segments = segmentList
+def calc_segments(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Instance is a localization, pk_set contains state IDs.
+        if action == 'pre_clear':
+            instance._cleared_states = list(instance.state_set.values_list('id', flat=True))
+        elif action == 'post_clear':
+            _schedule_segments(getattr(instance, '_cleared_states', []))
+        elif action in ['post_add', 'post_remove']:
+            _schedule_segments(pk_set)
+    elif action in ['post_add', 'post_remove', 'post_clear']:
+        _schedule_segments([instance.pk])
 
 class Leaf(Model, ModelDiffMixin):
     project = ForeignKey(Project, on_delete=SET_NULL, null=True, blank=True, db_column='project')
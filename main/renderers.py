@@ -93,3 +93,19 @@ class Mp4Renderer(BaseRenderer):
 
     def render(self, data, media_type=None, renderer_context=None):
         return data
+
+class BinaryRenderer(BaseRenderer):
+    media_type = 'application/octet-stream'
+    charset = None
+    format = 'bin'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        return data
+
+class ZipRenderer(BaseRenderer):
+    media_type = 'application/zip'
+    charset = None
+    format = 'zip'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        return data
@@ -8,6 +8,11 @@ from .analysis import AnalysisListAPI
 from .analysis import AnalysisDetailAPI
 from .announcement import AnnouncementListAPI
 from .announcement import AnnouncementDetailAPI
+from .annotation_import import AnnotationImportAPI
+from .annotation_changes import LocalizationChangesAPI
+from .annotation_changes import StateChangesAPI
+from .annotation_events import AnnotationEventsAPI
+from .annotation_snapshot import AnnotationSnapshotAPI
 from .attribute_type import AttributeTypeListAPI
 from .audio_file import AudioFileListAPI
 from .audio_file import AudioFileDetailAPI
@@ -42,9 +47,12 @@ from .leaf_type import LeafTypeDetailAPI
 from .localization import LocalizationListAPI
 from .localization import LocalizationDetailAPI
 from .localization_count import LocalizationCountAPI
+from .localization_feed import LocalizationFeedAPI
+from .localization_ingest import LocalizationIngestAPI
 from .localization_type import LocalizationTypeListAPI
 from .localization_type import LocalizationTypeDetailAPI
 from .localization_graphic import LocalizationGraphicAPI
+from .localization_graphics import LocalizationGraphicsAPI
 from .media import MediaListAPI
 from .media import MediaDetailAPI
 from .media_count import MediaCountAPI
@@ -70,6 +78,8 @@ from .state import StateDetailAPI
 from .state_count import StateCountAPI
 from .state import MergeStatesAPI
 from .state import TrimStateEndAPI
+from .state_interpolation import StateInterpolationAPI
+from .state_timeline import StateTimelineAPI
 from .state_graphic import StateGraphicAPI
 from .state_type import StateTypeListAPI
 from .state_type import StateTypeDetailAPI
@@ -0,0 +1,42 @@
+""" Notifications of annotation changes. """
+from collections import defaultdict
+import logging
+
+from django.db import transaction
+
+from ..cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+def notify_annotation_change(project_id, user, annotation_type, action, pairs):
+    """ Invalidates annotation snapshots and list validators and publishes change
+        events for the affected media when the current transaction commits.
+
+        user: User that made the change, so clients can ignore their own edits.
+        annotation_type: Should be one of `localization` or `state`.
+        action: Should be one of `create`, `update` or `delete`.
+        pairs: Iterable of (annotation ID, media ID) tuples. This is evaluated
+            immediately. Call this after the write so that events are not published
+            before the data changes; collect pairs into a list before the write if
+            the write changes which rows a queryset matches.
+    """
+    ids_by_media = defaultdict(list)
+    for annotation_id, media_id in pairs:
+        if media_id is not None:
+            ids_by_media[media_id].append(annotation_id)
+    if not ids_by_media:
+        return
+
+    def _notify():
+        cache = TatorCache()
+        cache.bump_write_generation(project_id)
+        cache.invalidate_snapshots(ids_by_media.keys())
+        for media_id, ids in ids_by_media.items():
+            cache.publish_annotation_event(project_id, media_id, {
+                'type': annotation_type,
+                'action': action,
+                'media': media_id,
+                'ids': ids,
+                'user': user.id,
+            })
+    transaction.on_commit(_notify)
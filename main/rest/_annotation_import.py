@@ -0,0 +1,217 @@
+""" Background import of annotation files. """
+import csv
+import datetime
+import gzip
+import io
+import json
+import logging
+import tempfile
+
+from django.db import transaction
+
+from ..cache import TatorCache
+from ..models import LocalizationType
+from ..models import Project
+from ..models import StateType
+from ..models import User
+from ..store import get_tator_store
+
+from ._annotation_ingest import create_states
+from ._annotation_ingest import ingest_localizations
+from ._attributes import convert_attribute
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of row errors stored in the job record.
+MAX_ERRORS = 100
+
+# CSV columns that are parsed as JSON rather than treated as strings.
+CSV_JSON_FIELDS = ['type', 'media_id', 'media_ids', 'localization_ids', 'frame', 'version',
+                   'parent', 'x', 'y', 'u', 'v', 'width', 'height']
+
+CREATE_LOOKUP = {'localization': ingest_localizations,
+                 'state': create_states}
+
+TYPE_LOOKUP = {'localization': LocalizationType,
+               'state': StateType}
+
+def _now():
+    return datetime.datetime.utcnow().isoformat() + 'Z'
+
+def _open_text(raw):
+    """ Wraps a binary file in a text reader, decompressing if it is gzipped.
+    """
+    magic = raw.read(2)
+    raw.seek(0)
+    if magic == b'\x1f\x8b':
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+def _read_ndjson(text):
+    """ Yields tuples of line number, spec and error message.
+    """
+    for line_num, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spec = json.loads(line)
+        except ValueError as exc:
+            yield line_num, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(spec, dict):
+            yield line_num, None, "Each line must be a JSON object!"
+            continue
+        yield line_num, spec, None
+
+def _coerce_csv_attributes(spec, attr_types):
+    """ Converts string attribute values from a CSV row to the attribute dtype.
+    """
+    for name, attr_type in attr_types.items():
+        value = spec.get(name)
+        if not isinstance(value, str):
+            continue
+        if attr_type['dtype'] in ['bool', 'int', 'float']:
+            spec[name] = convert_attribute(attr_type, value)
+        elif attr_type['dtype'] == 'geopos':
+            lat, lon = value.split('_')
+            spec[name] = [float(lon), float(lat)]
+
+def _read_csv(text, project, annotation_type):
+    """ Yields tuples of line number, spec and error message.
+    """
+    attr_types = {}
+    reader = csv.DictReader(text)
+    for row in reader:
+        line_num = reader.line_num
+        try:
+            spec = {}
+            for key, value in row.items():
+                if key is None or value is None or value == '':
+                    continue
+                if key in CSV_JSON_FIELDS:
+                    spec[key] = json.loads(value)
+                else:
+                    spec[key] = value
+            type_id = spec.get('type')
+            if type_id not in attr_types:
+                type_obj = TYPE_LOOKUP[annotation_type].objects.filter(project=project,
+                                                                     pk=type_id)
+                attr_types[type_id] = {attr_type['name']: attr_type
+                                       for obj in type_obj
+                                       for attr_type in obj.attribute_types}
+            _coerce_csv_attributes(spec, attr_types[type_id])
+        except Exception as exc:
+            yield line_num, None, str(exc)
+            continue
+        yield line_num, spec, None
+
+def _create_batch(project, user, annotation_type, batch):
+    """ Creates a batch of annotations in one transaction. If the batch fails, rows are
+        retried individually so that errors can be attributed to specific rows.
+        Returns the number of created annotations and a list of errors.
+    """
+    if not batch:
+        return 0, []
+    create = CREATE_LOOKUP[annotation_type]
+    try:
+        with transaction.atomic():
+            return len(create(project, user, [spec for _, spec in batch])), []
+    except Exception:
+        logger.info("Batch failed, retrying rows individually...", exc_info=True)
+    created = 0
+    errors = []
+    for line_num, spec in batch:
+        try:
+            with transaction.atomic():
+                created += len(create(project, user, [spec]))
+        except Exception as exc:
+            errors.append({'line': line_num, 'message': str(exc)})
+    return created, errors
+
+def run_import(uid):
+    """ Streams an uploaded annotation file into the database in batches, reporting
+        progress through the job record in the cache.
+    """
+    cache = TatorCache()
+    jobs = cache.get_jobs_by_uid(uid)
+    if jobs is None:
+        logger.warning(f"Import job {uid} not found!")
+        return
+    job = jobs[0]
+    if job['status'] != 'Pending':
+        logger.info(f"Skipping import job {uid} with status {job['status']}.")
+        return
+    if cache.job_cancelled(uid):
+        logger.info(f"Skipping cancelled import job {uid}.")
+        cache.update_job(uid, {'status': 'Cancelled', 'stop_time': _now()})
+        cache.clear_job_cancel(uid)
+        return
+    cache.update_job(uid, {'status': 'Running', 'start_time': _now()})
+
+    processed = 0
+    created = 0
+    errors = []
+    num_errors = 0
+    try:
+        project = Project.objects.get(pk=job['project'])
+        user = User.objects.get(pk=job['user'])
+        annotation_type = job['annotation_type']
+        batch_size = job['batch_size']
+        tator_store = get_tator_store(project.bucket)
+        size = max(tator_store.get_size(job['key']), 1)
+        with tempfile.TemporaryFile() as raw:
+            tator_store.download_fileobj(job['key'], raw)
+            raw.seek(0)
+            text = _open_text(raw)
+            if job['format'] == 'csv':
+                rows = _read_csv(text, project, annotation_type)
+            else:
+                rows = _read_ndjson(text)
+
+            def _flush(batch):
+                nonlocal created, num_errors
+                batch_created, batch_errors = _create_batch(project, user, annotation_type,
+                                                            batch)
+                created += batch_created
+                num_errors += len(batch_errors)
+                errors.extend(batch_errors[:MAX_ERRORS - len(errors)])
+                cache.update_job(uid, {
+                    'progress': min(raw.tell() / size, 1.0),
+                    'processed': processed,
+                    'created': created,
+                    'errors': errors,
+                })
+                return cache.job_cancelled(uid)
+
+            batch = []
+            cancelled = False
+            for line_num, spec, error in rows:
+                processed += 1
+                if error is None:
+                    batch.append((line_num, spec))
+                else:
+                    num_errors += 1
+                    if len(errors) < MAX_ERRORS:
+                        errors.append({'line': line_num, 'message': error})
+                if len(batch) >= batch_size:
+                    cancelled = _flush(batch)
+                    batch = []
+                    if cancelled:
+                        break
+            if not cancelled:
+                cancelled = _flush(batch)
+        if cancelled:
+            status = 'Cancelled'
+            cache.update_job(uid, {'status': status, 'stop_time': _now()})
+        else:
+            status = 'Succeeded'
+            cache.update_job(uid, {'status': status, 'stop_time': _now(), 'progress': 1.0})
+        logger.info(f"Import job {uid} finished with status {status}, created {created} "
+                    f"{annotation_type}s with {num_errors} errors.")
+    except Exception as exc:
+        logger.error(f"Import job {uid} failed!", exc_info=True)
+        cache.update_job(uid, {'status': 'Failed', 'stop_time': _now(),
+                               'errors': errors + [{'line': 0, 'message': str(exc)}]})
+    finally:
+        cache.clear_job_cancel(uid)
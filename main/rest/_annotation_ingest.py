@@ -0,0 +1,441 @@
+""" High volume creation of annotations. """
+import csv
+import datetime
+import io
+import itertools
+import json
+import logging
+
+import numpy as np
+from django.db import connection
+from django.db import transaction
+from django.contrib.contenttypes.models import ContentType
+
+from ..models import ChangeLog
+from ..models import ChangeToObject
+from ..models import Localization
+from ..models import LocalizationType
+from ..models import Media
+from ..models import Membership
+from ..models import State
+from ..models import StateType
+from ..models import Version
+from ..models import compute_segments
+from ..search import TatorSearch
+
+from ._annotation_events import notify_annotation_change
+from ._annotation_update import update_has_children
+from ._attributes import convert_attribute_json
+from ._util import bulk_create_from_generator
+from ._util import computeRequiredFields
+from ._util import check_required_fields
+
+logger = logging.getLogger(__name__)
+
+# Localization geometry fields and their valid ranges.
+GEOMETRY_RANGES = {
+    'x': (0.0, 1.0),
+    'y': (0.0, 1.0),
+    'width': (0.0, 1.0),
+    'height': (0.0, 1.0),
+    'u': (-1.0, 1.0),
+    'v': (-1.0, 1.0),
+}
+
+# Columns of the staging table, in COPY order.
+STAGING_COLUMNS = {
+    'id': 'integer',
+    'meta': 'integer',
+    'media': 'integer',
+    'version': 'integer',
+    'parent': 'integer',
+    'x': 'double precision',
+    'y': 'double precision',
+    'u': 'double precision',
+    'v': 'double precision',
+    'width': 'double precision',
+    'height': 'double precision',
+    'frame': 'integer',
+    'attributes': 'jsonb',
+}
+
+ES_BATCH_SIZE = 1000
+
+def get_default_version(project, user):
+    """ Returns the version used for annotations that do not specify one.
+    """
+    membership = Membership.objects.get(user=user, project=project)
+    if membership.default_version:
+        return membership.default_version
+    default_version = Version.objects.filter(project=project, number__gte=0).order_by('number')
+    if default_version.exists():
+        return default_version[0]
+    # If no versions exist, create one.
+    return Version.objects.create(
+        name="Baseline",
+        description="Initial version",
+        project=project,
+        number=0,
+    )
+
+def _int_column(specs, key):
+    """ Returns an integer array of a required field.
+    """
+    try:
+        return np.array([spec[key] for spec in specs], dtype=np.int64)
+    except KeyError:
+        idx = next(idx for idx, spec in enumerate(specs) if key not in spec)
+        raise Exception(f'Missing required field "{key}" in localization {idx}!')
+    except (TypeError, ValueError):
+        raise Exception(f'Field "{key}" must be an integer in all localizations!')
+
+def _validate_geometry(specs):
+    """ Checks ranges of geometry fields across all specs at once.
+        Returns a dict of float arrays with NaN for missing values.
+    """
+    geometry = {}
+    for key, (low, high) in GEOMETRY_RANGES.items():
+        try:
+            values = np.array([spec.get(key) for spec in specs], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise Exception(f'Field "{key}" must be a number in all localizations!')
+        invalid = ~np.isnan(values) & ((values < low) | (values > high))
+        if invalid.any():
+            idx = int(np.argmax(invalid))
+            raise Exception(f'Field "{key}" of localization {idx} must be between {low} and '
+                            f'{high}, got {values[idx]}!')
+        geometry[key] = values
+    return geometry
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+def _validate_attributes(specs, metas, meta_ids):
+    """ Validates and converts attribute values and fills in defaults. Each distinct
+        value of an attribute is only converted once. Returns a list of attribute dicts.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    attrs = [{} for _ in specs]
+    for meta_id in np.unique(meta_ids):
+        indices = np.flatnonzero(meta_ids == meta_id)
+        for attr_type in metas[int(meta_id)].attribute_types:
+            name = attr_type['name']
+            converted = {}
+            for idx in indices:
+                spec = specs[idx]
+                if name in spec:
+                    value = spec[name]
+                    key = _hashable(value)
+                    if key not in converted:
+                        converted[key] = convert_attribute_json(attr_type, value)
+                    attrs[idx][name] = converted[key]
+                elif attr_type['dtype'] == 'datetime' and attr_type.get('use_current', False):
+                    attrs[idx][name] = now
+                elif 'default' in attr_type and attr_type['dtype'] != 'datetime':
+                    attrs[idx][name] = attr_type['default']
+                elif attr_type.get('required', True):
+                    raise Exception(f'Missing attribute value for "{name}" in localization '
+                                    f'{idx}. Set a default on the attribute type or supply '
+                                    f'a value.')
+    return attrs
+
+def _resolve(model, ids, project, name):
+    """ Retrieves objects for a set of IDs in one query and checks they belong to the
+        project.
+    """
+    qs = model.objects.filter(pk__in=ids)
+    if model is Media:
+        qs = qs.select_related('meta')
+    elif model is LocalizationType:
+        qs = qs.select_related('project')
+    objs = {obj.id: obj for obj in qs.iterator()}
+    missing = set(ids) - set(objs.keys())
+    if missing:
+        raise Exception(f"Could not find {name} {sorted(missing)}!")
+    projects = set(obj.project_id for obj in objs.values())
+    if projects != {project.id}:
+        raise Exception(f"{name.capitalize()} must be part of project {project.id}, got "
+                        f"projects {sorted(projects)}!")
+    return objs
+
+def _copy_rows(ids, meta_ids, media_ids, version_ids, parent_ids, geometry, frames, attrs):
+    """ Serializes rows for COPY in CSV format.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for idx, id_ in enumerate(ids):
+        writer.writerow([
+            id_,
+            meta_ids[idx],
+            media_ids[idx],
+            version_ids[idx],
+            parent_ids[idx],
+            *[None if np.isnan(geometry[key][idx]) else repr(float(geometry[key][idx]))
+              for key in ['x', 'y', 'u', 'v', 'width', 'height']],
+            frames[idx],
+            json.dumps(attrs[idx]),
+        ])
+    buf.seek(0)
+    return buf
+
+def ingest_localizations(project, user, loc_specs):
+    """ Creates localizations from a list of localization specs. Rows are written with
+        COPY into a staging table followed by a single INSERT ... SELECT, foreign keys
+        are resolved with one query per model, and one summarized ChangeLog entry is
+        created for the batch. Returns a list of created IDs in the order of the specs.
+    """
+    num_specs = len(loc_specs)
+    if num_specs == 0:
+        return []
+
+    # Validate fields across all specs.
+    meta_ids = _int_column(loc_specs, 'type')
+    media_ids = _int_column(loc_specs, 'media_id')
+    frames = _int_column(loc_specs, 'frame')
+    if (frames < 0).any():
+        idx = int(np.argmax(frames < 0))
+        raise Exception(f'Field "frame" of localization {idx} must be non-negative!')
+    geometry = _validate_geometry(loc_specs)
+
+    # Resolve foreign keys in bulk.
+    default_version = get_default_version(project, user)
+    version_ids = [spec.get('version') or default_version.id for spec in loc_specs]
+    parent_ids = [spec.get('parent') for spec in loc_specs]
+    metas = _resolve(LocalizationType, set(meta_ids.tolist()), project, 'localization types')
+    medias = _resolve(Media, set(media_ids.tolist()), project, 'media')
+    versions = _resolve(Version, set(version_ids), project, 'versions')
+    unique_parents = set(parent_id for parent_id in parent_ids if parent_id is not None)
+    if unique_parents:
+        _resolve(Localization, unique_parents, project, 'parent localizations')
+    attrs = _validate_attributes(loc_specs, metas, meta_ids)
+
+    table = Localization._meta.db_table
+    staging = f'{table}_ingest'
+    staging_def = ', '.join(f'"{name}" {dtype}' for name, dtype in STAGING_COLUMNS.items())
+    insert_columns = ', '.join(f'"{Localization._meta.get_field(name).column}"' for name in [
+        'id', 'project', 'meta', 'media', 'version', 'parent', 'x', 'y', 'u', 'v', 'width',
+        'height', 'frame', 'attributes', 'user', 'created_by', 'modified_by',
+        'created_datetime', 'modified_datetime', 'modified', 'deleted', 'has_children',
+        'change_xid',
+    ])
+    select_columns = ', '.join(['"id"', '%s', '"meta"', '"media"', '"version"', '"parent"',
+                                '"x"', '"y"', '"u"', '"v"', '"width"', '"height"', '"frame"',
+                                '"attributes"', '%s', '%s', '%s', '%s', '%s', 'true', 'false',
+                                'false', 'txid_current()'])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ref_table = ContentType.objects.get_for_model(Localization)
+    change_table = ChangeToObject._meta.db_table
+    change_columns = ', '.join(f'"{ChangeToObject._meta.get_field(name).column}"'
+                               for name in ['ref_table', 'ref_id', 'change_id'])
+    change_dict = {
+        'old': [{'name': '_created', 'value': None}],
+        'new': [{'name': '_created', 'value': num_specs}],
+    }
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Allocate IDs up front so they map to specs deterministically.
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                           "FROM generate_series(1, %s)", [table, num_specs])
+            ids = [row[0] for row in cursor.fetchall()]
+
+            # Write rows into a staging table.
+            cursor.execute(f'CREATE TEMP TABLE "{staging}" ({staging_def}) ON COMMIT DROP')
+            buf = _copy_rows(ids, meta_ids.tolist(), media_ids.tolist(), version_ids,
+                             parent_ids, geometry, frames.tolist(), attrs)
+            cursor.cursor.copy_expert(f'COPY "{staging}" FROM STDIN WITH (FORMAT csv)', buf)
+
+            # Insert localizations from the staging table.
+            cursor.execute(
+                f'INSERT INTO "{table}" ({insert_columns}) '
+                f'SELECT {select_columns} FROM "{staging}" ORDER BY "id" RETURNING "id"',
+                [project.id, user.id, user.id, user.id, now, now],
+            )
+            if cursor.rowcount != num_specs:
+                raise Exception(f"Expected to create {num_specs} localizations, created "
+                                f"{cursor.rowcount}!")
+
+            # Create one ChangeLog for the batch and associate it with all objects.
+            cl = ChangeLog.objects.create(project=project, user=user,
+                                          description_of_change=change_dict)
+            cursor.execute(
+                f'INSERT INTO "{change_table}" ({change_columns}) '
+                f'SELECT %s, "id", %s FROM "{staging}"',
+                [ref_table.id, cl.id],
+            )
+            cursor.execute(f'DROP TABLE "{staging}"')
+
+    # Build ES documents from the specs rather than reloading the rows.
+    ts = TatorSearch()
+    documents = []
+    for idx, id_ in enumerate(ids):
+        loc = Localization(
+            id=id_,
+            project=project,
+            meta=metas[int(meta_ids[idx])],
+            media=medias[int(media_ids[idx])],
+            user=user,
+            attributes=attrs[idx],
+            created_by=user,
+            modified_by=user,
+            created_datetime=now,
+            modified_datetime=now,
+            modified=True,
+            version=versions[version_ids[idx]],
+            parent_id=parent_ids[idx],
+            frame=int(frames[idx]),
+            **{key: None if np.isnan(geometry[key][idx]) else float(geometry[key][idx])
+               for key in GEOMETRY_RANGES},
+        )
+        documents += ts.build_document(loc)
+        if len(documents) > ES_BATCH_SIZE:
+            ts.bulk_add_documents(documents)
+            documents = []
+    ts.bulk_add_documents(documents)
+    update_has_children(unique_parents)
+    notify_annotation_change(project.id, user, 'localization', 'create',
+                             zip(ids, media_ids.tolist()))
+    return ids
+
+def create_states(project, user, state_specs):
+    """ Creates states from a list of state specs, along with their media and
+        localization relations, ES documents and change logs. Returns a list of created
+        IDs in the order of the specs.
+    """
+    default_version = get_default_version(project, user)
+
+    # Find unique foreign keys.
+    meta_ids = set([state['type'] for state in state_specs])
+    version_ids = set([state.get('version', None) for state in state_specs])
+    version_ids.add(default_version.id)
+    localization_ids = set()
+    media_ids = set()
+    for state_spec in state_specs:
+        localization_ids.update(state_spec.get('localization_ids', []))
+        media_ids.update(state_spec['media_ids'])
+
+    # Make foreign key querysets.
+    meta_qs = StateType.objects.filter(pk__in=meta_ids)
+    version_qs = Version.objects.filter(pk__in=version_ids)
+    localization_qs = Localization.objects.filter(pk__in=localization_ids)
+    media_qs = Media.objects.filter(pk__in=media_ids)
+
+    # Construct foreign key dictionaries.
+    metas = {obj.id:obj for obj in meta_qs.iterator()}
+    versions = {obj.id:obj for obj in version_qs.iterator()}
+    versions[None] = default_version
+
+    # Make sure project of all foreign keys is correct.
+    meta_projects = list(meta_qs.values_list('project', flat=True).distinct())
+    version_projects = list(version_qs.values_list('project', flat=True).distinct())
+    localization_projects = list(localization_qs.values_list('project', flat=True).distinct())
+    media_projects = list(media_qs.values_list('project', flat=True).distinct())
+    if len(meta_projects) != 1:
+        raise Exception(f"Localization types must be part of project {project.id}, got "
+                        f"projects {meta_projects}!")
+    elif meta_projects[0] != project.id:
+        raise Exception(f"Localization types must be part of project {project.id}, got "
+                        f"project {meta_projects[0]}!")
+    if len(version_projects) != 1:
+        raise Exception(f"Versions must be part of project {project.id}, got projects "
+                        f"{version_projects}!")
+    elif version_projects[0] != project.id:
+        raise Exception(f"Versions must be part of project {project.id}, got project "
+                        f"{version_projects[0]}!")
+    if len(localization_ids) > 0:
+        if len(localization_projects) != 1:
+            raise Exception(f"Localizations must be part of project {project.id}, got projects "
+                            f"{localization_projects}!")
+        elif localization_projects[0] != project.id:
+            raise Exception(f"Localizations must be part of project {project.id}, got project "
+                            f"{localization_projects[0]}!")
+    if len(media_projects) != 1:
+        raise Exception(f"Media must be part of project {project.id}, got projects "
+                        f"{media_projects}!")
+    elif media_projects[0] != project.id:
+        raise Exception(f"Media must be part of project {project.id}, got project "
+                        f"{media_projects[0]}!")
+
+    # Get required fields for attributes.
+    required_fields = {id_:computeRequiredFields(metas[id_]) for id_ in meta_ids}
+    attr_specs = [check_required_fields(required_fields[state['type']][0],
+                                        required_fields[state['type']][2],
+                                        state)
+                  for state in state_specs]
+
+    # Create the state objects.
+    objs = (
+        State(
+            project=project,
+            meta=metas[state_spec["type"]],
+            attributes=attrs,
+            created_by=user,
+            modified_by=user,
+            version=versions[state_spec.get("version", None)],
+            frame=state_spec.get("frame", None),
+        )
+        for state_spec, attrs in zip(state_specs, attr_specs)
+    )
+    states = bulk_create_from_generator(objs, State)
+
+    # Create media and localization relations. These are bulk created so that m2m
+    # signals are not sent for each row.
+    State.media.through.objects.bulk_create([
+        State.media.through(state_id=state.id, media_id=media_id)
+        for state, state_spec in zip(states, state_specs)
+        for media_id in state_spec['media_ids']
+    ], batch_size=1000)
+    State.localizations.through.objects.bulk_create([
+        State.localizations.through(state_id=state.id, localization_id=localization_id)
+        for state, state_spec in zip(states, state_specs)
+        for localization_id in state_spec.get('localization_ids', [])
+    ], batch_size=1000)
+
+    # Calculate segments.
+    localization_ids = itertools.chain(*[state_spec.get('localization_ids', [])
+                                         for state_spec in state_specs])
+    loc_id_to_frame = {loc['id']:loc['frame'] for loc in
+                       Localization.objects.filter(pk__in=localization_ids)\
+                       .values('id', 'frame').iterator()}
+    for state, state_spec in zip(states, state_specs):
+        frames = [loc_id_to_frame[loc_id] for loc_id in state_spec.get('localization_ids', [])
+                  if loc_id_to_frame[loc_id] is not None]
+        if len(frames) > 0:
+            state.segments = compute_segments(frames)
+    State.objects.bulk_update(states, ['segments'], batch_size=1000)
+
+    # Build ES documents.
+    ts = TatorSearch()
+    documents = []
+    for state in states:
+        documents += ts.build_document(state)
+        if len(documents) > 1000:
+            ts.bulk_add_documents(documents)
+            documents = []
+    ts.bulk_add_documents(documents)
+
+    # Create ChangeLogs
+    objs = (
+        ChangeLog(
+            project=project, user=user, description_of_change=state.create_dict
+        )
+        for state in states
+    )
+    change_logs = bulk_create_from_generator(objs, ChangeLog)
+
+    # Associate ChangeLogs with created objects
+    ref_table = ContentType.objects.get_for_model(states[0])
+    ids = [state.id for state in states]
+    objs = (
+        ChangeToObject(ref_table=ref_table, ref_id=ref_id, change_id=cl)
+        for ref_id, cl in zip(ids, change_logs)
+    )
+    bulk_create_from_generator(objs, ChangeToObject)
+    notify_annotation_change(project.id, user, 'state', 'create',
+                             [(state_id, media_id)
+                              for state_id, state_spec in zip(ids, state_specs)
+                              for media_id in state_spec['media_ids']])
+
+    return ids
@@ -2,22 +2,53 @@
 from collections import defaultdict
 import logging
 
-from django.db.models import Subquery
+from django.db.models import Exists
+from django.db.models import OuterRef
 
 from ..models import Localization
 from ..models import State
+from ..models import Version
 from ..search import TatorSearch
 
 from ._media_query import query_string_to_media_ids
 from ._attribute_query import get_attribute_es_query
 from ._attribute_query import get_attribute_filter_ops
 from ._attribute_query import get_attribute_psql_queryset
+from ._util import get_queryset_validator
 
 logger = logging.getLogger(__name__)
 
 ANNOTATION_LOOKUP = {'localization': Localization,
                      'state': State}
 
+def _get_frame_range(params, annotation_type):
+    """ Returns the frame window of a localization query. Endpoints operating on
+        states use these parameters for their own purposes, so they are ignored here.
+    """
+    if annotation_type != 'localization':
+        return None, None
+    return params.get('frame_start'), params.get('frame_stop')
+
+def get_version_chain(project, version_id):
+    """ Returns IDs of a version and all of its bases, resolved transitively.
+    """
+    version = Version.objects.get(pk=version_id, project=project)
+    chain = [version.pk]
+    frontier = chain
+    while frontier:
+        bases = Version.bases.through.objects.filter(from_version__in=frontier)\
+                                             .values_list('to_version', flat=True)
+        frontier = list(set(bases) - set(chain))
+        chain += frontier
+    return chain
+
+def _exclude_overridden(qs, chain):
+    """ Excludes localizations that have been cloned into one of the given versions.
+    """
+    clones = Localization.objects.filter(parent=OuterRef('pk'), version__in=chain,
+                                         deleted=False)
+    return qs.annotate(overridden=Exists(clones)).filter(overridden=False)
+
 def get_annotation_es_query(project, params, annotation_type):
     """Converts annotation query string into a list of IDs and a count.
        annotation_type: Should be one of `localization` or `state`.
@@ -33,15 +64,17 @@ def get_annotation_es_query(project, params, annotation_type):
         state_ids = params.get('ids') # PUT request only
     filter_type = params.get('type')
     version = params.get('version')
+    effective_version = params.get('effective_version')
     frame = params.get('frame')
+    frame_start, frame_stop = _get_frame_range(params, annotation_type)
     exclude_parents = params.get('excludeParents')
     start = params.get('start')
     stop = params.get('stop')
     after = params.get('after')
 
-    if exclude_parents and (start or stop):
+    if effective_version is not None and (start or stop):
         raise Exception("Elasticsearch based queries with pagination are incompatible with "
-                        "'excludeParents'!")
+                        "'effective_version'!")
 
     if state_ids and (annotation_type == 'localization'):
         raise Exception("Elasticsearch based localization queries do not support 'state_ids'!")
@@ -102,9 +135,19 @@ def get_annotation_es_query(project, params, annotation_type):
         logger.info(f"version = {version}")
         annotation_bools.append({'terms': {'_annotation_version': version}})
 
+    if effective_version is not None:
+        chain = get_version_chain(project, effective_version)
+        annotation_bools.append({'terms': {'_annotation_version': chain}})
+
     if frame is not None:
         annotation_bools.append({'match': {'_frame': {'query': int(frame)}}})
 
+    if frame_start is not None:
+        annotation_bools.append({'range': {'_frame': {'gte': int(frame_start)}}})
+
+    if frame_stop is not None:
+        annotation_bools.append({'range': {'_frame': {'lt': int(frame_stop)}}})
+
     if start is not None:
         query['from'] = int(start)
         if start > 10000:
@@ -124,6 +167,9 @@ def get_annotation_es_query(project, params, annotation_type):
     if after is not None:
         annotation_bools.append({'range': {'_postgres_id': {'gt': after}}})
 
+    if exclude_parents and (annotation_type == 'localization'):
+        annotation_bools.append({'bool': {'must_not': [{'term': {'_has_children': True}}]}})
+
     # TODO: Remove modified parameter.
     query = get_attribute_es_query(params, query, media_bools, project, False,
                                    annotation_bools, True)
@@ -144,7 +190,9 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
         state_ids = params.get('ids') # PUT request only
     filter_type = params.get('type')
     version = params.get('version')
+    effective_version = params.get('effective_version')
     frame = params.get('frame')
+    frame_start, frame_stop = _get_frame_range(params, annotation_type)
     after = params.get('after')
     exclude_parents = params.get('excludeParents')
     start = params.get('start')
@@ -183,16 +231,27 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
     if version is not None:
         qs = qs.filter(version__in=version)
 
+    if effective_version is not None:
+        chain = get_version_chain(project, effective_version)
+        qs = qs.filter(version__in=chain)
+        if annotation_type == 'localization':
+            qs = _exclude_overridden(qs, chain)
+
     if frame is not None:
         qs = qs.filter(frame=frame)
 
+    if frame_start is not None:
+        qs = qs.filter(frame__gte=frame_start)
+
+    if frame_stop is not None:
+        qs = qs.filter(frame__lt=frame_stop)
+
     if after is not None:
         qs = qs.filter(pk__gt=after)
 
-    if exclude_parents:
-        parent_set = Localization.objects.filter(pk__in=Subquery(qs.values('parent')))
-        qs = qs.difference(parent_set)
-        
+    if exclude_parents and (annotation_type == 'localization'):
+        qs = qs.filter(has_children=False)
+
     # TODO: Remove modified parameter
     qs = qs.exclude(modified=False)
 
@@ -232,11 +291,10 @@ def get_annotation_queryset(project, params, annotation_type):
         annotation_ids, _  = TatorSearch().search(project, query)
         qs = ANNOTATION_LOOKUP[annotation_type].objects.filter(pk__in=annotation_ids)
 
-        # Apply excludeParents if no pagination.
-        exclude_parents = params.get('excludeParents')
-        if exclude_parents:
-            parent_set = ANNOTATION_LOOKUP[annotation_type].objects.filter(pk__in=Subquery(qs.values('parent')))
-            qs = qs.difference(parent_set)
+        # Clones are not indexed with their parents, so overrides are applied here.
+        effective_version = params.get('effective_version')
+        if effective_version is not None and annotation_type == 'localization':
+            qs = _exclude_overridden(qs, get_version_chain(project, effective_version))
 
         qs = qs.order_by('id')
     else:
@@ -252,13 +310,10 @@ def get_annotation_count(project, params, annotation_type):
         # If using ES, do the search and get the count.
         query = get_annotation_es_query(project, params, annotation_type)
         annotation_ids, _  = TatorSearch().search(project, query)
-
-        # Apply excludeParents if no pagination.
-        exclude_parents = params.get('excludeParents')
-        if exclude_parents:
+        effective_version = params.get('effective_version')
+        if effective_version is not None and annotation_type == 'localization':
             qs = ANNOTATION_LOOKUP[annotation_type].objects.filter(pk__in=annotation_ids)
-            parent_set = ANNOTATION_LOOKUP[annotation_type].objects.filter(pk__in=Subquery(qs.values('parent')))
-            qs = qs.difference(parent_set)
+            qs = _exclude_overridden(qs, get_version_chain(project, effective_version))
             count = qs.count()
         else:
             count = len(annotation_ids)
@@ -268,3 +323,13 @@ def get_annotation_count(project, params, annotation_type):
         count = qs.count()
     return count
 
+def get_annotation_validator(project, params, annotation_type):
+    """ Returns a validator for conditional GET of annotations, or None if the query
+        requires elasticsearch.
+    """
+    use_es, filter_ops = _use_es(project, params)
+    if use_es:
+        return None
+    params = {key: value for key, value in params.items() if key not in ['start', 'stop']}
+    qs = _get_annotation_psql_queryset(project, filter_ops, params, annotation_type)
+    return get_queryset_validator(project, qs)
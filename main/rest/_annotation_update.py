@@ -0,0 +1,180 @@
+""" Set-based updates of heterogeneous annotation values. """
+import datetime
+import json
+import logging
+
+from django.db import connection
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.contrib.contenttypes.models import ContentType
+
+from ..models import ChangeLog
+from ..models import ChangeToObject
+from ..models import Localization
+from ..models import LocalizationType
+from ..models import StateType
+from ..search import TatorSearch
+
+from ._annotation_query import ANNOTATION_LOOKUP
+from ._annotation_events import notify_annotation_change
+from ._attributes import convert_attribute_json
+from ._util import bulk_create_from_generator
+
+logger = logging.getLogger(__name__)
+
+# Columns that may be updated per object and their postgres types.
+UPDATE_COLUMNS = {
+    'localization': {
+        'x': 'double precision',
+        'y': 'double precision',
+        'u': 'double precision',
+        'v': 'double precision',
+        'width': 'double precision',
+        'height': 'double precision',
+        'frame': 'integer',
+    },
+    'state': {
+        'frame': 'integer',
+    },
+}
+
+TYPE_LOOKUP = {'localization': LocalizationType,
+               'state': StateType}
+
+def _validate_updates(updates, original, annotation_type):
+    """ Checks that only supported fields are updated and that attribute values are
+        valid for the type of each object. Attribute values are replaced with their
+        converted values.
+    """
+    columns = UPDATE_COLUMNS[annotation_type]
+    meta_ids = set(obj['meta'] for obj in original.values())
+    attr_types = {obj.id: {attr_type['name']: attr_type for attr_type in obj.attribute_types}
+                  for obj in TYPE_LOOKUP[annotation_type].objects.filter(pk__in=meta_ids)}
+    for id_, update in updates.items():
+        for key in update:
+            if key != 'attributes' and key not in columns:
+                raise Exception(f"Field '{key}' cannot be updated in bulk! Valid fields are "
+                                f"{list(columns.keys())} and 'attributes'.")
+        obj_attr_types = attr_types[original[id_]['meta']]
+        attributes = update.get('attributes', {})
+        for name, value in attributes.items():
+            if name not in obj_attr_types:
+                raise Exception(f"Invalid attribute {name} for {annotation_type} {id_}!")
+            attributes[name] = convert_attribute_json(obj_attr_types[name], value)
+
+def _change_dict(updates, original, annotation_type):
+    """ Returns a single change description covering all updated objects. Each entry
+        includes the ID of the object it applies to.
+    """
+    change_dict = {'old': [], 'new': []}
+    for id_, update in updates.items():
+        old = original[id_]
+        old_attributes = old['attributes'] or {}
+        for column in UPDATE_COLUMNS[annotation_type]:
+            if update.get(column) is not None and update[column] != old[column]:
+                change_dict['old'].append({'id': id_, 'name': f'_{column}', 'value': old[column]})
+                change_dict['new'].append({'id': id_, 'name': f'_{column}',
+                                           'value': update[column]})
+        for name, value in update.get('attributes', {}).items():
+            if value != old_attributes.get(name):
+                change_dict['old'].append({'id': id_, 'name': name,
+                                           'value': old_attributes.get(name)})
+                change_dict['new'].append({'id': id_, 'name': name, 'value': value})
+    return change_dict
+
+def bulk_update_annotations(project, user, updates, qs, annotation_type):
+    """ Applies a map of object ID to updated values in a single UPDATE statement.
+        Attributes are merged into existing attribute values. The queryset should
+        contain all objects in the map; an exception is raised otherwise.
+        annotation_type: Should be one of `localization` or `state`.
+    """
+    model = ANNOTATION_LOOKUP[annotation_type]
+    columns = UPDATE_COLUMNS[annotation_type]
+    updates = {int(id_): update for id_, update in updates.items()}
+    if not updates:
+        return 0
+
+    # Get current values for validation and the change log.
+    original = {obj['id']: obj for obj in
+                qs.values('id', 'meta', 'attributes', *columns.keys()).iterator()}
+    missing = set(updates.keys()) - set(original.keys())
+    if missing:
+        raise Exception(f"Could not find {annotation_type}s {sorted(missing)} in project "
+                        f"{project.id} matching query!")
+    _validate_updates(updates, original, annotation_type)
+
+    # Build the statement. Null values in a row leave the existing value unchanged.
+    table = model._meta.db_table
+    db_columns = [model._meta.get_field(column).column for column in columns]
+    set_clauses = [f'"{db_column}" = COALESCE(v."{db_column}", t."{db_column}")'
+                   for db_column in db_columns]
+    set_clauses += [
+        '"attributes" = COALESCE(t."attributes", \'{}\'::jsonb) || v."attributes"',
+        f'"{model._meta.get_field("modified_by").column}" = %s',
+        '"modified_datetime" = %s',
+        '"change_xid" = txid_current()',
+    ]
+    row = ', '.join(['%s'] + [f'%s::{dtype}' for dtype in columns.values()] + ['%s::jsonb'])
+    rows = []
+    values = [user.id, datetime.datetime.now(datetime.timezone.utc)]
+    for id_, update in updates.items():
+        rows.append(f'({row})')
+        values += [id_, *[update.get(column) for column in columns],
+                   json.dumps(update.get('attributes', {}))]
+    value_columns = ', '.join(['"id"'] + [f'"{db_column}"' for db_column in db_columns]
+                              + ['"attributes"'])
+    query = (f'UPDATE "{table}" AS t SET {", ".join(set_clauses)} '
+             f'FROM (VALUES {", ".join(rows)}) AS v({value_columns}) '
+             f'WHERE t."id" = v."id"')
+
+    pairs = list(qs.values_list('id', 'media'))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            count = cursor.rowcount
+        notify_annotation_change(project.id, user, annotation_type, 'update', pairs)
+
+        # Create a single ChangeLog entry and associate it with all updated objects.
+        cl = ChangeLog.objects.create(
+            project=project,
+            user=user,
+            description_of_change=_change_dict(updates, original, annotation_type),
+        )
+        ref_table = ContentType.objects.get_for_model(model)
+        objs = (ChangeToObject(ref_table=ref_table, ref_id=id_, change_id=cl)
+                for id_ in updates)
+        bulk_create_from_generator(objs, ChangeToObject)
+
+    # Reindex updated objects with one bulk request.
+    updated = model.objects.filter(pk__in=list(updates))\
+                           .select_related('project', 'meta__project', 'version',
+                                           'created_by', 'modified_by')
+    if annotation_type == 'localization':
+        updated = updated.select_related('media__meta', 'user', 'thumbnail_image')
+    else:
+        updated = updated.prefetch_related('media__meta').select_related('extracted__meta')
+    ts = TatorSearch()
+    documents = []
+    for obj in updated:
+        documents += ts.build_document(obj)
+    ts.bulk_add_documents(documents)
+    return count
+
+def update_has_children(parent_ids):
+    """ Recomputes the `has_children` flag of parent localizations and updates their
+        search documents. This should be called after children are created or deleted.
+    """
+    parent_ids = set(parent_id for parent_id in parent_ids if parent_id is not None)
+    if not parent_ids:
+        return
+    children = Localization.objects.filter(parent=OuterRef('pk'), deleted=False)
+    qs = Localization.objects.filter(pk__in=parent_ids, deleted=False)
+    qs.update(has_children=Exists(children))
+    qs = qs.select_related('project', 'meta__project', 'version', 'created_by',
+                           'modified_by', 'media__meta', 'user', 'thumbnail_image')
+    ts = TatorSearch()
+    documents = []
+    for obj in qs.iterator():
+        documents += ts.build_document(obj)
+    ts.bulk_add_documents(documents)
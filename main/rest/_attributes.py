@@ -206,6 +206,17 @@ def convert_attribute(attr_type, attr_val): #pylint: disable=too-many-branches
         val = Point(lon, lat) # Lon goes first in postgis
     return val
 
+def convert_attribute_json(attr_type, attr_val):
+    """Converts an attribute to its expected datatype with `convert_attribute` and
+       returns the result in a form that can be stored in an attributes JSON field.
+    """
+    val = convert_attribute(attr_type, attr_val)
+    if attr_type['dtype'] == 'datetime':
+        val = val.isoformat()
+    elif attr_type['dtype'] == 'geopos':
+        val = [val.x, val.y]
+    return val
+
 def validate_attributes(params, obj):
     """Validates attributes by looking up attribute type and attempting
        a type conversion.
@@ -1,16 +1,24 @@
 """ TODO: add documentation for this """
 import traceback
 import logging
+import hashlib
+import math
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import Throttled
 from rest_framework import status
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import response
 
 from ..schema import parse
 
+from ._render_cache import CLIENT_MAX_AGE
+from ._render_cache import get_render
+from ._render_cache import render_once
+from ._render_limits import render_slot
+
 from ..rest import _base_views
 
 logger = logging.getLogger(__name__)
@@ -31,6 +39,10 @@ def process_exception(exc):
         logger.error(f"Permission denied error: {str(exc)}")
         resp = Response({'message': str(exc)},
                         status=status.HTTP_403_FORBIDDEN)
+    elif isinstance(exc, Throttled):
+        resp = Response({'message': str(exc)},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS)
+        resp['Retry-After'] = str(math.ceil(exc.wait))
     else:
         logger.error(f"Exception in request: {traceback.format_exc()}")
         resp = Response({'message' : str(exc),
@@ -48,6 +60,87 @@ class GetMixin:
         resp = Response(response_data, status=status.HTTP_200_OK)
         return resp
 
+class ConditionalGetMixin:
+    #pylint: disable=redefined-builtin,unused-argument
+    """ Adds conditional GET support to a view.
+
+        Views using this mixin implement `_get_validator(params)`, which returns a
+        string that changes whenever the response would change, or None if the
+        response cannot be validated. The validator is combined with the request path
+        and response format into an ETag. If it matches the `If-None-Match` header a
+        304 response is returned without calling `_get`. This mixin must precede the
+        base view class.
+    """
+    def get(self, request, format=None, **kwargs):
+        """ TODO: add documentation for this """
+        params = parse(request)
+        validator = self._get_validator(params)
+        etag = None
+        if validator is not None:
+            key = f"{validator}|{request.get_full_path()}|{request.accepted_renderer.format}"
+            etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+            # Proxies that compress responses may weaken the ETag.
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+            if etag in tags:
+                resp = Response(status=status.HTTP_304_NOT_MODIFIED)
+                resp['ETag'] = etag
+                return resp
+        response_data = self._get(params)
+        resp = Response(response_data, status=status.HTTP_200_OK)
+        if etag is not None:
+            resp['ETag'] = etag
+        return resp
+
+class RenderCacheMixin:
+    #pylint: disable=redefined-builtin,unused-argument
+    """ Caches rendered media returned by a view.
+
+        Views using this mixin implement `_get_render_key(params)`, which returns a
+        key from `render_key` or None if the render should not be cached. Cached
+        renders are returned without calling `_get`, concurrent requests for the same
+        render are coalesced with `render_once`, and the key is used as a strong
+        ETag. Workers that compute a render take a slot from `render_slot`. This
+        mixin must precede the base view class of a detail view.
+    """
+    def get(self, request, format=None, **kwargs):
+        """ TODO: add documentation for this """
+        params = parse(request)
+        key = self._get_render_key(params)
+        if key is None:
+            with self._render_slot():
+                response_data = self._get(params)
+            return Response(response_data, status=status.HTTP_200_OK)
+        etag = f'"{key}"'
+        if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+            resp = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cached = get_render(key)
+            if cached is None:
+                # Only one worker computes a given render, others share its outcome.
+                # Only that worker takes a render slot.
+                def _compute():
+                    with self._render_slot():
+                        return self._get(params), request.accepted_renderer.format
+                cached = render_once(key, _compute)
+            # Views may switch the renderer for some outputs, such as animations.
+            response_data, render_format = cached
+            renderers = {renderer.format: renderer for renderer in self.renderer_classes}
+            request.accepted_renderer = renderers[render_format]()
+            request.accepted_media_type = request.accepted_renderer.media_type
+            resp = Response(response_data, status=status.HTTP_200_OK)
+        resp['ETag'] = etag
+        resp['Cache-Control'] = f'private, max-age={CLIENT_MAX_AGE}'
+        return resp
+
+    def _render_slot(self):
+        """ Returns a render slot for the project of the requested object.
+        """
+        project_id = self.get_queryset().filter(pk=self.kwargs['id'])\
+                                        .values_list('project', flat=True)[0]
+        return render_slot(self.request.user.id, project_id)
+
 class PostMixin:
     #pylint: disable=redefined-builtin,unused-argument
     """ TODO: add documentation for this """
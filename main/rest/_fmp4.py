@@ -0,0 +1,227 @@
+""" Assembly of clips from fragments of a fragmented mp4 without re-muxing.
+
+A clip is written as the init segment (ftyp and moov) of the source followed by the
+moof and mdat boxes of each frame range. Fragment sequence numbers and decode times
+are rewritten so that the clip plays as one continuous timeline starting at zero.
+Layouts that cannot be rewritten safely raise `ValueError`, in which case callers
+should fall back to ffmpeg.
+"""
+import logging
+import shutil
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Containers that are descended into when looking for boxes.
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'mvex', b'moof', b'traf'}
+
+# tfhd flags.
+TFHD_BASE_DATA_OFFSET = 0x000001
+TFHD_SAMPLE_DESCRIPTION_INDEX = 0x000002
+TFHD_DEFAULT_SAMPLE_DURATION = 0x000008
+
+# trun flags.
+TRUN_DATA_OFFSET = 0x000001
+TRUN_FIRST_SAMPLE_FLAGS = 0x000004
+TRUN_SAMPLE_DURATION = 0x000100
+TRUN_SAMPLE_SIZE = 0x000200
+TRUN_SAMPLE_FLAGS = 0x000400
+TRUN_SAMPLE_COMPOSITION_OFFSET = 0x000800
+
+def _boxes(data, start=0, end=None):
+    """ Yields (type, start, payload start, end) of each box in a range of a buffer.
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        if end - pos < 8:
+            raise ValueError(f"Truncated box header at offset {pos}!")
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size, = struct.unpack_from('>Q', data, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError(f"Invalid size of {box_type} box at offset {pos}!")
+        yield box_type, pos, pos + header, pos + size
+        pos += size
+
+def _find(data, path, start=0, end=None):
+    """ Returns (payload start, end) of every box matching a list of box types.
+    """
+    found = []
+    for box_type, _, payload, box_end in _boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            found.append((payload, box_end))
+        elif box_type in CONTAINER_BOXES:
+            found += _find(data, path[1:], payload, box_end)
+    return found
+
+def _full_box(data, payload):
+    """ Returns the version and flags of a full box.
+    """
+    version_flags, = struct.unpack_from('>I', data, payload)
+    return version_flags >> 24, version_flags & 0xffffff
+
+def _read_time(data, pos, version):
+    """ Reads a 64 bit field for version 1 boxes, otherwise a 32 bit field.
+    """
+    return struct.unpack_from('>Q' if version == 1 else '>I', data, pos)[0]
+
+def _write_time(data, pos, version, value):
+    if version != 1 and value > 0xffffffff:
+        raise ValueError(f"Time {value} does not fit a version 0 box!")
+    struct.pack_into('>Q' if version == 1 else '>I', data, pos, value)
+
+class _InitSegment:
+    """ Track defaults and timescales parsed from an init segment.
+    """
+    def __init__(self, data):
+        self.data = bytearray(data)
+        self.default_durations = {}
+        for payload, _ in _find(self.data, [b'moov', b'mvex', b'trex']):
+            track_id, _, duration = struct.unpack_from('>III', self.data, payload + 4)
+            self.default_durations[track_id] = duration
+        self.movie_timescale = None
+        for payload, _ in _find(self.data, [b'moov', b'mvhd']):
+            version, _ = _full_box(self.data, payload)
+            self.movie_timescale, = struct.unpack_from(
+                '>I', self.data, payload + (20 if version == 1 else 12))
+        self.timescales = {}
+        for trak, trak_end in _find(self.data, [b'moov', b'trak']):
+            tkhd = _find(self.data, [b'tkhd'], trak, trak_end)
+            mdhd = _find(self.data, [b'mdia', b'mdhd'], trak, trak_end)
+            if not tkhd or not mdhd:
+                raise ValueError("Track is missing tkhd or mdhd box!")
+            version, _ = _full_box(self.data, tkhd[0][0])
+            track_id, = struct.unpack_from('>I', self.data,
+                                           tkhd[0][0] + (20 if version == 1 else 12))
+            version, _ = _full_box(self.data, mdhd[0][0])
+            self.timescales[track_id], = struct.unpack_from(
+                '>I', self.data, mdhd[0][0] + (20 if version == 1 else 12))
+
+    def set_duration(self, durations):
+        """ Sets the fragment duration in the mehd box, if present, from per track
+            durations in media timescale.
+        """
+        mehd = _find(self.data, [b'moov', b'mvex', b'mehd'])
+        if not mehd or not self.movie_timescale or not durations:
+            return
+        duration = max(duration * self.movie_timescale // self.timescales[track_id]
+                       for track_id, duration in durations.items())
+        version, _ = _full_box(self.data, mehd[0][0])
+        _write_time(self.data, mehd[0][0] + 4, version, duration)
+
+class _Fragment:
+    """ Decode times and durations of the tracks of a moof box.
+    """
+    def __init__(self, data, default_durations):
+        self.data = bytearray(data)
+        boxes = list(_boxes(self.data))
+        if len(boxes) != 1 or boxes[0][0] != b'moof':
+            raise ValueError("Fragment does not start with a moof box!")
+        self.tracks = {}
+        for traf, traf_end in _find(self.data, [b'moof', b'traf']):
+            tfhd = _find(self.data, [b'tfhd'], traf, traf_end)
+            tfdt = _find(self.data, [b'tfdt'], traf, traf_end)
+            if not tfhd or not tfdt:
+                raise ValueError("Fragment is missing tfhd or tfdt box!")
+            _, flags = _full_box(self.data, tfhd[0][0])
+            if flags & TFHD_BASE_DATA_OFFSET:
+                raise ValueError("Fragments with absolute data offsets are not supported!")
+            track_id, = struct.unpack_from('>I', self.data, tfhd[0][0] + 4)
+            pos = tfhd[0][0] + 8
+            if flags & TFHD_SAMPLE_DESCRIPTION_INDEX:
+                pos += 4
+            default_duration = default_durations.get(track_id, 0)
+            if flags & TFHD_DEFAULT_SAMPLE_DURATION:
+                default_duration, = struct.unpack_from('>I', self.data, pos)
+            duration = sum(self._trun_duration(trun, default_duration)
+                           for trun, _ in _find(self.data, [b'trun'], traf, traf_end))
+            version, _ = _full_box(self.data, tfdt[0][0])
+            decode_time = _read_time(self.data, tfdt[0][0] + 4, version)
+            self.tracks[track_id] = (tfdt[0][0], version, decode_time, duration)
+
+    def _trun_duration(self, trun, default_duration):
+        _, flags = _full_box(self.data, trun)
+        sample_count, = struct.unpack_from('>I', self.data, trun + 4)
+        if not flags & TRUN_SAMPLE_DURATION:
+            return sample_count * default_duration
+        pos = trun + 8
+        if flags & TRUN_DATA_OFFSET:
+            pos += 4
+        if flags & TRUN_FIRST_SAMPLE_FLAGS:
+            pos += 4
+        fields = [TRUN_SAMPLE_DURATION, TRUN_SAMPLE_SIZE, TRUN_SAMPLE_FLAGS,
+                  TRUN_SAMPLE_COMPOSITION_OFFSET]
+        stride = 4 * sum(1 for field in fields if flags & field)
+        return sum(struct.unpack_from('>I', self.data, pos + idx * stride)[0]
+                   for idx in range(sample_count))
+
+    def rewrite(self, sequence_number, shifts):
+        """ Returns the moof box with a new sequence number and decode times shifted
+            by the given amount per track.
+        """
+        for payload, _ in _find(self.data, [b'moof', b'mfhd']):
+            struct.pack_into('>I', self.data, payload + 4, sequence_number)
+        for track_id, (tfdt, version, decode_time, _) in self.tracks.items():
+            _write_time(self.data, tfdt + 4, version, decode_time + shifts[track_id])
+        return bytes(self.data)
+
+def assemble_clip(out_fp, header_paths, range_paths):
+    """ Writes a clip made of fragments of a fragmented mp4.
+
+        out_fp: File-like object the clip is written to.
+        header_paths: Paths of files containing the ftyp and moov boxes.
+        range_paths: For each range of the clip, paths of files containing its moof
+            and mdat boxes in order. Each range must start with a moof box.
+
+        Raises `ValueError` if the fragments cannot be assembled.
+    """
+    header = b''
+    for path in header_paths:
+        with open(path, 'rb') as f_p:
+            header += f_p.read()
+    init = _InitSegment(header)
+
+    # Read the moof boxes and compute the decode time shift of each range.
+    plan = []
+    next_times = {}
+    for paths in range_paths:
+        shifts = None
+        for path in paths:
+            with open(path, 'rb') as f_p:
+                box_type = f_p.read(8)[4:]
+                if box_type != b'moof':
+                    if shifts is None:
+                        raise ValueError(f"Clip range starts with a {box_type} box!")
+                    plan.append((path, None, None))
+                    continue
+                f_p.seek(0)
+                fragment = _Fragment(f_p.read(), init.default_durations)
+            if shifts is None:
+                shifts = {track_id: next_times.get(track_id, 0) - decode_time
+                          for track_id, (_, _, decode_time, _) in fragment.tracks.items()}
+            for track_id, (_, _, decode_time, duration) in fragment.tracks.items():
+                if track_id not in shifts:
+                    raise ValueError(f"Track {track_id} is missing from the first "
+                                     f"fragment of a clip range!")
+                next_times[track_id] = decode_time + shifts[track_id] + duration
+            plan.append((path, fragment, shifts))
+
+    init.set_duration(next_times)
+    out_fp.write(bytes(init.data))
+    sequence_number = 0
+    for path, fragment, shifts in plan:
+        if fragment is None:
+            with open(path, 'rb') as f_p:
+                shutil.copyfileobj(f_p, out_fp)
+        else:
+            sequence_number += 1
+            out_fp.write(fragment.rewrite(sequence_number, shifts))
+    logger.info(f"Assembled clip from {sequence_number} fragments in "
+                f"{len(range_paths)} ranges.")
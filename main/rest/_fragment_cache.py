@@ -0,0 +1,152 @@
+""" On-disk cache of byte ranges of objects in storage.
+
+Fragments are stored as files under a directory shared by all workers on a host,
+keyed by object path, offset and size. Files are touched when they are used and the
+least recently used files are removed when the cache exceeds its size limit.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from ..cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('FRAGMENT_CACHE_DIR',
+                      os.path.join(tempfile.gettempdir(), 'fragment_cache'))
+
+# Maximum size of the cache in bytes.
+MAX_CACHE_BYTES = int(os.getenv('FRAGMENT_CACHE_BYTES', str(2 * 1024 ** 3)))
+
+# Maximum size of a single coalesced range request.
+MAX_RANGE_BYTES = 32 * 1024 * 1024
+
+# Fragments used within this many seconds are never evicted, so that paths returned
+# to a caller remain valid while it reads them.
+MIN_EVICTION_AGE = 60
+
+# Number of concurrent range requests per process.
+FETCH_THREADS = 8
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_THREADS)
+_written = 0
+_written_lock = threading.Lock()
+
+def _fragment_path(path, offset, size):
+    digest = hashlib.sha1(f'{path}:{offset}:{size}'.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], digest)
+
+def _coalesce(fragments):
+    """ Groups fragments into lists of contiguous fragments, each no larger than
+        MAX_RANGE_BYTES in total.
+    """
+    ranges = []
+    for offset, size in sorted(fragments):
+        if ranges:
+            first_offset = ranges[-1][0][0]
+            last_offset, last_size = ranges[-1][-1]
+            end = last_offset + last_size
+            if end == offset and end + size - first_offset <= MAX_RANGE_BYTES:
+                ranges[-1].append((offset, size))
+                continue
+        ranges.append([(offset, size)])
+    return ranges
+
+def _store(fragment_path, data):
+    """ Writes a fragment atomically, so readers in other workers never see a
+        partial file.
+    """
+    directory = os.path.dirname(fragment_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f_p:
+        f_p.write(data)
+    os.replace(temp_path, fragment_path)
+
+def _fetch_range(storage, path, fragments):
+    """ Retrieves contiguous fragments with one range request and stores them.
+    """
+    start = fragments[0][0]
+    stop = fragments[-1][0] + fragments[-1][1] - 1 # Byte range is inclusive
+    body = storage.get_object(path, start=start, stop=stop)
+    for offset, size in fragments:
+        _store(_fragment_path(path, offset, size), body[offset - start:offset - start + size])
+    return len(body)
+
+def _evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_idle=None):
+    """ Removes least recently used files until the cache is below 90% of its size
+        limit. If max_idle is given, files unused for that many seconds are removed
+        as well.
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            fragment_path = os.path.join(root, name)
+            try:
+                stat = os.stat(fragment_path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fragment_path))
+            total += stat.st_size
+    if not entries:
+        return
+    entries.sort()
+    min_mtime = max(mtime for mtime, _, _ in entries) - MIN_EVICTION_AGE
+    idle_mtime = -1 if max_idle is None else time.time() - max_idle
+    target = int(0.9 * max_bytes) if total > max_bytes else total
+    for mtime, size, fragment_path in entries:
+        if (total <= target and mtime >= idle_mtime) or mtime > min_mtime:
+            break
+        try:
+            os.remove(fragment_path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+def _record_write(num_bytes):
+    """ Scans the cache for eviction after every tenth of its size is written by
+        this process.
+    """
+    global _written
+    with _written_lock:
+        _written += num_bytes
+        if _written < MAX_CACHE_BYTES // 10:
+            return
+        _written = 0
+    _evict()
+
+def get_fragments(storage, path, fragments):
+    """ Returns a dict mapping (offset, size) tuples to local files containing those
+        bytes of an object. Missing fragments are fetched concurrently, with adjacent
+        fragments coalesced into single range requests.
+    """
+    paths = {}
+    missing = []
+    hit_bytes = 0
+    for offset, size in set(fragments):
+        fragment_path = _fragment_path(path, offset, size)
+        try:
+            # Mark the fragment as recently used.
+            os.utime(fragment_path)
+            hit_bytes += size
+        except FileNotFoundError:
+            missing.append((offset, size))
+        paths[(offset, size)] = fragment_path
+
+    futures = [_executor.submit(_fetch_range, storage, path, group)
+               for group in _coalesce(missing)]
+    fetched_bytes = sum(future.result() for future in futures)
+    if fetched_bytes:
+        _record_write(fetched_bytes)
+
+    TatorCache().record_fragment_stats(len(paths) - len(missing), len(missing), hit_bytes,
+                                       fetched_bytes)
+    logger.info(f"Fragment cache for {path}: {len(paths) - len(missing)} hits "
+                f"({hit_bytes} bytes saved), {len(missing)} misses in {len(futures)} "
+                f"requests ({fetched_bytes} bytes fetched).")
+    return paths
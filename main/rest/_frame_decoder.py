@@ -0,0 +1,134 @@
+""" In-process decoding and encoding of video frames with PyAV. """
+from fractions import Fraction
+import io
+import logging
+
+from PIL import Image
+
+try:
+    import av
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of frames sampled to compute the palette of a GIF.
+MAX_PALETTE_FRAMES = 32
+
+def decoder_available():
+    """ Returns true if PyAV is installed.
+    """
+    return av is not None
+
+def decode_frames(buf, offsets):
+    """ Decodes frames from a buffer containing an mp4 init segment followed by one or
+        more media fragments.
+
+        buf: File-like object containing the video.
+        offsets: Frame offsets relative to the first frame in the buffer.
+
+        Yields tuples of offset and RGB array of shape (height, width, 3) in decode
+        order, so callers can process each frame before the next one is decoded.
+    """
+    wanted = set(offsets)
+    last = max(wanted)
+    found = set()
+    container = av.open(buf, mode='r')
+    try:
+        stream = container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        for idx, frame in enumerate(container.decode(stream)):
+            if idx in wanted:
+                found.add(idx)
+                yield idx, frame.to_ndarray(format='rgb24')
+            if idx >= last:
+                break
+    finally:
+        container.close()
+    missing = wanted - found
+    if missing:
+        raise ValueError(f"Failed to decode frame offsets {sorted(missing)} from fragment!")
+
+def crop_array(array, roi, width, height):
+    """ Crops an RGB array to a region of interest given as relative (width, height,
+        x, y), using the same rounding and clamping as the ffmpeg crop filter.
+
+        width, height: Dimensions of the media in pixels that the ROI is relative to.
+    """
+    crop_w = max(0, min(round(roi[0] * width), width))
+    crop_h = max(0, min(round(roi[1] * height), height))
+    crop_x = max(0, min(round(roi[2] * width), width))
+    crop_y = max(0, min(round(roi[3] * height), height))
+    crop_w = min(crop_w, array.shape[1])
+    crop_h = min(crop_h, array.shape[0])
+    crop_x = min(crop_x, array.shape[1] - crop_w)
+    crop_y = min(crop_y, array.shape[0] - crop_h)
+    return array[crop_y:crop_y + crop_h, crop_x:crop_x + crop_w]
+
+def encode_tile(images, columns, rows, render_format):
+    """ Tiles PIL images row by row into a grid with cells the size of the largest
+        image and returns the encoded result.
+    """
+    cell_w = max(image.size[0] for image in images)
+    cell_h = max(image.size[1] for image in images)
+    if len(images) == 1:
+        tile = images[0]
+    else:
+        tile = Image.new('RGB', (columns * cell_w, rows * cell_h))
+        for idx, image in enumerate(images):
+            tile.paste(image, ((idx % columns) * cell_w, (idx // columns) * cell_h))
+    img_buf = io.BytesIO()
+    if render_format == "jpg":
+        tile.save(img_buf, "jpeg", quality=90)
+    elif render_format == "gif":
+        tile.save(img_buf, "gif")
+    else:
+        tile.save(img_buf, "png")
+    return img_buf.getvalue()
+
+def _uniform_size(images):
+    """ Resizes images to the size of the first image, like ffmpeg does when the
+        size of input frames changes.
+    """
+    size = images[0].size
+    return [image if image.size == size else image.resize(size) for image in images]
+
+def encode_gif(images, fps):
+    """ Encodes PIL images as an animated GIF and returns the encoded result. One
+        palette is computed from all frames, like the ffmpeg palettegen and
+        paletteuse filters.
+    """
+    images = _uniform_size(images)
+    width, height = images[0].size
+    sample = images[::max(1, len(images) // MAX_PALETTE_FRAMES)][:MAX_PALETTE_FRAMES]
+    strip = Image.new('RGB', (width, height * len(sample)))
+    for idx, image in enumerate(sample):
+        strip.paste(image.convert('RGB'), (0, idx * height))
+    palette = strip.quantize(colors=256)
+    frames = [image.convert('RGB').quantize(palette=palette) for image in images]
+    img_buf = io.BytesIO()
+    frames[0].save(img_buf, "gif", save_all=True, append_images=frames[1:],
+                   duration=round(1000 / float(fps)), loop=0)
+    return img_buf.getvalue()
+
+def encode_mp4(images, fps):
+    """ Encodes PIL images as an H.264 mp4 in memory and returns the encoded result.
+    """
+    images = _uniform_size(images)
+    buf = io.BytesIO()
+    container = av.open(buf, mode='w', format='mp4')
+    try:
+        stream = container.add_stream('h264', rate=Fraction(fps).limit_denominator(1001))
+        # Dimensions must be even for yuv420p.
+        stream.width = max(2, images[0].size[0] // 2 * 2)
+        stream.height = max(2, images[0].size[1] // 2 * 2)
+        stream.pix_fmt = 'yuv420p'
+        for image in images:
+            frame = av.VideoFrame.from_image(image.convert('RGB'))
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    finally:
+        container.close()
+    return buf.getvalue()
@@ -0,0 +1,100 @@
+""" Vectorized interpolation of track keyframes. """
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Geometry columns that are interpolated, in output order.
+INTERPOLATION_COLUMNS = ['x', 'y', 'width', 'height']
+
+# Interpolation methods supported by the server, indexed by method code.
+INTERPOLATION_METHODS = ['none', 'latest', 'nearest', 'linear']
+
+# Maximum number of output rows for one request.
+MAX_INTERPOLATED_ROWS = 10000000
+
+def method_code(method):
+    """ Returns the integer code for an interpolation method. State type methods that
+        are only meaningful to the web interface fall back to `latest`.
+    """
+    if method in INTERPOLATION_METHODS:
+        return INTERPOLATION_METHODS.index(method)
+    return INTERPOLATION_METHODS.index('latest')
+
+def interpolate_tracks(keyframes, methods, frame_start=0, frame_stop=None):
+    """ Computes dense per-frame values for many tracks at once.
+
+        keyframes: Array of shape (N, 2 + len(INTERPOLATION_COLUMNS)) containing track
+            ID, frame, and geometry of each keyframe. Missing geometry is NaN.
+        methods: Dict mapping track ID to interpolation method name.
+        frame_start: First frame to output (inclusive).
+        frame_stop: Last frame to output (exclusive). If None, output continues to the
+            last keyframe of each track.
+
+        Returns a dict of 1D arrays keyed by `state`, `frame` and the interpolation
+        columns. Each track spans from its first to last keyframe.
+    """
+    num_columns = len(INTERPOLATION_COLUMNS)
+    empty = {'state': np.zeros(0, dtype=np.int32), 'frame': np.zeros(0, dtype=np.int32),
+             **{col: np.zeros(0) for col in INTERPOLATION_COLUMNS}}
+    keyframes = np.asarray(keyframes, dtype=np.float64).reshape(-1, 2 + num_columns)
+    if keyframes.shape[0] == 0:
+        return empty
+
+    # Sort keyframes by track and frame, keeping one keyframe per frame of a track.
+    track_ids = keyframes[:, 0].astype(np.int64)
+    frames = keyframes[:, 1].astype(np.int64)
+    order = np.lexsort((frames, track_ids))
+    track_ids, frames, values = track_ids[order], frames[order], keyframes[order, 2:]
+    stride = int(frames.max()) + 2
+    keys = track_ids * stride + frames
+    keys, first = np.unique(keys, return_index=True)
+    track_ids, frames, values = track_ids[first], frames[first], values[first]
+
+    # Find the output frame range of each track.
+    tracks, track_first = np.unique(track_ids, return_index=True)
+    track_last = np.append(track_first[1:], track_ids.size) - 1
+    lo = np.maximum(frames[track_first], frame_start)
+    hi = frames[track_last]
+    if frame_stop is not None:
+        hi = np.minimum(hi, frame_stop - 1)
+    lengths = np.maximum(hi - lo + 1, 0)
+    total = int(lengths.sum())
+    if total > MAX_INTERPOLATED_ROWS:
+        raise Exception(f"Interpolation would produce {total} rows, limit is "
+                        f"{MAX_INTERPOLATED_ROWS}! Use a smaller frame range or fewer "
+                        f"tracks.")
+    if total == 0:
+        return empty
+
+    # Expand to one row per output frame.
+    track_idx = np.repeat(np.arange(tracks.size), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    out_frames = lo[track_idx] + np.arange(total) - offsets[track_idx]
+    out_tracks = tracks[track_idx]
+
+    # Locate surrounding keyframes. Output frames never precede the first keyframe of
+    # their track or follow the last, so both indices stay within the same track.
+    out_keys = out_tracks * stride + out_frames
+    prev = np.searchsorted(keys, out_keys, side='right') - 1
+    nxt = np.minimum(prev + 1, keys.size - 1)
+    same_track = track_ids[nxt] == out_tracks
+    nxt = np.where(same_track, nxt, prev)
+    span = frames[nxt] - frames[prev]
+    alpha = np.divide(out_frames - frames[prev], span, out=np.zeros(total), where=span > 0)
+
+    # Apply the method of each track.
+    codes = np.array([method_code(methods.get(int(track))) for track in tracks])[track_idx]
+    linear = values[prev] + alpha[:, None] * (values[nxt] - values[prev])
+    nearest = np.where((alpha > 0.5)[:, None], values[nxt], values[prev])
+    out_values = values[prev]
+    out_values = np.where((codes == method_code('linear'))[:, None], linear, out_values)
+    out_values = np.where((codes == method_code('nearest'))[:, None], nearest, out_values)
+    keep = (codes != method_code('none')) | (frames[prev] == out_frames)
+
+    out = {'state': out_tracks[keep].astype(np.int32),
+           'frame': out_frames[keep].astype(np.int32)}
+    for idx, col in enumerate(INTERPOLATION_COLUMNS):
+        out[col] = out_values[keep, idx]
+    return out
@@ -2,6 +2,8 @@
 
 import logging
 
+from ..cache import TatorCache
+
 logger = logging.getLogger(__name__)
 
 def node_to_job_node(node):
@@ -39,3 +41,30 @@ def workflow_to_job(workflow):
         job['nodes'] = []
     return job
 
+def import_to_job(record):
+    """ Converts an import job record from the cache to a job.
+    """
+    job = {
+        'id': record['uid'],
+        'uid': record['uid'],
+        'gid': record['gid'],
+        'project': record['project'],
+        'user': record['user'],
+        'status': record['status'],
+        'nodes': [],
+    }
+    if job['status'] in ['Pending', 'Running'] and TatorCache().job_cancelled(record['uid']):
+        job['status'] = 'Cancelled'
+    for key in ['start_time', 'stop_time', 'progress', 'processed', 'created', 'errors']:
+        if key in record:
+            job[key] = record[key]
+    return job
+
+def cancel_import(record):
+    """ Requests cancellation of an import job. The import worker stops after its
+        current batch. Returns 1 if the job was cancelled, 0 if it had already finished.
+    """
+    if record['status'] not in ['Pending', 'Running']:
+        return 0
+    TatorCache().cancel_job(record['uid'])
+    return 1
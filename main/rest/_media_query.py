@@ -12,6 +12,7 @@ from ._attribute_query import get_attribute_es_query
 from ._attribute_query import get_attribute_filter_ops
 from ._attribute_query import get_attribute_psql_queryset
 from ._attributes import KV_SEPARATOR
+from ._util import get_queryset_validator
 
 logger = logging.getLogger(__name__)
 
@@ -285,6 +286,17 @@ def get_media_count(project, params):
         count = qs.count()
     return count
 
+def get_media_validator(project, params):
+    """ Returns a validator for conditional GET of media, or None if the query
+        requires elasticsearch.
+    """
+    use_es, section_uuid, filter_ops = _use_es(project, params)
+    if use_es:
+        return None
+    params = {key: value for key, value in params.items() if key not in ['start', 'stop']}
+    qs = _get_media_psql_queryset(project, section_uuid, filter_ops, params)
+    return get_queryset_validator(project, qs)
+
 def query_string_to_media_ids(project_id, url):
     """ TODO: add documentation for this """
     params = dict(urllib_parse.parse_qsl(urllib_parse.urlsplit(url).query))
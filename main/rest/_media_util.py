@@ -1,20 +1,33 @@
 """ TODO: add documentation for this """
 import logging
 import os
-import json
 import subprocess
 import math
 import io
+import shutil
 import textwrap
 import mmap
 import sys
+import time
 
 from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
 
+from ..cache import TatorCache
 from ..store import get_storage_lookup
 from ..models import Resource
 
+from ._fmp4 import assemble_clip
+from ._fragment_cache import get_fragments
+from ._frame_decoder import crop_array
+from ._frame_decoder import decode_frames
+from ._frame_decoder import decoder_available
+from ._frame_decoder import encode_gif
+from ._frame_decoder import encode_mp4
+from ._frame_decoder import encode_tile
+from ._segment_index import HEADER_SEGMENTS
+from ._segment_index import get_segment_index
+
 logger = logging.getLogger(__name__)
 
 class MediaUtil:
@@ -23,7 +36,7 @@ class MediaUtil:
         self._temp_dir = temp_dir
         # If available we only attempt to fetch
         # the part of the file we need to
-        self._segment_info = None
+        self._segment_index = None
         resources = Resource.objects.filter(media__in=[video])
         store_lookup = get_storage_lookup(resources)
 
@@ -47,11 +60,7 @@ class MediaUtil:
             self._height = video.media_files["streaming"][quality_idx]["resolution"][0]
             self._width = video.media_files["streaming"][quality_idx]["resolution"][1]
             segment_file = video.media_files["streaming"][quality_idx]["segment_info"]
-            f_p = io.BytesIO()
-            self._storage.download_fileobj(segment_file, f_p)
-            self._segment_info = json.loads(f_p.getvalue().decode('utf-8'))
-            self._moof_data = [(i,x) for i,x in enumerate(self._segment_info
-                                                          ['segments']) if x['name'] == 'moof']
+            self._segment_index = get_segment_index(self._storage, segment_file)
         elif "image" in video.media_files:
             if quality is None:
                 # Select highest quality if not specified
@@ -72,48 +81,11 @@ class MediaUtil:
 
     def _get_impacted_segments(self, frames):
         """ TODO: add documentation for this """
-        if self._segment_info is None:
+        if self._segment_index is None:
             return None
 
-        segment_list = []
-        for frame_str in frames:
-            frame_seg = set()
-            frame_seg.add(0)
-            frame_seg.add(1)
-            # We already load the header so ignore those segments
-            frame = int(frame_str)
-            min_idx = 0
-            max_idx = len(self._moof_data)-1
-            # Handle frames and files with frame biases
-            if frame < self._moof_data[0][1]['frame_start']:
-                frame_seg.add(self._moof_data[0][0])
-                continue
-
-            last_segment = self._moof_data[max_idx][1] #Frame start/stop is in the moof
-            if frame >= last_segment['frame_start'] + last_segment['frame_samples']:
-                continue
-
-            # Do a binary search for the segment in question
-            while min_idx <= max_idx:
-                guess_idx = math.floor((max_idx + min_idx) / 2)
-                moof = self._moof_data[guess_idx][1]
-                if frame < moof['frame_start']:
-                    max_idx = max_idx - 1
-                elif frame >= moof['frame_start'] + moof['frame_samples']:
-                    min_idx = min_idx + 1
-                else:
-                    frame_seg.add(self._moof_data[guess_idx][0])
-                    frame_seg.add(self._moof_data[guess_idx][0]+1)
-                    if frame - moof['frame_start'] > moof['frame_samples'] - 5:
-                        # Handle boundary conditions
-                        if guess_idx + 1 in self._moof_data:
-                            frame_seg.add(self._moof_data[guess_idx+1][0])
-                            frame_seg.add(self._moof_data[guess_idx+1][0]+1)
-                    break
-
-            frame_seg = list(frame_seg)
-            frame_seg.sort()
-            segment_list.append((frame, frame_seg))
+        segment_list = self._segment_index.get_impacted_segments(
+            [int(frame) for frame in frames])
         logger.info(f"Given {frames}, we need {segment_list}")
         return segment_list
 
@@ -145,43 +117,88 @@ class MediaUtil:
             cloud storage """
         lookup = {}
         segment_info = []
-        for frame, segments in segment_list:
+        segments = self._segment_index.segments
+        fragments = [(int(segments[segment_idx]['offset']), int(segments[segment_idx]['size']))
+                     for _, frame_segments in segment_list
+                     for segment_idx in frame_segments]
+        fragment_paths = get_fragments(self._storage, self._video_file, fragments)
+        for frame, frame_segments in segment_list:
             temp_video = os.path.join(self._temp_dir, f"{frame}.mp4")
-            preferred_block_size = 16*1024
-            sc_graph = [(0, 0)]
             segment_frame_start = sys.maxsize
-            segment_num_frames = 0
-            # create a scatter/gather
-            for segment_idx in segments:
-                segment = self._segment_info['segments'][segment_idx]
-                last_io = sc_graph[len(sc_graph)-1]
-                if segment.get('frame_start', sys.maxsize) < segment_frame_start:
-                    segment_frame_start = segment['frame_start']
-
-                if 'frame_samples' in segment:
-                    segment_info.append({
-                        'frame_start': segment['frame_start'],
-                        'num_frames': segment['frame_samples']})
+            with open(temp_video, "wb") as out_fp:
+                for segment_idx in frame_segments:
+                    segment = segments[segment_idx]
+                    if segment['frame_start'] >= 0:
+                        segment_frame_start = min(segment_frame_start,
+                                                  int(segment['frame_start']))
 
-                if last_io[0] + last_io[1] == segment['offset']:
-                    # merge contigous blocks
-                    sc_graph[len(sc_graph)-1] = (last_io[0], last_io[1] + segment['size'])
-                else:
-                    # A new block
-                    sc_graph.append((segment['offset'], segment['size']))
+                    if segment['frame_samples'] >= 0:
+                        segment_info.append({
+                            'frame_start': int(segment['frame_start']),
+                            'num_frames': int(segment['frame_samples'])})
 
-            lookup[frame] = (segment_frame_start, temp_video)
+                    fragment = (int(segment['offset']), int(segment['size']))
+                    with open(fragment_paths[fragment], "rb") as fragment_fp:
+                        shutil.copyfileobj(fragment_fp, out_fp)
 
-            logger.info(f"Scatter gather graph = {sc_graph}")
-            with open(temp_video, "wb") as out_fp:
-                for scatter in sc_graph:
-                    start = scatter[0]
-                    stop = scatter[0] + scatter[1] - 1 # Byte range is inclusive
-                    body = self._storage.get_object(self._video_file, start=start, stop=stop)
-                    out_fp.write(body)
+            lookup[frame] = (segment_frame_start, temp_video)
 
         return lookup, segment_info
 
+    def _decode_frames(self, frames):
+        """ Decodes frames in process into RGB arrays. Frames on consecutive
+            fragments are decoded together in one forward pass, so dense frame sets
+            such as tracks cost one decode of their covering fragments.
+
+            Yields tuples of frame and array, one frame at a time, so that callers
+            only hold one full resolution frame in memory.
+        """
+        runs = self._segment_index.get_decode_runs(frames)
+        segments = self._segment_index.segments
+        fragments = [(int(segments[segment_idx]['offset']), int(segments[segment_idx]['size']))
+                     for run_segments, _, _ in runs
+                     for segment_idx in run_segments]
+        fragment_paths = get_fragments(self._storage, self._video_file, fragments)
+
+        found = set()
+        for run_segments, run_frame_start, run_frames in runs:
+            buf = io.BytesIO()
+            for segment_idx in run_segments:
+                segment = segments[segment_idx]
+                fragment = (int(segment['offset']), int(segment['size']))
+                with open(fragment_paths[fragment], "rb") as fragment_fp:
+                    shutil.copyfileobj(fragment_fp, buf)
+            buf.seek(0)
+            for offset, array in decode_frames(buf, [frame - run_frame_start
+                                                     for frame in run_frames]):
+                found.add(run_frame_start + offset)
+                yield run_frame_start + offset, array
+
+        for frame in frames:
+            if frame not in found:
+                raise ValueError(f"Failed to find frame {frame} in segmented mp4!")
+
+    def _render_images(self, frames, rois=None, force_scale=None):
+        """ Decodes frames in process and returns them as PIL images, cropped to
+            their ROIs and scaled. Each frame is cropped and scaled as soon as it is
+            decoded, so only the processed images are kept.
+        """
+        frames = [int(frame) for frame in frames]
+        positions = {}
+        for idx, frame in enumerate(frames):
+            positions.setdefault(frame, []).append(idx)
+        images = [None] * len(frames)
+        for frame, array in self._decode_frames(frames):
+            for idx in positions.get(frame, []):
+                crop = array
+                if rois:
+                    crop = crop_array(array, rois[idx], self._width, self._height)
+                image = Image.fromarray(crop)
+                if rois and force_scale:
+                    image = image.resize(force_scale)
+                images[idx] = image
+        return images
+
     def _frame_to_time_str(self, frame, relative_to=None):
         """ TODO: add documentation for this """
         if relative_to:
@@ -245,17 +262,77 @@ class MediaUtil:
             procs.append(subprocess.run(args, check=True, capture_output=True))
         return any([proc.returncode == 0 for proc in procs])
 
-    def get_clip(self, frame_ranges):
+    def _assemble_clip(self, impacted_segments, output_file):
+        """ Writes a clip directly from the fragments of the streaming file, without
+            intermediate files or ffmpeg.
+        """
+        segments = self._segment_index.segments
+        def fragment(segment_idx):
+            return (int(segments[segment_idx]['offset']), int(segments[segment_idx]['size']))
+        fragments = [fragment(segment_idx) for segment_idx in HEADER_SEGMENTS]
+        fragments += [fragment(segment_idx)
+                      for _, range_segments in impacted_segments
+                      for segment_idx in range_segments]
+        fragment_paths = get_fragments(self._storage, self._video_file, fragments)
+
+        range_paths = []
+        for _, range_segments in impacted_segments:
+            range_paths.append([fragment_paths[fragment(segment_idx)]
+                                for segment_idx in range_segments
+                                if segment_idx not in HEADER_SEGMENTS])
+
+        header_paths = [fragment_paths[fragment(segment_idx)]
+                        for segment_idx in HEADER_SEGMENTS]
+        with open(output_file, "wb") as out_fp:
+            assemble_clip(out_fp, header_paths, range_paths)
+        return output_file, self._clip_segment_info(impacted_segments)
+
+    def _clip_segment_info(self, impacted_segments):
+        """ Returns the frame start and number of frames of each media segment in a
+            clip.
+        """
+        segments = self._segment_index.segments
+        segment_info = []
+        for _, range_segments in impacted_segments:
+            for segment_idx in range_segments:
+                segment = segments[segment_idx]
+                if segment_idx not in HEADER_SEGMENTS and segment['frame_samples'] >= 0:
+                    segment_info.append({
+                        'frame_start': int(segment['frame_start']),
+                        'num_frames': int(segment['frame_samples'])})
+        return segment_info
+
+    def get_clip_segments(self, frame_ranges):
+        """ Returns the segments of the clip `get_clip` would produce for a list
+            of frame ranges, without fetching any video.
+        """
+        impacted_segments = self._get_impacted_segments_from_ranges(frame_ranges)
+        assert not impacted_segments is None, "Unable to calculate impacted video segments"
+        return self._clip_segment_info(impacted_segments)
+
+    def get_clip(self, frame_ranges, output_file=None):
         """ Given a list of frame ranges generate a temporary mp4
 
             :param frame_ranges: tuple or list of tuples representing (begin,
                                                                        end) -- range is inclusive!
+            :param output_file: Path of the mp4 to write. Defaults to a file in the
+                                temporary directory.
         """
         if isinstance(frame_ranges, tuple):
             frame_ranges = [frame_ranges]
+        if output_file is None:
+            output_file = os.path.join(self._temp_dir, "concat.mp4")
 
         impacted_segments = self._get_impacted_segments_from_ranges(frame_ranges)
         assert not impacted_segments is None, "Unable to calculate impacted video segments"
+
+        # Assemble the clip from fragments, falling back to ffmpeg for layouts
+        # the assembler does not support.
+        try:
+            return self._assemble_clip(impacted_segments, output_file)
+        except ValueError as exc:
+            logger.warning(f"Falling back to ffmpeg for clip of {self._video_file}: {exc}")
+
         lookup, segment_info = self.make_temporary_videos(impacted_segments)
 
         logger.info(f"Lookup = {lookup}")
@@ -271,8 +348,8 @@ class MediaUtil:
                 proc = subprocess.run(args, check=True, capture_output=True)
                 vid_list.write(f"file '{mux_0}'\n")
 
-        output_file = os.path.join(self._temp_dir, "concat.mp4")
         args = ["ffmpeg",
+                "-y",
                 "-f", "concat",
                 "-safe", "0",
                 "-i", os.path.join(self._temp_dir, "vid_list.txt"),
@@ -337,9 +414,57 @@ class MediaUtil:
             img.save(img_buf, "png", quality=95)
         return img_buf.getvalue()
 
+    def get_crops(self, frames, rois, force_scale=None):
+        """ Generate images of many ROIs and return them as PIL images.
+
+            Each distinct frame is decoded once regardless of how many ROIs it
+            contains. Images are downloaded once and cropped for each ROI.
+
+        Args:
+            frames: list
+                Frame of each ROI. Ignored for images.
+
+            rois: list
+                (width, height, x, y) Relative values (0.0 .. 1.0)
+
+            force_scale: tuple
+                (width: int, height: int) Forced image size in pixels
+        """
+        if not self.isVideo():
+            out = io.BytesIO()
+            self._storage.download_fileobj(self._video_file, out)
+            out.seek(0)
+            img = Image.open(out)
+            img.load()
+            images = []
+            for roi in rois:
+                left = roi[2] * self._width
+                upper = roi[3] * self._height
+                right = left + roi[0] * self._width
+                lower = upper + roi[1] * self._height
+                crop = img.crop((left, upper, right, lower))
+                if force_scale is not None:
+                    crop = crop.resize(force_scale)
+                images.append(crop)
+            return images
+
+        if self._segment_index is not None and decoder_available():
+            return self._render_images(frames, rois, force_scale)
+
+        # Fall back to rendering each ROI with ffmpeg.
+        images = []
+        for frame, roi in zip(frames, rois):
+            data = self.get_tile_image([frame], [roi], None, "png", force_scale)
+            images.append(Image.open(io.BytesIO(data)))
+        return images
+
     def get_tile_image(self, frames, rois=None, tile_size=None,
                        render_format="jpg", force_scale=None):
-        """ Generate a tile jpeg of the given frame/rois """
+        """ Generate a tile jpeg of the given frame/rois and return the encoded image.
+
+            Frames are decoded in process with PyAV if it is installed, otherwise
+            with ffmpeg subprocesses.
+        """
         # Compute tile size if not supplied explicitly
         try:
             if tile_size is not None:
@@ -357,6 +482,12 @@ class MediaUtil:
             height = math.ceil(len(frames) / width)
             tile_size = f"{width}x{height}"
 
+        if self._segment_index is not None and decoder_available():
+            # Decode, crop, scale and tile in memory.
+            images = self._render_images(frames, rois, force_scale)
+            columns, rows = [int(comp) for comp in tile_size.split('x')]
+            return encode_tile(images, columns, rows, render_format)
+
         if self._generate_frame_images(frames, rois,
                                        render_format=render_format,
                                        force_scale=force_scale) == False:
@@ -377,33 +508,51 @@ class MediaUtil:
         else:
             output_file = os.path.join(self._temp_dir, f"0.{render_format}")
 
-        return output_file
-
-    def get_animation(self,frames, roi, fps, render_format, force_scale):
-        """ TODO: add documentation for this """
-        if self._generate_frame_images(frames, roi,
-                                       render_format="jpg",
-                                       force_scale=force_scale) == False:
-            return None
+        with open(output_file, 'rb') as data_file:
+            return data_file.read()
 
-        mp4_args = ["ffmpeg",
-                    "-framerate", str(fps),
-                    "-i", os.path.join(self._temp_dir, "%d.jpg"),
-                    os.path.join(self._temp_dir, "temp.mp4")]
-        proc = subprocess.run(mp4_args, check=True, capture_output=True)
+    def get_animation(self, frames, roi, fps, render_format, force_scale=None):
+        """ Generate an animation of the given frames and return the encoded
+            animation. GIFs use one palette computed from all frames and mp4s are
+            encoded with H.264.
 
-        if render_format == 'mp4':
-            return os.path.join(self._temp_dir, "temp.mp4")
+            Frames are decoded and encoded in process with PyAV if it is installed,
+            otherwise frames are written to disk and encoded with one ffmpeg pass.
+        """
+        if self._segment_index is not None and decoder_available():
+            images = self._render_images(frames, roi, force_scale)
+            start = time.monotonic()
+            if render_format == 'mp4':
+                data = encode_mp4(images, fps)
+            else:
+                data = encode_gif(images, fps)
         else:
-            # Convert temporary mp4 into a gif
-            gif_args = ["ffmpeg",
-                        "-i", os.path.join(self._temp_dir, "temp.mp4"),
-                        "-filter_complex", "[0:v] split [a][b];[a] palettegen"
-                        " [p];[b][p] paletteuse",
-                        os.path.join(self._temp_dir, "animation.gif")]
-            logger.info(gif_args)
-            proc = subprocess.run(gif_args, check=True, capture_output=True)
-            return os.path.join(self._temp_dir, "animation.gif")
+            if self._generate_frame_images(frames, roi,
+                                           render_format="jpg",
+                                           force_scale=force_scale) == False:
+                return None
+            args = ["ffmpeg",
+                    "-framerate", str(fps),
+                    "-i", os.path.join(self._temp_dir, "%d.jpg")]
+            if render_format == 'mp4':
+                # Fragment the mp4 so that it can be written to a pipe. yuv420p
+                # requires even dimensions, so odd sized crops are truncated.
+                args += ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+                         "-pix_fmt", "yuv420p",
+                         "-movflags", "frag_keyframe+empty_moov",
+                         "-f", "mp4", "pipe:1"]
+            else:
+                args += ["-filter_complex", "[0:v] split [a][b];[a] palettegen"
+                         " [p];[b][p] paletteuse",
+                         "-f", "gif", "pipe:1"]
+            logger.info(args)
+            start = time.monotonic()
+            data = subprocess.run(args, check=True, capture_output=True).stdout
+        elapsed = time.monotonic() - start
+        TatorCache().record_encode_stats(render_format, len(frames), elapsed)
+        logger.info(f"Encoded {len(frames)} frame {render_format} animation in "
+                    f"{elapsed:.3f}s ({1000 * elapsed / max(len(frames), 1):.1f}ms per frame).")
+        return data
 
     def generate_error_image(self, code, message, img_format="png"):
         """ TODO: add documentation for this """
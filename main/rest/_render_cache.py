@@ -0,0 +1,180 @@
+""" On-disk cache of rendered frames, crops and animations.
+
+Renders are keyed by a hash of their media, the `media_files` of the media and the
+render parameters, so a re-transcode produces new keys and old renders age out. The
+key doubles as a strong ETag. Files are stored under a directory shared by all
+workers on a host and evicted by least recent use and idle time.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from rest_framework.exceptions import Throttled
+
+from ..cache import TatorCache
+from ._fragment_cache import _evict
+from ._fragment_cache import _store
+from ._render_limits import RENDER_SLOT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('RENDER_CACHE_DIR',
+                      os.path.join(tempfile.gettempdir(), 'render_cache'))
+
+# Maximum size of the cache in bytes.
+MAX_CACHE_BYTES = int(os.getenv('RENDER_CACHE_BYTES', str(1024 ** 3)))
+
+# Renders unused for this many seconds are removed.
+MAX_IDLE = int(os.getenv('RENDER_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Max age in seconds given to clients in the Cache-Control header.
+CLIENT_MAX_AGE = 3600
+
+# Seconds after which the lock of a worker that stopped computing a render expires, so
+# that another worker may take over. The lock is extended every
+# RENDER_LOCK_EXTEND_INTERVAL seconds while the render is computed, so renders may take
+# as long as the worker timeout.
+RENDER_LOCK_TIMEOUT = 30
+RENDER_LOCK_EXTEND_INTERVAL = 10
+
+# Seconds a worker waits for a render computed by another worker. A render cannot be
+# computed for longer than the worker timeout, so waiting longer is pointless.
+RENDER_WAIT_TIMEOUT = RENDER_SLOT_TIMEOUT
+
+# Seconds between checks for a render computed by another worker.
+RENDER_POLL_INTERVAL = 0.05
+
+# Seconds the outcome of a render is shared with waiting workers.
+RENDER_OUTCOME_EXPIRY = 60
+
+_written = 0
+_written_lock = threading.Lock()
+
+def _render_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+def render_key(media, **params):
+    """ Returns the cache key of a render of a media. Parameters must be JSON
+        serializable and include everything that affects the output, including
+        its format.
+    """
+    contents = {'media': media.id, 'media_files': media.media_files, 'params': params}
+    return hashlib.sha256(json.dumps(contents, sort_keys=True).encode()).hexdigest()
+
+def get_render(key):
+    """ Returns a tuple of (data, format) for a cached render, or None.
+    """
+    render_path = _render_path(key)
+    try:
+        # Mark the render as recently used.
+        os.utime(render_path)
+        with open(render_path, 'rb') as f_p:
+            render_format, data = f_p.read().split(b'\n', 1)
+    except FileNotFoundError:
+        return None
+    return data, render_format.decode()
+
+def set_render(key, data, render_format):
+    """ Stores a render along with its format.
+    """
+    global _written
+    _store(_render_path(key), render_format.encode() + b'\n' + data)
+    with _written_lock:
+        _written += len(data)
+        if _written < MAX_CACHE_BYTES // 10:
+            return
+        _written = 0
+    _evict(CACHE_DIR, MAX_CACHE_BYTES, MAX_IDLE)
+
+def _parse_outcome(outcome):
+    """ Returns a tuple of (data, format) from a shared render outcome, or raises
+        the error of the worker that computed it.
+    """
+    status, body = outcome.split(b'\n', 1)
+    if status == b'error':
+        raise Exception(f"Render failed in another worker: {body.decode()}")
+    render_format, data = body.split(b'\n', 1)
+    return data, render_format.decode()
+
+def _extend_lock(lock, stop):
+    """ Extends a render lock every RENDER_LOCK_EXTEND_INTERVAL seconds until `stop`
+        is set.
+    """
+    while not stop.wait(RENDER_LOCK_EXTEND_INTERVAL):
+        try:
+            lock.extend(RENDER_LOCK_EXTEND_INTERVAL)
+        except Exception:
+            logger.warning(f"Failed to extend lock for render {lock.name}!", exc_info=True)
+            return
+
+def render_once(key, compute):
+    """ Computes a render in only one worker at a time across all hosts.
+
+        compute: Function returning a tuple of (data, format).
+
+        The first worker to request a render holds a lock in redis while it computes
+        it, extending the lock until computation finishes. Other workers wait for the
+        outcome, which is shared through redis for RENDER_OUTCOME_EXPIRY seconds. If
+        computation fails, waiting workers raise an exception with the same message
+        instead of retrying, except when computation is throttled, in which case a
+        waiting worker takes over. If the computing worker dies, its lock expires
+        within RENDER_LOCK_TIMEOUT seconds and a waiting worker takes over. Workers
+        give up waiting after RENDER_WAIT_TIMEOUT seconds.
+
+        Returns a tuple of (data, format).
+    """
+    cache = TatorCache()
+    deadline = time.monotonic() + RENDER_WAIT_TIMEOUT
+    lock = cache.acquire_render_lock(key, RENDER_LOCK_TIMEOUT)
+    while lock is None:
+        waited = False
+        while cache.render_lock_held(key):
+            outcome = cache.get_render_outcome(key)
+            if outcome is not None:
+                return _parse_outcome(outcome)
+            if time.monotonic() > deadline:
+                raise Exception(f"Timed out after {RENDER_WAIT_TIMEOUT} seconds waiting "
+                                f"for render computed by another worker!")
+            time.sleep(RENDER_POLL_INTERVAL)
+            waited = True
+        # The lock was released, check whether the render finished.
+        outcome = cache.get_render_outcome(key)
+        if waited and outcome is not None:
+            return _parse_outcome(outcome)
+        lock = cache.acquire_render_lock(key, RENDER_LOCK_TIMEOUT)
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_extend_lock, args=(lock, stop), daemon=True)
+    heartbeat.start()
+    try:
+        # Clear the outcome of an earlier attempt.
+        cache.clear_render_outcome(key)
+        try:
+            data, render_format = compute()
+        except Throttled:
+            # Admission failures are not shared, waiting workers try to compute the
+            # render themselves once the lock is released.
+            raise
+        except Exception as exc:
+            cache.set_render_outcome(key, b'error\n' + str(exc).encode(),
+                                     RENDER_OUTCOME_EXPIRY)
+            raise
+        if isinstance(data, bytes):
+            set_render(key, data, render_format)
+            cache.set_render_outcome(key, b'ok\n' + render_format.encode() + b'\n' + data,
+                                     RENDER_OUTCOME_EXPIRY)
+        else:
+            cache.set_render_outcome(key, b'error\nRender produced no output.',
+                                     RENDER_OUTCOME_EXPIRY)
+        return data, render_format
+    finally:
+        stop.set()
+        heartbeat.join()
+        try:
+            lock.release()
+        except Exception:
+            logger.warning(f"Lock for render {key} expired before it was released!")
@@ -0,0 +1,54 @@
+""" Admission control for endpoints that render media.
+
+Renders take a slot in a global pool, a per-project pool and a per-user pool held
+in redis. When any pool is full the request is rejected with 429 and a Retry-After
+header instead of queueing behind other renders, so that a burst of renders cannot
+occupy every render worker.
+"""
+from contextlib import contextmanager
+import logging
+import os
+import uuid
+
+from rest_framework.exceptions import Throttled
+
+from ..cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of concurrent renders across all render workers. The chart sets
+# this to the number of render workers times the number of render replicas.
+MAX_RENDERS = int(os.getenv('RENDER_MAX_TOTAL', '32'))
+
+# Maximum number of concurrent renders per project.
+MAX_RENDERS_PER_PROJECT = int(os.getenv('RENDER_MAX_PER_PROJECT', '16'))
+
+# Maximum number of concurrent renders per user.
+MAX_RENDERS_PER_USER = int(os.getenv('RENDER_MAX_PER_USER', '4'))
+
+# Seconds after which a slot is assumed to be leaked by a dead worker. This matches
+# the gunicorn worker timeout.
+RENDER_SLOT_TIMEOUT = 600
+
+# Seconds clients are asked to wait before retrying a rejected render.
+RETRY_AFTER = 2
+
+@contextmanager
+def render_slot(user_id, project_id):
+    """ Holds a render slot for the duration of the context, or raises `Throttled`
+        if the render limits are reached.
+    """
+    cache = TatorCache()
+    token = uuid.uuid4().hex
+    limits = {'all': MAX_RENDERS,
+              f'project_{project_id}': MAX_RENDERS_PER_PROJECT,
+              f'user_{user_id}': MAX_RENDERS_PER_USER}
+    if not cache.acquire_render_slot(token, limits, RENDER_SLOT_TIMEOUT):
+        logger.info(f"Rejected render for user {user_id} in project {project_id}, "
+                    f"render limits reached.")
+        raise Throttled(wait=RETRY_AFTER,
+                        detail="Too many renders in progress, try again later.")
+    try:
+        yield
+    finally:
+        cache.release_render_slot(token, limits.keys())
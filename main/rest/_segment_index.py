@@ -0,0 +1,138 @@
+""" Compact index of the segments of a fragmented mp4. """
+from collections import OrderedDict
+import io
+import json
+import logging
+import threading
+
+import numpy as np
+
+from ..cache import TatorCache
+
+logger = logging.getLogger(__name__)
+
+# Layout of one segment in the binary index. Frame fields are -1 for segments that
+# do not describe frames.
+SEGMENT_DTYPE = np.dtype([('offset', '<u8'), ('size', '<u8'), ('frame_start', '<i8'),
+                          ('frame_samples', '<i8'), ('moof', '?')])
+
+# Segments 0 and 1 are the ftyp and moov boxes, which every extraction needs.
+HEADER_SEGMENTS = [0, 1]
+
+# Maximum number of fragments decoded in one forward pass.
+MAX_RUN_FRAGMENTS = 32
+
+# Maximum number of indices held in memory by each process.
+MAX_CACHED_INDICES = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+class SegmentIndex:
+    """ Segment offsets, sizes and frame ranges of a fragmented mp4.
+    """
+    def __init__(self, segments):
+        self.segments = segments
+        moof = np.flatnonzero(segments['moof'])
+        self._moof_idx = moof
+        self._moof_start = segments['frame_start'][moof]
+        self._moof_stop = self._moof_start + segments['frame_samples'][moof]
+
+    @classmethod
+    def from_segment_info(cls, segment_info):
+        """ Builds an index from the parsed contents of a segment info file.
+        """
+        infos = segment_info['segments']
+        segments = np.zeros(len(infos), dtype=SEGMENT_DTYPE)
+        segments['offset'] = [info['offset'] for info in infos]
+        segments['size'] = [info['size'] for info in infos]
+        segments['frame_start'] = [info.get('frame_start', -1) for info in infos]
+        segments['frame_samples'] = [info.get('frame_samples', -1) for info in infos]
+        segments['moof'] = [info['name'] == 'moof' for info in infos]
+        return cls(segments)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(np.frombuffer(data, dtype=SEGMENT_DTYPE))
+
+    def to_bytes(self):
+        return self.segments.tobytes()
+
+    def get_impacted_segments(self, frames):
+        """ Returns a list of (frame, segment indices) for each frame. Frames outside
+            of the video are omitted. Each frame requires the header segments and the
+            moof and mdat containing it.
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        if self._moof_idx.size == 0 or frames.size == 0:
+            return []
+        guess = np.searchsorted(self._moof_start, frames, side='right') - 1
+        inside = (guess >= 0) & (frames < self._moof_stop[np.maximum(guess, 0)])
+        valid = (frames >= self._moof_start[0]) & (frames < self._moof_stop[-1])
+        moof = self._moof_idx[np.maximum(guess, 0)]
+        segment_list = []
+        for frame, frame_inside, frame_valid, frame_moof in zip(frames.tolist(),
+                                                               inside.tolist(),
+                                                               valid.tolist(),
+                                                               moof.tolist()):
+            if not frame_valid:
+                continue
+            frame_seg = list(HEADER_SEGMENTS)
+            if frame_inside:
+                frame_seg = sorted(set(frame_seg + [frame_moof, frame_moof + 1]))
+            segment_list.append((frame, frame_seg))
+        return segment_list
+
+    def get_decode_runs(self, frames, max_fragments=MAX_RUN_FRAGMENTS):
+        """ Groups frames into runs that can be decoded in one forward pass. Each run
+            covers consecutive fragments whose frame ranges are contiguous, so that
+            frames can be counted from the start of the run.
+
+            Returns a list of (segment indices, first frame of the run, frames) in
+            frame order. Frames outside of the video or between fragments are omitted.
+        """
+        frames = np.unique(np.asarray(frames, dtype=np.int64))
+        if self._moof_idx.size == 0 or frames.size == 0:
+            return []
+        guess = np.searchsorted(self._moof_start, frames, side='right') - 1
+        inside = (guess >= 0) & (frames < self._moof_stop[np.maximum(guess, 0)])
+        runs = []
+        for frame, moof in zip(frames[inside].tolist(), guess[inside].tolist()):
+            if runs:
+                first, last, run_frames = runs[-1]
+                contiguous = (moof == last + 1
+                              and moof - first < max_fragments
+                              and self._moof_start[moof] == self._moof_stop[last])
+                if moof == last or contiguous:
+                    runs[-1] = (first, moof, run_frames + [frame])
+                    continue
+            runs.append((moof, moof, [frame]))
+        return [(HEADER_SEGMENTS + list(range(self._moof_idx[first], self._moof_idx[last] + 2)),
+                 int(self._moof_start[first]), run_frames)
+                for first, last, run_frames in runs]
+
+def get_segment_index(storage, path):
+    """ Returns the segment index of a segment info file. Indices are cached in
+        memory and in redis by path, and are converted from the JSON segment info
+        file on first use.
+    """
+    with _cache_lock:
+        index = _cache.get(path)
+        if index is not None:
+            _cache.move_to_end(path)
+            return index
+    cache = TatorCache()
+    data = cache.get_segment_index(path)
+    if data is None:
+        f_p = io.BytesIO()
+        storage.download_fileobj(path, f_p)
+        index = SegmentIndex.from_segment_info(json.loads(f_p.getvalue().decode('utf-8')))
+        cache.set_segment_index(path, index.to_bytes())
+        logger.info(f"Built segment index for {path} with {index.segments.size} segments.")
+    else:
+        index = SegmentIndex.from_bytes(data)
+    with _cache_lock:
+        _cache[path] = index
+        while len(_cache) > MAX_CACHED_INDICES:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,43 @@
+""" Frame intervals of states computed in the database. """
+from django.db.models import F
+from django.db.models import Window
+from django.db.models.functions import Lead
+
+from ..models import State
+
+def get_state_timeline(qs):
+    """ Returns the frame interval covered by each state in a queryset, assuming
+        each state holds until the next state of the same type on the same media
+        (`latest` interpolation).
+
+        Intervals are half open, [frame, end_frame). The last state of each media
+        ends at the number of frames in the media. States associated with multiple
+        media produce one interval per media. Intervals are computed with a window
+        function in a single query.
+    """
+    ordering = [F('state__frame').asc(), F('state_id').asc()]
+    rows = State.media.through.objects\
+        .filter(state__in=qs.values('id'), state__frame__isnull=False)\
+        .annotate(next_frame=Window(expression=Lead('state__frame'),
+                                    partition_by=[F('media_id'), F('state__meta')],
+                                    order_by=ordering))\
+        .order_by('media_id', *ordering)\
+        .values('state_id', 'media_id', 'media__name', 'media__num_frames', 'media__fps',
+                'state__frame', 'next_frame')
+    timeline = []
+    for row in rows.iterator():
+        start = row['state__frame']
+        end = row['next_frame']
+        if end is None:
+            end = row['media__num_frames'] if row['media__num_frames'] is not None else start
+        fps = row['media__fps']
+        timeline.append({
+            'id': row['state_id'],
+            'media': row['media_id'],
+            'media_name': row['media__name'],
+            'frame': start,
+            'end_frame': end,
+            'start_seconds': start / fps if fps else None,
+            'end_seconds': end / fps if fps else None,
+        })
+    return timeline
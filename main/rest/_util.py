@@ -3,10 +3,14 @@ from itertools import islice
 import logging
 
 from django.utils.http import urlencode
+from django.db.models import Count
+from django.db.models import Max
 from django.db.models.expressions import Subquery
+from django.contrib.postgres.fields.jsonb import KeyTransform
 from rest_framework.reverse import reverse
 from rest_framework.exceptions import APIException
 
+from ..cache import TatorCache
 from ..models import type_to_obj
 
 from ._attributes import convert_attribute
@@ -100,6 +104,14 @@ def paginate(query_params, queryset):
     return qs
 
 
+def get_queryset_validator(project, qs):
+    """ Returns a validator for conditional GET requests on a queryset. The queryset
+        should not be paginated, as changes outside of a page can shift its contents.
+    """
+    agg = qs.order_by().aggregate(count=Count('id'), modified=Max('modified_datetime'))
+    generation = TatorCache().get_write_generation(project)
+    return f"{agg['count']}_{agg['modified']}_{generation}"
+
 def bulk_create_from_generator(obj_generator, model, batch_size=1000):
     saved_objects = []
     while True:
@@ -109,3 +121,57 @@ def bulk_create_from_generator(obj_generator, model, batch_size=1000):
         saved_objects += model.objects.bulk_create(batch, batch_size)
 
     return saved_objects
+
+def get_projection(params, properties):
+    """ Converts the `fields` parameter into a list of columns and a list of attribute keys.
+        If `fields` is not given, all properties are returned and attribute keys is None,
+        meaning the full attributes object is selected. Raises an exception if a field is
+        not part of the given schema properties.
+    """
+    fields = params.get('fields')
+    if fields is None:
+        return list(properties), None
+    columns = []
+    attribute_keys = []
+    for field in fields:
+        if field.startswith('attributes.'):
+            attribute_keys.append(field[len('attributes.'):])
+        elif field in properties:
+            if field not in columns:
+                columns.append(field)
+        else:
+            raise Exception(f"Invalid field '{field}'! Valid fields are {properties} or "
+                            f"'attributes.<name>'.")
+    if 'attributes' in columns:
+        attribute_keys = None
+    # ID is always returned as it is needed to fill many to many fields.
+    if 'id' in properties and 'id' not in columns:
+        columns.insert(0, 'id')
+    return columns, attribute_keys
+
+def values_with_projection(qs, columns, attribute_keys):
+    """ Returns a list of dicts containing the given columns. Attribute keys are selected
+        individually with `attributes->'key'` so full attribute objects are not transferred.
+    """
+    if not attribute_keys:
+        return list(qs.values(*columns))
+    if qs.query.combinator:
+        # Annotations are not applied to combined querysets, so select the attributes
+        # column and discard unrequested keys.
+        response_data = list(qs.values(*columns, 'attributes'))
+        for element in response_data:
+            attributes = element['attributes'] or {}
+            element['attributes'] = {key: attributes[key] for key in attribute_keys
+                                     if key in attributes}
+        return response_data
+    aliases = {f'_attribute_{idx}': key for idx, key in enumerate(attribute_keys)}
+    annotations = {alias: KeyTransform(key, 'attributes') for alias, key in aliases.items()}
+    response_data = list(qs.annotate(**annotations).values(*columns, *aliases.keys()))
+    for element in response_data:
+        attributes = {}
+        for alias, key in aliases.items():
+            value = element.pop(alias)
+            if value is not None:
+                attributes[key] = value
+        element['attributes'] = attributes
+    return response_data
@@ -0,0 +1,105 @@
+import logging
+
+from django.db import connection
+from django.db.models import Q
+
+from ..models import Localization
+from ..models import State
+from ..schema import LocalizationChangesSchema
+from ..schema import StateChangesSchema
+
+from ._base_views import BaseListView
+from ._permissions import ProjectViewOnlyPermission
+from ._util import get_projection
+from ._util import values_with_projection
+from .localization import LOCALIZATION_PROPERTIES
+from .state import STATE_M2M_PROPERTIES
+from .state import STATE_PROPERTIES
+from .state import _fill_m2m
+
+logger = logging.getLogger(__name__)
+
+# Returns the lowest ID of a transaction other than the current one that was in
+# progress when the statement started, or the next ID to be assigned if there is none.
+# Transactions with lower IDs have all finished, so rows they wrote can no longer change
+# without getting a higher ID. The current transaction is excluded so that its own
+# writes are visible to it.
+CHANGE_BOUND_QUERY = """
+SELECT COALESCE(
+    (SELECT MIN(xip) FROM txid_snapshot_xip(txid_current_snapshot()) AS xip),
+    txid_snapshot_xmax(txid_current_snapshot())
+)
+"""
+
+def get_change_bound():
+    """ Returns the exclusive upper bound on transaction IDs of changes that may be
+        returned, so that transactions that are still in progress are not skipped by
+        the returned watermark.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CHANGE_BOUND_QUERY)
+        return cursor.fetchone()[0]
+
+def get_annotation_changes(project, params, model, properties):
+    """ Returns annotations in a project created, modified or deleted after a
+        watermark, ordered by the ID of the transaction that wrote them and ID.
+    """
+    limit = params.get('limit', 1000)
+    qs = model.objects.filter(project=project, change_xid__lt=get_change_bound())
+    if params.get('since') is not None:
+        since = params['since']
+        qs = qs.filter(Q(change_xid__gt=since)
+                       | Q(change_xid=since, id__gt=params.get('since_id', 0)))
+    if params.get('media_id') is not None:
+        qs = qs.filter(media__in=params['media_id'])
+        if len(params['media_id']) > 1:
+            qs = qs.distinct()
+    if params.get('type') is not None:
+        qs = qs.filter(meta=params['type'])
+    if params.get('version') is not None:
+        qs = qs.filter(version__in=params['version'])
+    qs = qs.order_by('change_xid', 'id')[:limit + 1]
+
+    columns, attribute_keys = get_projection({}, properties)
+    annotations = values_with_projection(qs, columns + ['deleted', 'modified', 'change_xid'],
+                                         attribute_keys)
+    more = len(annotations) > limit
+    annotations = annotations[:limit]
+    watermark = {'since': params.get('since'), 'since_id': params.get('since_id')}
+    for annotation in annotations:
+        # Original annotations that were replaced by an edit are hidden from lists.
+        modified = annotation.pop('modified')
+        annotation['deleted'] = annotation['deleted'] or modified is False
+        watermark = {'since': annotation.pop('change_xid'), 'since_id': annotation['id']}
+    return annotations, watermark, more
+
+class LocalizationChangesAPI(BaseListView):
+    """ Retrieve localizations changed since a watermark.
+
+        Intended for clients that keep a copy of a project's localizations and
+        periodically synchronize it.
+    """
+    schema = LocalizationChangesSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        localizations, watermark, more = get_annotation_changes(
+            params['project'], params, Localization, LOCALIZATION_PROPERTIES)
+        return {'localizations': localizations, **watermark, 'more': more}
+
+class StateChangesAPI(BaseListView):
+    """ Retrieve states changed since a watermark.
+
+        Intended for clients that keep a copy of a project's states and periodically
+        synchronize it.
+    """
+    schema = StateChangesSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        states, watermark, more = get_annotation_changes(
+            params['project'], params, State, STATE_PROPERTIES)
+        states = _fill_m2m(states, STATE_M2M_PROPERTIES)
+        return {'states': states, **watermark, 'more': more}
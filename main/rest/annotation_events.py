@@ -0,0 +1,31 @@
+import logging
+
+from urllib.parse import urlencode
+
+from ..events import make_ticket
+from ..models import Media
+from ..schema import AnnotationEventsSchema
+
+from ._base_views import BaseListView
+from ._permissions import ProjectViewOnlyPermission
+
+logger = logging.getLogger(__name__)
+
+class AnnotationEventsAPI(BaseListView):
+    """ Retrieve a subscription to annotation change events of a media.
+
+        Events are delivered by a separate server using server-sent events, so that
+        clients do not need to poll for edits made by other users.
+    """
+    schema = AnnotationEventsSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        project = params['project']
+        media_id = params['media_id']
+        if not Media.objects.filter(pk=media_id, project=project).exists():
+            raise Exception(f"Media {media_id} is not part of project {project}!")
+        ticket = make_ticket(project, media_id, self.request.user.id)
+        return {'ticket': ticket, 'url': f"/events?{urlencode({'ticket': ticket})}",
+                'user': self.request.user.id}
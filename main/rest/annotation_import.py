@@ -0,0 +1,63 @@
+import datetime
+import logging
+from uuid import uuid1
+
+from ..cache import TatorCache
+from ..models import Project
+from ..schema import AnnotationImportSchema
+from ..store import get_tator_store
+from ..util import upload_prefix_from_project
+
+from ._base_views import BaseListView
+from ._permissions import ProjectTransferPermission
+
+logger = logging.getLogger(__name__)
+
+class AnnotationImportAPI(BaseListView):
+    """ Start an annotation import.
+
+        The file must be uploaded first using the key returned by `UploadInfo`. The import
+        is queued for a background worker, which reports progress through the `Job`
+        endpoints.
+    """
+    schema = AnnotationImportSchema()
+    permission_classes = [ProjectTransferPermission]
+    http_method_names = ['post']
+
+    def _post(self, params):
+        project = params['project']
+        key = params['key']
+        gid = str(params.get('gid', uuid1()))
+        uid = str(uuid1())
+
+        # Make sure the upload belongs to this project and exists.
+        project_obj = Project.objects.get(pk=project)
+        if not key.startswith(f"{upload_prefix_from_project(project_obj)}/"):
+            raise Exception(f"Key {key} is not an upload for project {project}!")
+        tator_store = get_tator_store(project_obj.bucket)
+        if not tator_store.check_key(key):
+            raise Exception(f"Upload {key} does not exist!")
+
+        # Store the job for progress reporting and queue it for the worker.
+        cache = TatorCache()
+        cache.set_job({'uid': uid,
+                       'gid': gid,
+                       'user': self.request.user.pk,
+                       'project': project,
+                       'algorithm': -1,
+                       'datetime': datetime.datetime.utcnow().isoformat() + 'Z',
+                       'job_type': 'import',
+                       'status': 'Pending',
+                       'key': key,
+                       'annotation_type': params['annotation_type'],
+                       'format': params.get('format', 'ndjson'),
+                       'batch_size': params.get('batch_size', 10000),
+                       'progress': 0.0,
+                       'processed': 0,
+                       'created': 0,
+                       'errors': []})
+        cache.push_import(uid)
+
+        msg = f"Import job {uid} queued for {key}."
+        logger.info(msg)
+        return {'message': msg, 'uid': uid, 'gid': gid}
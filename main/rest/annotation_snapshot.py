@@ -0,0 +1,108 @@
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from ..cache import TatorCache
+from ..models import Media
+from ..schema import AnnotationSnapshotSchema
+from ..store import get_tator_store
+
+from ._base_views import BaseDetailView
+from ._annotation_query import get_annotation_queryset
+from ._annotation_query import get_version_chain
+from ._permissions import ProjectViewOnlyPermission
+from ._util import get_projection
+from ._util import values_with_projection
+from .localization import LOCALIZATION_PROPERTIES
+from .state import STATE_M2M_PROPERTIES
+from .state import STATE_PROPERTIES
+from .state import _fill_m2m
+
+logger = logging.getLogger(__name__)
+
+# Maximum expiration of snapshot URLs in seconds.
+MAX_EXPIRATION = 86400
+
+# Seconds that a replaced snapshot is kept in object storage. URLs are no longer issued
+# for a snapshot once it is invalidated, so this covers the longest URL expiration plus
+# a margin for requests that read the record just before it was replaced.
+SNAPSHOT_RETENTION = MAX_EXPIRATION + 60
+
+def _build_snapshot(media, version, effective_version):
+    """ Serializes all localizations and states of a media in the same form as the
+        list endpoints and returns the gzipped result.
+    """
+    params = {'media_id': [media.id]}
+    if version is not None:
+        params['version'] = [version]
+    if effective_version is not None:
+        params['effective_version'] = effective_version
+    qs = get_annotation_queryset(media.project.pk, params, 'localization')
+    localizations = values_with_projection(qs, *get_projection({}, LOCALIZATION_PROPERTIES))
+    qs = get_annotation_queryset(media.project.pk, params, 'state')
+    states = _fill_m2m(values_with_projection(qs, *get_projection({}, STATE_PROPERTIES)),
+                       STATE_M2M_PROPERTIES)
+    data = json.dumps({'localizations': localizations, 'states': states}, cls=JSONEncoder)
+    return gzip.compress(data.encode('utf-8'))
+
+class AnnotationSnapshotAPI(BaseDetailView):
+    """ Retrieve a snapshot of all annotations on a media.
+
+        Snapshots are built when first requested and stored in object storage until
+        a localization or state on the media is modified, so repeated loads of a
+        media can be served directly from object storage. Replaced snapshots are
+        deleted after URLs issued for them have expired.
+    """
+    schema = AnnotationSnapshotSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    lookup_field = 'id'
+    http_method_names = ['get']
+
+    def _get(self, params):
+        media = Media.objects.get(pk=params['id'])
+        version = params.get('version')
+        effective_version = params.get('effective_version')
+        version_key = 'all' if version is None else str(version)
+        if effective_version is not None:
+            # Include the resolved bases so that changes to them select a new snapshot.
+            chain = get_version_chain(media.project.pk, effective_version)
+            version_key += '_effective_' + '_'.join(str(version_id) for version_id in chain)
+        cache = TatorCache()
+        record = cache.get_snapshot(media.id, version_key)
+        tator_store = get_tator_store(media.project.bucket)
+        if record is None:
+            # Read the generation before querying so that edits committed while the
+            # snapshot is built invalidate it.
+            generation = cache.get_snapshot_generation(media.id)
+            blob = _build_snapshot(media, version, effective_version)
+            # Each generation gets its own object, so that URLs handed out for an
+            # older snapshot keep returning the data they were issued for.
+            key = (f"{media.project.organization.pk}/{media.project.pk}/snapshots/"
+                   f"{media.id}_{version_key}_{generation}.json.gz")
+            tator_store.put_string(key, blob)
+            record = {
+                'key': key,
+                'etag': hashlib.md5(blob).hexdigest(),
+                'size': len(blob),
+                'generation': generation,
+                'created_datetime': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+            cache.set_snapshot(media.id, version_key, record, SNAPSHOT_RETENTION)
+            logger.info(f"Built annotation snapshot {key} ({len(blob)} bytes).")
+            for retired in cache.pop_retired_snapshots(media.id):
+                tator_store.delete_object(retired)
+                logger.info(f"Deleted retired annotation snapshot {retired}.")
+        return {
+            'url': tator_store.get_download_url(record['key'],
+                                                params.get('expiration', MAX_EXPIRATION)),
+            'etag': record['etag'],
+            'size': record['size'],
+            'created_datetime': record['created_datetime'],
+        }
+
+    def get_queryset(self):
+        return Media.objects.all()
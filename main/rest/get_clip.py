@@ -1,7 +1,8 @@
+import datetime
+import json
 import logging
+import os
 import tempfile
-import traceback
-import hashlib
 
 from ..models import TemporaryFile
 from ..models import Media
@@ -11,9 +12,29 @@ from ..schema import GetClipSchema
 from ._base_views import BaseDetailView
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
+from ._render_cache import render_key
+from ._render_cache import render_once
+from ._render_limits import render_slot
 
 logger = logging.getLogger(__name__)
 
+# Hours until a clip expires.
+CLIP_HOURS = 24
+
+# Clips are only reused if they expire at least this far in the future.
+CLIP_MIN_REMAINING = datetime.timedelta(hours=1)
+
+def _find_clip(project, lookup):
+    """ Returns an unexpired temporary file containing a clip, or None.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    matches = TemporaryFile.objects.filter(project=project, lookup=lookup,
+                                           eol_datetime__gt=now + CLIP_MIN_REMAINING)
+    for temp_file in matches.order_by('-eol_datetime'):
+        if os.path.exists(temp_file.path):
+            return temp_file
+    return None
+
 class GetClipAPI(BaseDetailView):
     schema = GetClipSchema()
     permission_classes = [ProjectViewOnlyPermission]
@@ -28,6 +49,7 @@ class GetClipAPI(BaseDetailView):
 
     def _get(self, params):
         """ Facility to get a clip from the server. Returns a temporary file object that expires in 24 hours.
+            Requests for the same clip reuse an existing temporary file.
         """
         # upon success we can return an image
         video = Media.objects.get(pk=params['id'])
@@ -39,20 +61,30 @@ class GetClipAPI(BaseDetailView):
             frame_ranges.append((int(t[0]), int(t[1])))
 
         quality = params.get('quality', None)
-        h = hashlib.new('md5', f"{params}".encode())
-        lookup = h.hexdigest()
+        # Identical requests share a clip until it nears expiration.
+        lookup = render_key(video, frame_ranges=frame_ranges, quality=quality)
 
-        # Disabling this for now, so we can force segments to be calculated
-        # #TODO worth revisiting 
-        # Check to see if we already made this clip
-        #matches=TemporaryFile.objects.filter(project=project, lookup=lookup)
-        #if matches.exists():
-        #    temp_file = matches[0]
-        #else:
         with tempfile.TemporaryDirectory() as temp_dir:
             media_util = MediaUtil(video, temp_dir, quality)
-            fp, segments = media_util.get_clip(frame_ranges)
-            temp_file = TemporaryFile.from_local(fp, "clip.mp4", project, self.request.user, lookup=lookup, hours=24)
+            segments = media_util.get_clip_segments(frame_ranges)
+            temp_file = _find_clip(project, lookup)
+            if temp_file is None:
+                def _compute():
+                    # The clip is written directly to its temporary file location.
+                    clip_fp = TemporaryFile.get_local_path(project, "clip.mp4")
+                    try:
+                        with render_slot(self.request.user.id, project.id):
+                            fp, _ = media_util.get_clip(frame_ranges, clip_fp)
+                    except:
+                        if os.path.exists(clip_fp):
+                            os.remove(clip_fp)
+                        raise
+                    temp_file = TemporaryFile.from_local(fp, "clip.mp4", project,
+                                                         self.request.user, lookup=lookup,
+                                                         hours=CLIP_HOURS, in_place=True)
+                    return json.dumps({'id': temp_file.id}).encode(), 'json'
+                data, _ = render_once(lookup, _compute)
+                temp_file = TemporaryFile.objects.get(pk=json.loads(data)['id'])
 
         start_frames = []
         end_frames = []
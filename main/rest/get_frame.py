@@ -1,9 +1,11 @@
 import tempfile
 import logging
+import math
 import traceback
 
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from django.http import response
 
 from ..models import Media
@@ -14,12 +16,14 @@ from ..renderers import Mp4Renderer
 from ..schema import GetFrameSchema
 from ..schema import parse
 from ._base_views import BaseDetailView
+from ._base_views import RenderCacheMixin
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
+from ._render_cache import render_key
 
 logger = logging.getLogger(__name__)
 
-class GetFrameAPI(BaseDetailView):
+class GetFrameAPI(RenderCacheMixin, BaseDetailView):
     """ Get frame(s) from a video.
 
         Facility to get a frame(jpg/png) of a given video frame, returns a square tile of
@@ -38,12 +42,21 @@ class GetFrameAPI(BaseDetailView):
         status_obj = status.HTTP_400_BAD_REQUEST
         if type(exc) is response.Http404:
             status_obj = status.HTTP_404_NOT_FOUND
-        return Response(
+        elif isinstance(exc, Throttled):
+            status_obj = status.HTTP_429_TOO_MANY_REQUESTS
+        resp = Response(
             MediaUtil.generate_error_image(
                 status_obj,
                 str(exc),
                 self.request.accepted_renderer.format),
             status=status_obj)
+        if isinstance(exc, Throttled):
+            resp['Retry-After'] = str(math.ceil(exc.wait))
+        return resp
+
+    def _get_render_key(self, params):
+        video = Media.objects.get(pk=params['id'])
+        return render_key(video, params=params, format=self.request.accepted_renderer.format)
 
     def _get(self, params):
         # upon success we can return an image
@@ -101,14 +114,12 @@ class GetFrameAPI(BaseDetailView):
                     pass
                 else:
                     self.request.accepted_renderer = GifRenderer()
-                gif_fp = media_util.get_animation(frames, roi_arg, fps=animate,
-                                                  render_format=self.request.accepted_renderer.format)
-                with open(gif_fp, 'rb') as data_file:
-                    response_data = data_file.read()
+                response_data = media_util.get_animation(
+                    frames, roi_arg, fps=animate,
+                    render_format=self.request.accepted_renderer.format)
             else:
                 logger.info(f"Accepted format = {self.request.accepted_renderer.format}")
-                tiled_fp = media_util.get_tile_image(frames, roi_arg, tile_size,
-                                                     render_format=self.request.accepted_renderer.format)
-                with open(tiled_fp, 'rb') as data_file:
-                    response_data = data_file.read()
+                response_data = media_util.get_tile_image(
+                    frames, roi_arg, tile_size,
+                    render_format=self.request.accepted_renderer.format)
         return response_data
@@ -15,6 +15,8 @@ from ._base_views import BaseListView
 from ._base_views import BaseDetailView
 from ._permissions import ProjectTransferPermission
 from ._job import workflow_to_job
+from ._job import import_to_job
+from ._job import cancel_import
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +34,16 @@ class JobListAPI(BaseListView):
         selector = f'project={project}'
         if gid is not None:
             selector += f',gid={gid}'
-            cache = TatorCache().get_jobs_by_gid(gid, first_only=True)
+            cache = TatorCache().get_jobs_by_gid(gid)
             assert(cache[0]['project'] == project)
         else:
             cache = TatorCache().get_jobs_by_project(project)
+
+        # Import jobs are tracked in the cache rather than by argo.
+        imports = [job for job in cache if job.get('job_type') == 'import']
+        cache = [job for job in cache if job.get('job_type') != 'import']
         jobs = get_jobs(selector, cache)
-        return [workflow_to_job(job) for job in jobs]
+        return [workflow_to_job(job) for job in jobs] + [import_to_job(job) for job in imports]
 
     def _delete(self, params):
         # Parse parameters
@@ -48,13 +54,16 @@ class JobListAPI(BaseListView):
         if gid is not None:
             selector += f',gid={gid}'
             try:
-                cache = TatorCache().get_jobs_by_gid(gid, first_only=True)
+                cache = TatorCache().get_jobs_by_gid(gid)
                 assert(cache[0]['project'] == project)
             except:
                 raise Http404
         else:
             cache = TatorCache().get_jobs_by_project(project)
+        imports = [job for job in cache if job.get('job_type') == 'import']
+        cache = [job for job in cache if job.get('job_type') != 'import']
         cancelled = cancel_jobs(selector, cache)
+        cancelled += sum([cancel_import(job) for job in imports])
         return {'message': f"Deleted {cancelled} jobs for project {project}!"}
 
 class JobDetailAPI(BaseDetailView):
@@ -74,6 +83,8 @@ class JobDetailAPI(BaseDetailView):
         cache = TatorCache().get_jobs_by_uid(uid)
         if cache is None:
             raise Http404
+        if cache[0].get('job_type') == 'import':
+            return import_to_job(cache[0])
         jobs = get_jobs(f'uid={uid}', cache)
         if len(jobs) != 1:
             raise Http404
@@ -84,7 +95,10 @@ class JobDetailAPI(BaseDetailView):
         cache = TatorCache().get_jobs_by_uid(uid)
         if cache is None:
             raise Http404
-        cancelled = cancel_jobs(f'uid={uid}', cache)
+        if cache[0].get('job_type') == 'import':
+            cancelled = cancel_import(cache[0])
+        else:
+            cancelled = cancel_jobs(f'uid={uid}', cache)
         if cancelled != 1:
             raise Http404
 
@@ -26,21 +26,28 @@ from ..schema.components import localization as localization_schema
 
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
+from ._base_views import ConditionalGetMixin
 from ._annotation_query import get_annotation_queryset
 from ._annotation_query import get_annotation_es_query
+from ._annotation_query import get_annotation_validator
+from ._annotation_events import notify_annotation_change
+from ._annotation_update import bulk_update_annotations
+from ._annotation_update import update_has_children
 from ._attributes import patch_attributes
 from ._attributes import bulk_patch_attributes
 from ._attributes import validate_attributes
 from ._util import bulk_create_from_generator
 from ._util import computeRequiredFields
 from ._util import check_required_fields
+from ._util import get_projection
+from ._util import values_with_projection
 from ._permissions import ProjectEditPermission
 
 logger = logging.getLogger(__name__)
 
 LOCALIZATION_PROPERTIES = list(localization_schema['properties'].keys())
 
-class LocalizationListAPI(BaseListView):
+class LocalizationListAPI(ConditionalGetMixin, BaseListView):
     """ Interact with list of localizations.
 
         Localizations are shape annotations drawn on a video or image. They are currently of type
@@ -55,37 +62,40 @@ class LocalizationListAPI(BaseListView):
     http_method_names = ['get', 'post', 'patch', 'delete', 'put']
     entity_type = LocalizationType # Needed by attribute filter mixin
 
+    def _get_validator(self, params):
+        return get_annotation_validator(self.kwargs['project'], params, 'localization')
+
     def _get(self, params):
         qs = get_annotation_queryset(self.kwargs['project'], params, 'localization')
-        response_data = list(qs.values(*LOCALIZATION_PROPERTIES))
+        columns, attribute_keys = get_projection(params, LOCALIZATION_PROPERTIES)
+        response_data = values_with_projection(qs, columns, attribute_keys)
 
         # Adjust fields for csv output.
         if self.request.accepted_renderer.format == 'csv':
             # CSV creation requires a bit more
-            user_ids = set([d['user'] for d in response_data])
+            user_ids = set([d.get('user') for d in response_data])
             users = list(User.objects.filter(id__in=user_ids).values('id','email'))
             email_dict = {}
             for user in users:
                 email_dict[user['id']] = user['email']
 
-            media_ids = set([d['media'] for d in response_data])
+            media_ids = set([d.get('media') for d in response_data])
             medias = list(Media.objects.filter(id__in=media_ids).values('id','name'))
             filename_dict = {}
             for media in medias:
                 filename_dict[media['id']] = media['name']
 
             for element in response_data:
-                del element['meta']
-
-                oldAttributes = element['attributes']
-                del element['attributes']
-                element.update(oldAttributes)
+                element.pop('meta', None)
 
-                user_id = element['user']
-                media_id = element['media']
+                oldAttributes = element.pop('attributes', None)
+                if oldAttributes:
+                    element.update(oldAttributes)
 
-                element['user'] = email_dict[user_id]
-                element['media'] = filename_dict[media_id]
+                if 'user' in element:
+                    element['user'] = email_dict[element['user']]
+                if 'media' in element:
+                    element['media'] = filename_dict[element['media']]
         return response_data
 
     def _post(self, params):
@@ -196,6 +206,7 @@ class LocalizationListAPI(BaseListView):
                 ts.bulk_add_documents(documents)
                 documents = []
         ts.bulk_add_documents(documents)
+        update_has_children([loc.parent_id for loc in localizations])
 
         # Create ChangeLogs
         objs = (
@@ -214,6 +225,8 @@ class LocalizationListAPI(BaseListView):
             for ref_id, cl in zip(ids, change_logs)
         )
         bulk_create_from_generator(objs, ChangeToObject)
+        notify_annotation_change(project.id, self.request.user, 'localization', 'create',
+                                 [(loc.id, loc.media_id) for loc in localizations])
 
         # Return created IDs.
         return {'message': f'Successfully created {len(ids)} localizations!', 'id': ids}
@@ -233,9 +246,14 @@ class LocalizationListAPI(BaseListView):
                 ref_ids.append(obj.id)
 
             # Delete the localizations.
+            pairs = list(qs.values_list('id', 'media'))
+            parent_ids = list(qs.values_list('parent', flat=True))
             qs.update(deleted=True,
                       modified_datetime=datetime.datetime.now(datetime.timezone.utc),
                       modified_by=self.request.user)
+            notify_annotation_change(project.id, self.request.user, 'localization', 'delete',
+                                     pairs)
+            update_has_children(parent_ids)
             query = get_annotation_es_query(params['project'], params, 'localization')
             TatorSearch().delete(self.kwargs['project'], query)
 
@@ -256,6 +274,17 @@ class LocalizationListAPI(BaseListView):
         return {'message': f'Successfully deleted {count} localizations!'}
 
     def _patch(self, params):
+        updates = params.pop('updates', None)
+        if updates is not None:
+            # Apply a different update to each localization in one statement.
+            if 'attributes' in params:
+                raise Exception("Parameter 'updates' may not be combined with 'attributes'!")
+            params['ids'] = [int(id_) for id_ in updates]
+            qs = get_annotation_queryset(params['project'], params, 'localization')
+            project = Project.objects.get(pk=params['project'])
+            count = bulk_update_annotations(project, self.request.user, updates, qs, 'localization')
+            return {'message': f'Successfully updated {count} localizations!'}
+
         patched_version = params.pop("version", None)
         qs = get_annotation_queryset(params['project'], params, 'localization')
         count = qs.count()
@@ -266,10 +295,14 @@ class LocalizationListAPI(BaseListView):
             first_id = obj.id
             entity_type = obj.meta
             new_attrs = validate_attributes(params, qs[0])
+            pairs = list(qs.values_list('id', 'media'))
             bulk_patch_attributes(new_attrs, qs)
             if patched_version is not None:
                 qs.update(version=patched_version)
-            qs.update(modified_by=self.request.user)
+            qs.update(modified_by=self.request.user,
+                      modified_datetime=datetime.datetime.now(datetime.timezone.utc))
+            notify_annotation_change(params['project'], self.request.user, 'localization',
+                                     'update', pairs)
 
             # Get one object from the queryset to create the change log
             obj = Localization.objects.get(pk=first_id)
@@ -310,6 +343,9 @@ class LocalizationDetailAPI(BaseDetailView):
         qs = Localization.objects.filter(pk=params['id'], deleted=False)
         if not qs.exists():
             raise Http404
+        if params.get('fields') is not None:
+            columns, attribute_keys = get_projection(params, LOCALIZATION_PROPERTIES)
+            return values_with_projection(qs, columns, attribute_keys)[0]
         return database_qs(qs)[0]
 
     @transaction.atomic
@@ -376,6 +412,8 @@ class LocalizationDetailAPI(BaseDetailView):
             obj.thumbnail_image.save()
 
         obj.save()
+        notify_annotation_change(obj.project_id, self.request.user, 'localization', 'update',
+                                 [(obj.id, obj.media_id)])
         cl = ChangeLog(
             project=obj.project,
             user=self.request.user,
@@ -403,6 +441,9 @@ class LocalizationDetailAPI(BaseDetailView):
         qs.update(deleted=True,
                   modified_datetime=datetime.datetime.now(datetime.timezone.utc),
                   modified_by=self.request.user)
+        notify_annotation_change(project.id, self.request.user, 'localization', 'delete',
+                                 [(obj.id, obj.media_id)])
+        update_has_children([obj.parent_id])
         cl = ChangeLog(project=project, user=self.request.user, description_of_change=delete_dict)
         cl.save()
         ChangeToObject(ref_table=ref_table, ref_id=ref_id, change_id=cl).save()
@@ -3,10 +3,12 @@ from collections import defaultdict
 from ..schema import LocalizationCountSchema
 
 from ._base_views import BaseDetailView
+from ._base_views import ConditionalGetMixin
 from ._annotation_query import get_annotation_count
+from ._annotation_query import get_annotation_validator
 from ._permissions import ProjectViewOnlyPermission
 
-class LocalizationCountAPI(BaseDetailView):
+class LocalizationCountAPI(ConditionalGetMixin, BaseDetailView):
     """ Retrieve number of localizations in a localization list.
 
         This endpoint accepts the same query parameters as a GET request to the `Localizations` endpoint,
@@ -21,3 +23,5 @@ class LocalizationCountAPI(BaseDetailView):
         """
         return get_annotation_count(params['project'], params, 'localization')
 
+    def _get_validator(self, params):
+        return get_annotation_validator(params['project'], params, 'localization')
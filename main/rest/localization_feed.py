@@ -0,0 +1,95 @@
+import json
+import logging
+import struct
+
+import numpy as np
+
+from ..renderers import BinaryRenderer
+from ..schema import LocalizationFeedSchema
+
+from ._base_views import BaseListView
+from ._annotation_query import get_annotation_queryset
+from ._permissions import ProjectViewOnlyPermission
+
+logger = logging.getLogger(__name__)
+
+# Fixed width fields of each record. Lines store `u` and `v` in `width` and `height`.
+FEED_FIELDS = [('id', '<u4'), ('type', '<u4'), ('frame', '<u4'), ('x', '<f4'), ('y', '<f4'),
+               ('width', '<f4'), ('height', '<f4')]
+
+# Attribute index used when a localization has no value for an attribute.
+MISSING_INDEX = 0xFFFFFFFF
+
+# Records start at a multiple of this many bytes, so clients can view them with typed
+# arrays without copying.
+RECORD_ALIGNMENT = 8
+
+def encode_feed(rows):
+    """ Encodes localizations as a header followed by fixed width records.
+
+        rows: List of tuples containing id, type, frame, x, y, width, height, u, v
+            and attributes.
+
+        The output begins with the header length as a little endian uint32, followed
+        by a UTF-8 JSON header containing the record count, record size, field names,
+        attribute names, and a dictionary of distinct attribute values. The header is
+        padded with spaces so that records start at a multiple of RECORD_ALIGNMENT
+        bytes. Records follow, sorted by frame and ID, with one uint32 index into the
+        dictionary per attribute.
+    """
+    attribute_names = sorted({name for row in rows for name in (row[-1] or {})})
+    dtype = FEED_FIELDS + [(f'attr_{idx}', '<u4') for idx in range(len(attribute_names))]
+    records = np.zeros(len(rows), dtype=dtype)
+    if rows:
+        columns = [np.array(column, dtype=np.float64) for column in list(zip(*rows))[:-1]]
+        for idx, field in enumerate(['id', 'type', 'frame']):
+            records[field] = np.nan_to_num(columns[idx])
+        for idx, field in enumerate(['x', 'y'], 3):
+            records[field] = columns[idx]
+        # Lines have no width or height, so their vector components are stored instead.
+        for field, idx in [('width', 7), ('height', 8)]:
+            records[field] = np.where(np.isnan(columns[idx - 2]), columns[idx], columns[idx - 2])
+
+    # Replace attribute values with indices into a dictionary of distinct values.
+    dictionary = []
+    lookup = {}
+    for attr_idx, name in enumerate(attribute_names):
+        indices = np.full(len(rows), MISSING_INDEX, dtype=np.uint32)
+        for row_idx, row in enumerate(rows):
+            attributes = row[-1] or {}
+            if name not in attributes:
+                continue
+            key = json.dumps(attributes[name], sort_keys=True)
+            if key not in lookup:
+                lookup[key] = len(dictionary)
+                dictionary.append(attributes[name])
+            indices[row_idx] = lookup[key]
+        records[f'attr_{attr_idx}'] = indices
+    records = records[np.argsort(records, order=['frame', 'id'], kind='stable')]
+
+    header = json.dumps({
+        'count': len(records),
+        'record_size': records.dtype.itemsize,
+        'fields': [name for name, _ in FEED_FIELDS],
+        'attributes': attribute_names,
+        'dictionary': dictionary,
+    }).encode('utf-8')
+    header += b' ' * (-(4 + len(header)) % RECORD_ALIGNMENT)
+    return struct.pack('<I', len(header)) + header + records.tobytes()
+
+class LocalizationFeedAPI(BaseListView):
+    """ Retrieve localizations in a compact binary encoding.
+
+        Intended for clients that fetch localizations in frame windows, such as a
+        video player scrubbing through a long video.
+    """
+    schema = LocalizationFeedSchema()
+    renderer_classes = (BinaryRenderer,)
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        qs = get_annotation_queryset(params['project'], params, 'localization')
+        rows = list(qs.values_list('id', 'meta', 'frame', 'x', 'y', 'width', 'height',
+                                   'u', 'v', 'attributes'))
+        return encode_feed(rows)
@@ -1,11 +1,13 @@
 from typing import Tuple
 from types import SimpleNamespace
 import logging
+import math
 import tempfile
 import traceback
 
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from django.http import response
 
 from ..models import Localization, Media
@@ -16,14 +18,16 @@ from ..renderers import Mp4Renderer
 from ..schema import LocalizationGraphicSchema
 from ..schema import parse
 from ._base_views import BaseDetailView
+from ._base_views import RenderCacheMixin
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
+from ._render_cache import render_key
 from .temporary_file import TemporaryFileDetailAPI
 
 logger = logging.getLogger(__name__)
 
 
-class LocalizationGraphicAPI(BaseDetailView):
+class LocalizationGraphicAPI(RenderCacheMixin, BaseDetailView):
     """ Endpoint that retrieves an image of the requested localization
     """
 
@@ -46,12 +50,17 @@ class LocalizationGraphicAPI(BaseDetailView):
         status_obj = status.HTTP_400_BAD_REQUEST
         if type(exc) is response.Http404:
             status_obj = status.HTTP_404_NOT_FOUND
-        return Response(
+        elif isinstance(exc, Throttled):
+            status_obj = status.HTTP_429_TOO_MANY_REQUESTS
+        resp = Response(
             MediaUtil.generate_error_image(
                 status_obj,
                 str(exc),
                 self.request.accepted_renderer.format),
             status=status_obj)
+        if isinstance(exc, Throttled):
+            resp['Retry-After'] = str(math.ceil(exc.wait))
+        return resp
 
     def _getMargins(self, localization_type: str, params: dict):
         """ Returns x/y margins to use based on the provided parameters and localization object
@@ -92,6 +101,24 @@ class LocalizationGraphicAPI(BaseDetailView):
 
         return margins
 
+    def _getForceScale(self, params: dict):
+        """ Returns the forced image size as a (width, height) tuple, or None
+
+        Private helper method used by _get()
+        """
+
+        # Extract the force image size argument and assert if there's a problem with the provided inputs
+        force_image_size = params.get(self.schema.PARAMS_IMAGE_SIZE, None)
+        if force_image_size is not None:
+            img_width_height = force_image_size.split('x')
+            assert len(img_width_height) == 2
+            requested_width = int(img_width_height[0])
+            requested_height = int(img_width_height[1])
+            assert requested_width > 0
+            assert requested_height > 0
+            force_image_size = (requested_width, requested_height)
+        return force_image_size
+
     def _getRoi(
             self,
             obj: str,
@@ -209,6 +236,14 @@ class LocalizationGraphicAPI(BaseDetailView):
 
         return tuple(roi)
 
+    def _get_render_key(self, params: dict):
+        """ Overridden method. Please refer to parent's documentation.
+        """
+        obj = Localization.objects.select_related('meta', 'media').get(pk=params['id'])
+        geometry = [obj.meta.dtype, obj.frame, obj.x, obj.y, obj.width, obj.height, obj.u, obj.v]
+        return render_key(obj.media, params=params, geometry=geometry,
+                          format=self.request.accepted_renderer.format)
+
     def _get(self, params: dict):
         """ Overridden method. Please refer to parent's documentation.
         """
@@ -216,16 +251,7 @@ class LocalizationGraphicAPI(BaseDetailView):
         # Get the localization associated with the given ID
         obj = Localization.objects.get(pk=params['id'])
 
-        # Extract the force image size argument and assert if there's a problem with the provided inputs
-        force_image_size = params.get(self.schema.PARAMS_IMAGE_SIZE, None)
-        if force_image_size is not None:
-            img_width_height = force_image_size.split('x')
-            assert len(img_width_height) == 2
-            requested_width = int(img_width_height[0])
-            requested_height = int(img_width_height[1])
-            assert requested_width > 0
-            assert requested_height > 0
-            force_image_size = (requested_width, requested_height)
+        force_image_size = self._getForceScale(params)
 
         # By reaching here, it's expected that the graphics mode is to create a new
         # thumbnail using the provided parameters. That new thumbnail is returned
@@ -242,16 +268,13 @@ class LocalizationGraphicAPI(BaseDetailView):
             if media_util.isVideo():
                 # We will only pass a single frame and corresponding roi into this
                 # so the expected output is only one tile instead of many
-                image_path = media_util.get_tile_image(
+                response_data = media_util.get_tile_image(
                     frames=[obj.frame],
                     rois=[roi],
                     tile_size=None,
                     render_format=self.request.accepted_renderer.format,
                     force_scale=force_image_size)
 
-                with open(image_path, 'rb') as data_file:
-                    response_data = data_file.read()
-
             else:
                 # Grab the ROI from the image
                 response_data = media_util.get_cropped_image(
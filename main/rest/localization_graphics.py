@@ -0,0 +1,99 @@
+from collections import defaultdict
+import io
+import logging
+import math
+import tempfile
+import zipfile
+
+from ..models import Localization
+from ..renderers import PngRenderer
+from ..renderers import JpegRenderer
+from ..renderers import ZipRenderer
+from ..schema import LocalizationGraphicsSchema
+from ._base_views import PutMixin
+from ._frame_decoder import encode_tile
+from ._media_util import MediaUtil
+from ._render_limits import render_slot
+from .localization_graphic import LocalizationGraphicAPI
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of localizations in one request.
+MAX_GRAPHICS = 1000
+
+class LocalizationGraphicsAPI(PutMixin, LocalizationGraphicAPI):
+    """ Endpoint that retrieves images of many localizations at once.
+
+        Localizations are grouped by media so that each media is opened once, and each
+        distinct frame is decoded once regardless of how many localizations it
+        contains. Images are returned as entries of a zip file named by localization
+        ID, or as a single tiled image in request order.
+    """
+
+    schema = LocalizationGraphicsSchema()
+    renderer_classes = (ZipRenderer, JpegRenderer, PngRenderer)
+    http_method_names = ['put']
+
+    def handle_exception(self, exc):
+        """ Overridden method. Please refer to parent's documentation.
+        """
+        # Errors are returned as images, which cannot be rendered as a zip file.
+        if getattr(self.request, 'accepted_renderer', None) is not None:
+            if self.request.accepted_renderer.format == 'zip':
+                self.request.accepted_renderer = PngRenderer()
+                self.request.accepted_media_type = PngRenderer.media_type
+        return super().handle_exception(exc)
+
+    def _put(self, params: dict):
+        """ Retrieve images of localizations by ID.
+        """
+        ids = list(dict.fromkeys(params['ids']))
+        if len(ids) == 0:
+            raise Exception("At least one localization ID must be given!")
+        if len(ids) > MAX_GRAPHICS:
+            raise Exception(f"Requested {len(ids)} localizations, limit is {MAX_GRAPHICS}!")
+        force_image_size = self._getForceScale(params)
+
+        qs = Localization.objects.filter(pk__in=ids, project=params['project'], deleted=False)\
+                                 .select_related('meta', 'media')
+        localizations = {obj.id: obj for obj in qs}
+        missing = set(ids) - set(localizations.keys())
+        if missing:
+            raise Exception(f"Localizations {sorted(missing)} not found in project "
+                            f"{params['project']}!")
+
+        # Render the localizations of each media together.
+        by_media = defaultdict(list)
+        for obj in localizations.values():
+            by_media[obj.media_id].append(obj)
+        images = {}
+        with render_slot(self.request.user.id, params['project']):
+            for objs in by_media.values():
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    media_util = MediaUtil(video=objs[0].media, temp_dir=temp_dir)
+                    rois = [self._getRoi(obj=obj,
+                                         params=params,
+                                         media_width=media_util.getWidth(),
+                                         media_height=media_util.getHeight())
+                            for obj in objs]
+                    crops = media_util.get_crops(frames=[obj.frame for obj in objs],
+                                                 rois=rois,
+                                                 force_scale=force_image_size)
+                images.update({obj.id: crop for obj, crop in zip(objs, crops)})
+
+        response_format = self.request.accepted_renderer.format
+        if response_format == 'zip':
+            image_format = params.get(self.schema.PARAMS_IMAGE_FORMAT, 'jpg')
+            zip_buf = io.BytesIO()
+            with zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_STORED) as zip_file:
+                for localization_id in ids:
+                    zip_file.writestr(f"{localization_id}.{image_format}",
+                                      encode_tile([images[localization_id]], 1, 1,
+                                                  image_format))
+            response_data = zip_buf.getvalue()
+        else:
+            columns = math.ceil(math.sqrt(len(ids)))
+            rows = math.ceil(len(ids) / columns)
+            response_data = encode_tile([images[localization_id] for localization_id in ids],
+                                        columns, rows, response_format)
+        return response_data
@@ -0,0 +1,27 @@
+from ..models import Project
+from ..schema import LocalizationIngestSchema
+
+from ._base_views import BaseListView
+from ._annotation_ingest import ingest_localizations
+from ._permissions import ProjectEditPermission
+
+class LocalizationIngestAPI(BaseListView):
+    """ Create a large number of localizations.
+
+        This endpoint accepts the same localization specs as a POST request to the
+        `Localizations` endpoint, but writes them with COPY and a single INSERT, and
+        records one summarized change log entry for the whole request. It is intended
+        for imports of large numbers of localizations.
+    """
+    schema = LocalizationIngestSchema()
+    permission_classes = [ProjectEditPermission]
+    http_method_names = ['post']
+
+    def _post(self, params):
+        if 'body' in params:
+            loc_specs = params['body']
+        else:
+            raise Exception('Localization ingest requires list of localizations!')
+        project = Project.objects.get(pk=params['project'])
+        ids = ingest_localizations(project, self.request.user, loc_specs)
+        return {'message': f'Successfully created {len(ids)} localizations!', 'id': ids}
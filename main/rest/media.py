@@ -14,6 +14,7 @@ from django.db.models import Case, When
 from django.http import Http404
 from PIL import Image
 
+from ..cache import TatorCache
 from ..models import (
     ChangeLog,
     ChangeToObject,
@@ -36,8 +37,9 @@ from ..download import download_file
 from ..store import get_tator_store, get_storage_lookup
 
 from ._util import bulk_create_from_generator, computeRequiredFields, check_required_fields
-from ._base_views import BaseListView, BaseDetailView
-from ._media_query import get_media_queryset, get_media_es_query
+from ._util import get_projection, values_with_projection
+from ._base_views import BaseListView, BaseDetailView, ConditionalGetMixin
+from ._media_query import get_media_queryset, get_media_es_query, get_media_validator
 from ._attributes import bulk_patch_attributes, patch_attributes, validate_attributes
 from ._permissions import ProjectEditPermission, ProjectTransferPermission
 
@@ -128,7 +130,7 @@ def _save_image(url, media_obj, project_obj, role):
     Resource.add_resource(image_key, media_obj)
     return media_obj
 
-class MediaListAPI(BaseListView):
+class MediaListAPI(ConditionalGetMixin, BaseListView):
     """ Interact with list of media.
 
         A media may be an image or a video. Media are a type of entity in Tator,
@@ -150,6 +152,12 @@ class MediaListAPI(BaseListView):
             self.permission_classes = [ProjectEditPermission]
         return super().get_permissions()
 
+    def _get_validator(self, params):
+        # Presigned URLs expire, so responses containing them are not validated.
+        if params.get('presigned') is not None:
+            return None
+        return get_media_validator(self.kwargs['project'], params)
+
     def _get(self, params):
         """ Retrieve list of media.
 
@@ -157,9 +165,10 @@ class MediaListAPI(BaseListView):
             meaning they can be described by user defined attributes.
         """
         qs = get_media_queryset(self.kwargs['project'], params)
-        response_data = list(qs.values(*MEDIA_PROPERTIES))
+        columns, attribute_keys = get_projection(params, MEDIA_PROPERTIES)
+        response_data = values_with_projection(qs, columns, attribute_keys)
         presigned = params.get('presigned')
-        if presigned is not None:
+        if presigned is not None and 'media_files' in columns:
             _presign(presigned, response_data)
         return response_data
 
@@ -532,6 +541,7 @@ class MediaListAPI(BaseListView):
                     bulk_create_from_generator(objs, ChangeToObject)
                 count = max(count, archive_count)
 
+        TatorCache().bump_write_generation(params['project'])
         return {"message": f"Successfully patched {count} medias!"}
 
     def _put(self, params):
@@ -559,9 +569,10 @@ class MediaDetailAPI(BaseDetailView):
         qs = Media.objects.filter(pk=params['id'], deleted=False)
         if not qs.exists():
             raise Http404
-        response_data = list(qs.values(*MEDIA_PROPERTIES))
+        columns, attribute_keys = get_projection(params, MEDIA_PROPERTIES)
+        response_data = values_with_projection(qs, columns, attribute_keys)
         presigned = params.get('presigned')
-        if presigned is not None:
+        if presigned is not None and 'media_files' in columns:
             _presign(presigned, response_data)
         return response_data[0]
 
@@ -651,6 +662,7 @@ class MediaDetailAPI(BaseDetailView):
 
         obj = Media.objects.get(pk=params['id'], deleted=False)
         TatorSearch().create_document(obj)
+        TatorCache().bump_write_generation(obj.project.pk)
         if 'attributes' in params:
             if obj.meta.dtype == 'image':
                 for localization in obj.localization_thumbnail_image.all():
@@ -4,10 +4,12 @@ from ..models import Media
 from ..schema import MediaCountSchema
 
 from ._base_views import BaseDetailView
+from ._base_views import ConditionalGetMixin
 from ._media_query import get_media_count
+from ._media_query import get_media_validator
 from ._permissions import ProjectViewOnlyPermission
 
-class MediaCountAPI(BaseDetailView):
+class MediaCountAPI(ConditionalGetMixin, BaseDetailView):
     """ Retrieve number of media in a media list.
 
         This endpoint accepts the same query parameters as a GET request to the `Medias` endpoint,
@@ -22,3 +24,5 @@ class MediaCountAPI(BaseDetailView):
         """
         return get_media_count(params['project'], params)
 
+    def _get_validator(self, params):
+        return get_media_validator(params['project'], params)
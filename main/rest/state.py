@@ -1,12 +1,10 @@
 import logging
 import datetime
-import itertools
 
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.http import Http404
-import numpy as np
 
 from ..models import ChangeLog
 from ..models import ChangeToObject
@@ -15,8 +13,6 @@ from ..models import StateType
 from ..models import Media
 from ..models import Localization
 from ..models import Project
-from ..models import Membership
-from ..models import Version
 from ..models import User
 from ..models import InterpolationMethods
 from ..models import database_qs
@@ -30,14 +26,20 @@ from ..schema.components import state as state_schema
 
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
+from ._base_views import ConditionalGetMixin
+from ._annotation_ingest import create_states
 from ._annotation_query import get_annotation_queryset
 from ._annotation_query import get_annotation_es_query
+from ._annotation_query import get_annotation_validator
+from ._annotation_events import notify_annotation_change
+from ._annotation_update import bulk_update_annotations
+from ._state_timeline import get_state_timeline
 from ._attributes import patch_attributes
 from ._attributes import bulk_patch_attributes
 from ._attributes import validate_attributes
 from ._util import bulk_create_from_generator
-from ._util import computeRequiredFields
-from ._util import check_required_fields
+from ._util import get_projection
+from ._util import values_with_projection
 from ._permissions import ProjectEditPermission
 
 logger = logging.getLogger(__name__)
@@ -45,27 +47,41 @@ logger = logging.getLogger(__name__)
 STATE_PROPERTIES = list(state_schema['properties'].keys())
 STATE_PROPERTIES.pop(STATE_PROPERTIES.index('media'))
 STATE_PROPERTIES.pop(STATE_PROPERTIES.index('localizations'))
+STATE_M2M_PROPERTIES = ['media', 'localizations']
 
-def _fill_m2m(response_data):
-    # Get many to many fields.
+def _fill_m2m(response_data, fields=STATE_M2M_PROPERTIES):
+    # Get many to many fields. Only fields that were requested are aggregated.
     state_ids = [state['id'] for state in response_data]
-    localizations = {obj['state_id']:obj['localizations'] for obj in
-        State.localizations.through.objects\
-        .filter(state__in=state_ids)\
-        .values('state_id').order_by('state_id')\
-        .annotate(localizations=ArrayAgg('localization_id')).iterator()}
-    media = {obj['state_id']:obj['media'] for obj in
-        State.media.through.objects\
-        .filter(state__in=state_ids)\
-        .values('state_id').order_by('state_id')\
-        .annotate(media=ArrayAgg('media_id')).iterator()}
+    if 'localizations' in fields:
+        localizations = {obj['state_id']:obj['localizations'] for obj in
+            State.localizations.through.objects\
+            .filter(state__in=state_ids)\
+            .values('state_id').order_by('state_id')\
+            .annotate(localizations=ArrayAgg('localization_id')).iterator()}
+    if 'media' in fields:
+        media = {obj['state_id']:obj['media'] for obj in
+            State.media.through.objects\
+            .filter(state__in=state_ids)\
+            .values('state_id').order_by('state_id')\
+            .annotate(media=ArrayAgg('media_id')).iterator()}
     # Copy many to many fields into response data.
     for state in response_data:
-        state['localizations'] = localizations.get(state['id'], [])
-        state['media'] = media.get(state['id'], [])
+        if 'localizations' in fields:
+            state['localizations'] = localizations.get(state['id'], [])
+        if 'media' in fields:
+            state['media'] = media.get(state['id'], [])
     return response_data
 
-class StateListAPI(BaseListView):
+def _split_projection(params):
+    """ Returns columns, attribute keys, and many to many fields selected by the
+        `fields` parameter.
+    """
+    columns, attribute_keys = get_projection(params, STATE_PROPERTIES + STATE_M2M_PROPERTIES)
+    m2m_fields = [field for field in STATE_M2M_PROPERTIES if field in columns]
+    columns = [column for column in columns if column not in STATE_M2M_PROPERTIES]
+    return columns, attribute_keys, m2m_fields
+
+class StateListAPI(ConditionalGetMixin, BaseListView):
     """ Interact with list of states.
 
         A state is a description of a collection of other objects. The objects a state describes
@@ -86,55 +102,56 @@ class StateListAPI(BaseListView):
     http_method_names = ['get', 'post', 'patch', 'delete', 'put']
     entity_type = StateType # Needed by attribute filter mixin
 
+    def _get_validator(self, params):
+        return get_annotation_validator(self.kwargs['project'], params, 'state')
+
     def _get(self, params):
         t0 = datetime.datetime.now()
         qs = get_annotation_queryset(self.kwargs['project'], params, 'state')
-        response_data = list(qs.values(*STATE_PROPERTIES))
+        columns, attribute_keys, m2m_fields = _split_projection(params)
+        response_data = values_with_projection(qs, columns, attribute_keys)
 
         t1 = datetime.datetime.now()
-        response_data = _fill_m2m(response_data)
+        response_data = _fill_m2m(response_data, m2m_fields)
         if self.request.accepted_renderer.format == 'csv':
 
             # CSV creation requires a bit more
-            user_ids = set([d['modified_by'] for d in response_data])
+            user_ids = set([d.get('modified_by') for d in response_data])
             users = list(User.objects.filter(id__in=user_ids).values('id','email'))
             email_dict = {}
             for user in users:
                 email_dict[user['id']] = user['email']
 
-            media_ids = set(media for d in response_data for media in d['media'])
+            media_ids = set(media for d in response_data for media in d.get('media', []))
             medias = list(Media.objects.filter(id__in=media_ids).values('id','name'))
             filename_dict = {media['id']:media['name'] for media in medias}
 
             for element in response_data:
-                del element['meta']
+                element.pop('meta', None)
 
-                oldAttributes = element['attributes']
-                del element['attributes']
-                element.update(oldAttributes)
+                oldAttributes = element.pop('attributes', None)
+                if oldAttributes:
+                    element.update(oldAttributes)
 
-                user_id = element['modified_by']
-                media_ids = element['media']
-
-                element['user'] = email_dict[user_id]
-                element['media'] = [filename_dict[media_id] for media_id in media_ids]
+                if 'modified_by' in element:
+                    element['user'] = email_dict[element['modified_by']]
+                if 'media' in element:
+                    element['media'] = [filename_dict[media_id] for media_id in element['media']]
 
             if 'type' in params:
                 type_object=StateType.objects.get(pk=params['type'])
-                if type_object.association == 'Frame' and type_object.interpolation == InterpolationMethods.LATEST:
-                    for idx,el in enumerate(response_data):
-                        mediaEl=Media.objects.get(pk=el['media'])
-                        endFrame=0
-                        if idx + 1 < len(response_data):
-                            next_element=response_data[idx+1]
-                            endFrame=next_element['frame']
-                        else:
-                            endFrame=mediaEl.num_frames
-                        el['media']=mediaEl.name
-
-                        el['endFrame'] = endFrame
-                        el['startSeconds'] = int(el['frame']) * mediaEl.fps
-                        el['endSeconds'] = int(el['endFrame']) * mediaEl.fps
+                if (type_object.association == 'Frame'
+                        and type_object.interpolation == InterpolationMethods.LATEST.value):
+                    timeline = {}
+                    for interval in get_state_timeline(qs):
+                        timeline.setdefault(interval['id'], interval)
+                    for element in response_data:
+                        interval = timeline.get(element.get('id'))
+                        if interval is None:
+                            continue
+                        element['endFrame'] = interval['end_frame']
+                        element['startSeconds'] = interval['start_seconds']
+                        element['endSeconds'] = interval['end_seconds']
         t2 = datetime.datetime.now()
         logger.info(f"Number of states: {len(response_data)}")
         logger.info(f"Time to get states: {t1-t0}")
@@ -148,172 +165,8 @@ class StateListAPI(BaseListView):
         else:
             raise Exception('State creation requires list of states!')
 
-        # Get a default version.
-        membership = Membership.objects.get(user=self.request.user, project=params['project'])
-        if membership.default_version:
-            default_version = membership.default_version
-        else:
-            default_version = Version.objects.filter(project=params['project'],
-                                                     number__gte=0).order_by('number')
-            if default_version.exists():
-                default_version = default_version[0]
-            else:
-                # If no versions exist, create one.
-                default_version = Version.objects.create(
-                    name="Baseline",
-                    description="Initial version",
-                    project=project,
-                    number=0,
-                )
-
-        # Find unique foreign keys.
-        meta_ids = set([state['type'] for state in state_specs])
-        version_ids = set([state.get('version', None) for state in state_specs])
-        version_ids.add(default_version.id)
-        localization_ids = set()
-        media_ids = set()
-        for state_spec in state_specs:
-            localization_ids.update(state_spec.get('localization_ids', []))
-            media_ids.update(state_spec['media_ids'])
-
-        # Make foreign key querysets.
-        meta_qs = StateType.objects.filter(pk__in=meta_ids)
-        version_qs = Version.objects.filter(pk__in=version_ids)
-        localization_qs = Localization.objects.filter(pk__in=localization_ids)
-        media_qs = Media.objects.filter(pk__in=media_ids)
-
-        # Construct foreign key dictionaries.
         project = Project.objects.get(pk=params['project'])
-        metas = {obj.id:obj for obj in meta_qs.iterator()}
-        versions = {obj.id:obj for obj in version_qs.iterator()}
-        versions[None] = default_version
-
-        # Make sure project of all foreign keys is correct.
-        meta_projects = list(meta_qs.values_list('project', flat=True).distinct())
-        version_projects = list(version_qs.values_list('project', flat=True).distinct())
-        localization_projects = list(localization_qs.values_list('project', flat=True).distinct())
-        media_projects = list(media_qs.values_list('project', flat=True).distinct())
-        if len(meta_projects) != 1:
-            raise Exception(f"Localization types must be part of project {project.id}, got "
-                            f"projects {meta_projects}!")
-        elif meta_projects[0] != project.id:
-            raise Exception(f"Localization types must be part of project {project.id}, got "
-                            f"project {meta_projects[0]}!")
-        if len(version_projects) != 1:
-            raise Exception(f"Versions must be part of project {project.id}, got projects "
-                            f"{version_projects}!")
-        elif version_projects[0] != project.id:
-            raise Exception(f"Versions must be part of project {project.id}, got project "
-                            f"{version_projects[0]}!")
-        if len(localization_ids) > 0:
-            if len(localization_projects) != 1:
-                raise Exception(f"Localizations must be part of project {project.id}, got projects "
-                                f"{localization_projects}!")
-            elif localization_projects[0] != project.id:
-                raise Exception(f"Localizations must be part of project {project.id}, got project "
-                                f"{localization_projects[0]}!")
-        if len(media_projects) != 1:
-            raise Exception(f"Media must be part of project {project.id}, got projects "
-                            f"{media_projects}!")
-        elif media_projects[0] != project.id:
-            raise Exception(f"Media must be part of project {project.id}, got project "
-                            f"{media_projects[0]}!")
-
-        # Get required fields for attributes.
-        required_fields = {id_:computeRequiredFields(metas[id_]) for id_ in meta_ids}
-        attr_specs = [check_required_fields(required_fields[state['type']][0],
-                                            required_fields[state['type']][2],
-                                            state)
-                      for state in state_specs]
-
-        # Create the state objects.
-        objs = (
-            State(
-                project=project,
-                meta=metas[state_spec["type"]],
-                attributes=attrs,
-                created_by=self.request.user,
-                modified_by=self.request.user,
-                version=versions[state_spec.get("version", None)],
-                frame=state_spec.get("frame", None),
-            )
-            for state_spec, attrs in zip(state_specs, attr_specs)
-        )
-        states = bulk_create_from_generator(objs, State)
-
-        # Create media relations.
-        media_relations = []
-        for state, state_spec in zip(states, state_specs):
-            for media_id in state_spec['media_ids']:
-                media_states = State.media.through(
-                    state_id=state.id,
-                    media_id=media_id,
-                )
-                media_relations.append(media_states)
-                if len(media_relations) > 1000:
-                    State.media.through.objects.bulk_create(media_relations)
-                    media_relations = []
-        State.media.through.objects.bulk_create(media_relations)
-
-        # Create localization relations.
-        loc_relations = []
-        for state, state_spec in zip(states, state_specs):
-            if 'localization_ids' in state_spec:
-                for localization_id in state_spec['localization_ids']:
-                    loc_states = State.localizations.through(
-                        state_id=state.id,
-                        localization_id=localization_id,
-                    )
-                    loc_relations.append(loc_states)
-                    if len(loc_relations) > 1000:
-                        State.localizations.through.objects.bulk_create(loc_relations)
-                        loc_relations = []
-        State.localizations.through.objects.bulk_create(loc_relations)
-
-        # Calculate segments (this is not triggered for bulk created m2m).
-        localization_ids = itertools.chain(*[state_spec.get('localization_ids', [])
-                                             for state_spec in state_specs])
-        loc_id_to_frame = {loc['id']:loc['frame'] for loc in
-                           Localization.objects.filter(pk__in=localization_ids)\
-                           .values('id', 'frame').iterator()}
-        for state, state_spec in zip(states, state_specs):
-            frames = [loc_id_to_frame[loc_id] for loc_id in state_spec.get('localization_ids', [])]
-            if len(frames) > 0:
-                frames = np.sort(frames)
-                segments = np.split(frames, np.where(np.diff(frames) != 1)[0] + 1)
-                state.segments = [[int(segment[0]), int(segment[-1])] for segment in segments]
-        State.objects.bulk_update(states, ['segments'])
-
-        # Build ES documents.
-        ts = TatorSearch()
-        documents = []
-        for state in states:
-            documents += ts.build_document(state)
-            if len(documents) > 1000:
-                ts.bulk_add_documents(documents)
-                documents = []
-        ts.bulk_add_documents(documents)
-
-        # Create ChangeLogs
-        objs = (
-            ChangeLog(
-                project=project, user=self.request.user, description_of_change=state.create_dict
-            )
-            for state in states
-        )
-        change_logs = bulk_create_from_generator(objs, ChangeLog)
-
-        # Associate ChangeLogs with created objects
-        ref_table = ContentType.objects.get_for_model(states[0])
-        ids = [state.id for state in states]
-        objs = (
-            ChangeToObject(ref_table=ref_table, ref_id=ref_id, change_id=cl)
-            for ref_id, cl in zip(ids, change_logs)
-        )
-        bulk_create_from_generator(objs, ChangeToObject)
-
-        # Return created IDs.
-        ids = [state.id for state in states]
+        ids = create_states(project, self.request.user, state_specs)
         return {'message': f'Successfully created {len(ids)} states!', 'id': ids}
 
     def _delete(self, params):
@@ -328,9 +181,11 @@ class StateListAPI(BaseListView):
             ref_ids = [o.id for o in qs]
 
             # Delete states.
+            pairs = list(qs.values_list('id', 'media'))
             qs.update(deleted=True,
                       modified_datetime=datetime.datetime.now(datetime.timezone.utc),
                       modified_by=self.request.user)
+            notify_annotation_change(project.id, self.request.user, 'state', 'delete', pairs)
             query = get_annotation_es_query(params['project'], params, 'state')
             TatorSearch().delete(self.kwargs['project'], query)
 
@@ -351,14 +206,29 @@ class StateListAPI(BaseListView):
         return {'message': f'Successfully deleted {count} states!'}
 
     def _patch(self, params):
+        updates = params.pop('updates', None)
+        if updates is not None:
+            # Apply a different update to each state in one statement.
+            if 'attributes' in params:
+                raise Exception("Parameter 'updates' may not be combined with 'attributes'!")
+            params['ids'] = [int(id_) for id_ in updates]
+            qs = get_annotation_queryset(params['project'], params, 'state')
+            project = Project.objects.get(pk=params['project'])
+            count = bulk_update_annotations(project, self.request.user, updates, qs, 'state')
+            return {'message': f'Successfully updated {count} states!'}
+
         qs = get_annotation_queryset(params['project'], params, 'state')
         count = qs.count()
         if count > 0:
             # Get the current representation of the object for comparison
             original_dict = qs.first().model_dict
             new_attrs = validate_attributes(params, qs[0])
+            pairs = list(qs.values_list('id', 'media'))
             bulk_patch_attributes(new_attrs, qs)
-            qs.update(modified_by=self.request.user)
+            qs.update(modified_by=self.request.user,
+                      modified_datetime=datetime.datetime.now(datetime.timezone.utc))
+            notify_annotation_change(params['project'], self.request.user, 'state', 'update',
+                                     pairs)
 
             # Get one object from the queryset to create the change log
             obj = qs.first()
@@ -400,6 +270,9 @@ class StateDetailAPI(BaseDetailView):
         qs = State.objects.filter(pk=params['id'], deleted=False)
         if not qs.exists():
             raise Http404
+        if params.get('fields') is not None:
+            columns, attribute_keys, m2m_fields = _split_projection(params)
+            return _fill_m2m(values_with_projection(qs, columns, attribute_keys), m2m_fields)[0]
         state = database_qs(qs)[0]
         # Get many to many fields.
         state['localizations'] = list(State.localizations.through.objects\
@@ -416,6 +289,7 @@ class StateDetailAPI(BaseDetailView):
     def _patch(self, params):
         obj = State.objects.get(pk=params['id'], deleted=False)
         original_dict = obj.model_dict
+        original_media = list(obj.media.values_list('id', flat=True))
 
         if 'frame' in params:
             obj.frame = params['frame']
@@ -462,6 +336,9 @@ class StateDetailAPI(BaseDetailView):
         obj.modified_by = self.request.user
 
         obj.save()
+        media_ids = set(original_media) | set(obj.media.values_list('id', flat=True))
+        notify_annotation_change(obj.project_id, self.request.user, 'state', 'update',
+                                 [(obj.id, media_id) for media_id in media_ids])
         cl = ChangeLog(
             project=obj.project,
             user=self.request.user,
@@ -497,6 +374,9 @@ class StateDetailAPI(BaseDetailView):
         state.modified_datetime=datetime.datetime.now(datetime.timezone.utc)
         state.modified_by=self.request.user
         state.save()
+        notify_annotation_change(project.id, self.request.user, 'state', 'delete',
+                                 [(state.id, media_id)
+                                  for media_id in state.media.values_list('id', flat=True)])
         TatorSearch().delete_document(state)
         cl = ChangeLog(project=project, user=self.request.user, description_of_change=delete_dict)
         cl.save()
@@ -528,6 +408,12 @@ class MergeStatesAPI(BaseDetailView):
 
         obj = State.objects.get(pk=params['id'])
         otherObj = State.objects.get(pk=params['merge_state_id'])
+        notify_annotation_change(obj.project_id, self.request.user, 'state', 'update',
+                                 [(obj.id, media_id)
+                                  for media_id in obj.media.values_list('id', flat=True)])
+        notify_annotation_change(otherObj.project_id, self.request.user, 'state', 'delete',
+                                 [(otherObj.id, media_id)
+                                  for media_id in otherObj.media.values_list('id', flat=True)])
         localizations = otherObj.localizations.all()
         localization_ids = list(localizations.values_list('id', flat=True))
         obj.localizations.add(*localization_ids)
@@ -553,6 +439,9 @@ class TrimStateEndAPI(BaseDetailView):
     def _patch(self, params: dict) -> dict:
 
         obj = State.objects.get(pk=params['id'], deleted=False)
+        notify_annotation_change(obj.project_id, self.request.user, 'state', 'update',
+                                 [(obj.id, media_id)
+                                  for media_id in obj.media.values_list('id', flat=True)])
         localizations = obj.localizations.order_by('frame')
 
         if params['endpoint'] == 'start':
@@ -3,10 +3,12 @@ from collections import defaultdict
 from ..schema import StateCountSchema
 
 from ._base_views import BaseDetailView
+from ._base_views import ConditionalGetMixin
 from ._annotation_query import get_annotation_count
+from ._annotation_query import get_annotation_validator
 from ._permissions import ProjectViewOnlyPermission
 
-class StateCountAPI(BaseDetailView):
+class StateCountAPI(ConditionalGetMixin, BaseDetailView):
     """ Retrieve number of states in a state list.
 
         This endpoint accepts the same query parameters as a GET request to the `States` endpoint,
@@ -21,3 +23,5 @@ class StateCountAPI(BaseDetailView):
         """
         return get_annotation_count(params['project'], params, 'state')
 
+    def _get_validator(self, params):
+        return get_annotation_validator(params['project'], params, 'state')
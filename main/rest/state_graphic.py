@@ -1,9 +1,11 @@
 import tempfile
 import logging
+import math
 import traceback
 
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from django.http import response
 
 from ..models import State
@@ -14,12 +16,14 @@ from ..renderers import Mp4Renderer
 from ..schema import StateGraphicSchema
 
 from ._base_views import BaseDetailView
+from ._base_views import RenderCacheMixin
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
+from ._render_cache import render_key
 
 logger = logging.getLogger(__name__)
 
-class StateGraphicAPI(BaseDetailView):
+class StateGraphicAPI(RenderCacheMixin, BaseDetailView):
     schema = StateGraphicSchema()
     renderer_classes = (PngRenderer,JpegRenderer,GifRenderer,Mp4Renderer)
     permission_classes = [ProjectViewOnlyPermission]
@@ -33,12 +37,25 @@ class StateGraphicAPI(BaseDetailView):
         status_obj = status.HTTP_400_BAD_REQUEST
         if type(exc) is response.Http404:
             status_obj = status.HTTP_404_NOT_FOUND
-        return Response(
+        elif isinstance(exc, Throttled):
+            status_obj = status.HTTP_429_TOO_MANY_REQUESTS
+        resp = Response(
             MediaUtil.generate_error_image(
                 status_obj,
                 str(exc),
                 self.request.accepted_renderer.format),
             status=status_obj)
+        if isinstance(exc, Throttled):
+            resp['Retry-After'] = str(math.ceil(exc.wait))
+        return resp
+
+    def _get_render_key(self, params):
+        state = State.objects.get(pk=params['id'])
+        offset = params['offset']
+        localizations = state.localizations.order_by('frame')[offset:offset+params['length']]
+        geometry = list(localizations.values_list('frame', 'x', 'y', 'width', 'height'))
+        return render_key(state.media.all()[0], params=params, geometry=geometry,
+                          format=self.request.accepted_renderer.format)
 
     def _get(self, params):
         """ Get frame(s) of a given localization-associated state.
@@ -57,6 +74,7 @@ class StateGraphicAPI(BaseDetailView):
         if 'forceScale' in params:
             force_scale = params['forceScale'].split('x')
             assert len(force_scale) == 2
+            force_scale = (int(force_scale[0]), int(force_scale[1]))
 
         typeObj = state.meta
         if typeObj.association != 'Localization':
@@ -73,12 +91,10 @@ class StateGraphicAPI(BaseDetailView):
                     pass
                 else:
                     self.request.accepted_renderer = GifRenderer()
-                gif_fp = media_util.get_animation(frames, roi, fps,
-                                                  self.request.accepted_renderer.format,
-                                                  force_scale=force_scale)
-                with open(gif_fp, 'rb') as data_file:
-                    self.request.accepted_renderer = GifRenderer()
-                    response_data = data_file.read()
+                response_data = media_util.get_animation(frames, roi, fps,
+                                                         self.request.accepted_renderer.format,
+                                                         force_scale=force_scale)
+                self.request.accepted_renderer = GifRenderer()
             else:
                 max_w = 0
                 max_h = 0
@@ -101,11 +117,10 @@ class StateGraphicAPI(BaseDetailView):
 
                 # Get a tiled fp as a film strip
                 tile_size=f"{len(frames)}x1"
-                tiled_fp = media_util.get_tile_image(frames,
-                                                     new_rois,
-                                                     tile_size,
-                                                     render_format=self.request.accepted_renderer.format,
-                                                     force_scale=force_scale)
-                with open(tiled_fp, 'rb') as data_file:
-                    response_data = data_file.read()
+                response_data = media_util.get_tile_image(
+                    frames,
+                    new_rois,
+                    tile_size,
+                    render_format=self.request.accepted_renderer.format,
+                    force_scale=force_scale)
         return response_data
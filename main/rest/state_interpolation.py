@@ -0,0 +1,69 @@
+import logging
+
+import numpy as np
+from rest_framework.renderers import JSONRenderer
+
+from ..models import State
+from ..renderers import BinaryRenderer
+from ..renderers import CsvRenderer
+from ..schema import StateInterpolationSchema
+
+from ._base_views import BaseListView
+from ._annotation_query import get_annotation_queryset
+from ._interpolation import INTERPOLATION_COLUMNS
+from ._interpolation import interpolate_tracks
+from ._permissions import ProjectViewOnlyPermission
+
+logger = logging.getLogger(__name__)
+
+class StateInterpolationAPI(BaseListView):
+    """ Retrieve dense per-frame geometry of tracks.
+
+        Tracks are states associated with localization keyframes. This endpoint
+        interpolates keyframes of all selected tracks over a frame range and returns
+        the result in columnar form.
+    """
+    schema = StateInterpolationSchema()
+    renderer_classes = (JSONRenderer, CsvRenderer, BinaryRenderer)
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        if 'state_id' in params:
+            params['ids'] = params['state_id']
+        qs = get_annotation_queryset(params['project'], params, 'state')
+        method = params.get('method')
+        methods = {state_id: method or interpolation for state_id, interpolation
+                   in qs.values_list('id', 'meta__interpolation').iterator()}
+
+        # Retrieve keyframes of all tracks in one query.
+        fields = ['state_id', 'localization__frame']
+        fields += [f'localization__{col}' for col in INTERPOLATION_COLUMNS]
+        keyframes = State.localizations.through.objects\
+                         .filter(state_id__in=list(methods.keys()),
+                                 localization__deleted=False,
+                                 localization__frame__isnull=False)\
+                         .values_list(*fields)
+        keyframes = np.array(list(keyframes.iterator()), dtype=np.float64)
+        out = interpolate_tracks(keyframes, methods, params.get('frame_start', 0),
+                                 params.get('frame_stop'))
+
+        response_format = self.request.accepted_renderer.format
+        if response_format == 'bin':
+            # Columns are written one after another as little endian int32 (state and
+            # frame) followed by float32 geometry.
+            response_data = b''.join([out['state'].astype('<i4').tobytes(),
+                                      out['frame'].astype('<i4').tobytes()]
+                                     + [out[col].astype('<f4').tobytes()
+                                        for col in INTERPOLATION_COLUMNS])
+        else:
+            # Missing geometry (such as width of a dot) is returned as null.
+            columns = {'state': out['state'].tolist(), 'frame': out['frame'].tolist()}
+            for col in INTERPOLATION_COLUMNS:
+                columns[col] = np.where(np.isnan(out[col]), None, out[col]).tolist()
+            if response_format == 'csv':
+                response_data = [dict(zip(columns.keys(), row))
+                                 for row in zip(*columns.values())]
+            else:
+                response_data = columns
+        return response_data
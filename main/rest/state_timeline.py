@@ -0,0 +1,32 @@
+import logging
+
+from ..schema import StateTimelineSchema
+
+from ._base_views import BaseListView
+from ._annotation_query import get_annotation_queryset
+from ._permissions import ProjectViewOnlyPermission
+from ._state_timeline import get_state_timeline
+
+logger = logging.getLogger(__name__)
+
+class StateTimelineAPI(BaseListView):
+    """ Retrieve frame intervals of states.
+
+        Each state is assumed to hold from its frame until the next state of the
+        same type on the same media, as with `latest` interpolation of frame
+        associated states. The last state on a media holds until the end of the media.
+    """
+    schema = StateTimelineSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ['get']
+
+    def _get(self, params):
+        qs = get_annotation_queryset(params['project'], params, 'state')
+        response_data = get_state_timeline(qs)
+        if self.request.accepted_renderer.format == 'csv':
+            for element in response_data:
+                element['media'] = element.pop('media_name')
+        else:
+            for element in response_data:
+                element.pop('media_name')
+        return response_data
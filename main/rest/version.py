@@ -4,6 +4,7 @@ from django.db import transaction
 from django.utils import timezone
 import datetime
 
+from ..cache import TatorCache
 from ..models import Version
 from ..models import Project
 from ..models import State
@@ -105,6 +106,8 @@ class VersionDetailAPI(BaseDetailView):
                 raise ObjectDoesNotExist
             else:
                 version.bases.set(qs)
+            # Results of effective version queries depend on bases.
+            TatorCache().bump_write_generation(version.project.pk)
         return {'message': f'Version {params["id"]} updated successfully!'}
 
     def _delete(self, params):
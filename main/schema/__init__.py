@@ -10,6 +10,11 @@ from .analysis import AnalysisListSchema
 from .analysis import AnalysisDetailSchema
 from .announcement import AnnouncementListSchema
 from .announcement import AnnouncementDetailSchema
+from .annotation_import import AnnotationImportSchema
+from .annotation_changes import LocalizationChangesSchema
+from .annotation_changes import StateChangesSchema
+from .annotation_events import AnnotationEventsSchema
+from .annotation_snapshot import AnnotationSnapshotSchema
 from .audio_file import AudioFileListSchema
 from .audio_file import AudioFileDetailSchema
 from .bookmark import BookmarkListSchema
@@ -44,7 +49,10 @@ from .leaf_type import LeafTypeDetailSchema
 from .localization import LocalizationListSchema
 from .localization import LocalizationDetailSchema
 from .localization_count import LocalizationCountSchema
+from .localization_feed import LocalizationFeedSchema
 from .localization_graphic import LocalizationGraphicSchema
+from .localization_graphics import LocalizationGraphicsSchema
+from .localization_ingest import LocalizationIngestSchema
 from .localization_type import LocalizationTypeListSchema
 from .localization_type import LocalizationTypeDetailSchema
 from .media import MediaListSchema
@@ -73,6 +81,8 @@ from .state import StateGraphicSchema
 from .state_count import StateCountSchema
 from .state import MergeStatesSchema
 from .state import TrimStateEndSchema
+from .state_interpolation import StateInterpolationSchema
+from .state_timeline import StateTimelineSchema
 from .state_type import StateTypeListSchema
 from .state_type import StateTypeDetailSchema
 from .temporary_file import TemporaryFileDetailSchema
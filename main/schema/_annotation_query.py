@@ -28,6 +28,18 @@ annotation_filter_parameter_schema = [
             'items': {'type': 'integer'},
         },
     },
+    {
+        'name': 'effective_version',
+        'in': 'query',
+        'required': False,
+        'description': 'Unique integer identifying a version. If given, annotations from '
+                       'this version and all of its bases are fetched, excluding '
+                       'localizations that have been cloned into one of these versions. '
+                       'This parameter will cause an exception if an Elasticsearch query '
+                       'is triggered and pagination parameters (start or stop) are '
+                       'included.',
+        'schema': {'type': 'integer'},
+    },
     {
         'name': 'after',
         'in': 'query',
@@ -0,0 +1,16 @@
+fields_parameter_schema = [
+    {
+        'name': 'fields',
+        'in': 'query',
+        'required': False,
+        'description': 'Comma-separated list of fields to return. Individual attribute '
+                       'values may be selected with `attributes.<name>`. If omitted, all '
+                       'fields are returned. Many to many fields and presigned URLs are '
+                       'only computed if they are requested.',
+        'explode': False,
+        'schema': {
+            'type': 'array',
+            'items': {'type': 'string'},
+        },
+    },
+]
@@ -41,6 +41,10 @@ class CustomGenerator(SchemaGenerator):
                 'AnalysisSpec': analysis_spec,
                 'Analysis': analysis,
                 'Announcement': announcement,
+                'AnnotationImportSpec': annotation_import_spec,
+                'AnnotationImport': annotation_import,
+                'AnnotationEvents': annotation_events,
+                'AnnotationSnapshot': annotation_snapshot,
                 'ArchiveConfig': archive_config,
                 'AttributeTypeSpec': attribute_type_spec,
                 'AttributeTypeUpdate': attribute_type_update,
@@ -74,6 +78,7 @@ class CustomGenerator(SchemaGenerator):
                 'InvitationUpdate': invitation_update,
                 'Invitation': invitation,
                 'JobNode': job_node,
+                'JobError': job_error,
                 'Job': job,
                 'JobCluster': job_cluster,
                 'JobClusterSpec': job_cluster_spec,
@@ -94,6 +99,7 @@ class CustomGenerator(SchemaGenerator):
                 'LocalizationUpdate': localization_update,
                 'Localization': localization,
                 'LocalizationIdQuery': localization_id_query,
+                'LocalizationChanges': localization_changes,
                 'MediaNext': media_next,
                 'MediaPrev': media_prev,
                 'MediaUpdate': media_update,
@@ -133,6 +139,9 @@ class CustomGenerator(SchemaGenerator):
                 'StateType': state_type,
                 'StateMergeUpdate': state_merge_update,
                 'StateTrimUpdate': state_trim_update,
+                'StateInterpolation': state_interpolation,
+                'StateInterval': state_interval,
+                'StateChanges': state_changes,
                 'TemporaryFileSpec': temporary_file_spec,
                 'TemporaryFile': temporary_file,
                 'TranscodeSpec': transcode_spec,
@@ -0,0 +1,124 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+
+annotation_changes_parameter_schema = [
+    {
+        'name': 'since',
+        'in': 'query',
+        'required': False,
+        'description': 'Watermark returned by a previous request. If not given, changes '
+                       'are returned from the beginning of the project.',
+        'schema': {'type': 'integer', 'minimum': 0},
+    },
+    {
+        'name': 'since_id',
+        'in': 'query',
+        'required': False,
+        'description': 'Watermark ID returned by a previous request. Breaks ties '
+                       'between annotations written by the same transaction.',
+        'schema': {'type': 'integer', 'minimum': 0},
+    },
+    {
+        'name': 'media_id',
+        'in': 'query',
+        'required': False,
+        'description': 'Comma-separated list of media IDs.',
+        'explode': False,
+        'schema': {
+            'type': 'array',
+            'items': {'type': 'integer'},
+        },
+    },
+    {
+        'name': 'type',
+        'in': 'query',
+        'required': False,
+        'description': 'Unique integer identifying a annotation type.',
+        'schema': {'type': 'integer'},
+    },
+    {
+        'name': 'version',
+        'in': 'query',
+        'required': False,
+        'explode': False,
+        'description': 'List of integers representing versions to fetch',
+        'schema': {
+            'type': 'array',
+            'items': {'type': 'integer'},
+        },
+    },
+    {
+        'name': 'limit',
+        'in': 'query',
+        'required': False,
+        'description': 'Maximum number of annotations to return.',
+        'schema': {'type': 'integer', 'minimum': 1, 'maximum': 10000, 'default': 1000},
+    },
+]
+
+changes_description = dedent("""\
+This endpoint returns {name}s that were created, modified or deleted after a
+watermark, ordered by the transaction that wrote them and ID. Deleted {name}s are
+included with `deleted` set to true. Each response contains a new watermark in `since`
+and `since_id`, which should be passed to the next request. If `more` is true, more
+changes are available immediately. Changes written after a transaction that is still in
+progress are returned by a later request, so that in progress edits are not skipped.
+""")
+
+class _AnnotationChangesSchema(AutoSchema):
+    name = None
+    operation_id = None
+    component = None
+
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = self.operation_id
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        short_desc = f'Retrieve {self.name}s changed since a watermark.'
+        return f"{short_desc}\n\n{changes_description.format(name=self.name)}"
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = annotation_changes_parameter_schema
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': f'Successful retrieval of {self.name} changes.',
+                'content': {'application/json': {'schema': {
+                    '$ref': f'#/components/schemas/{self.component}',
+                }}},
+            }
+        return responses
+
+class LocalizationChangesSchema(_AnnotationChangesSchema):
+    name = 'localization'
+    operation_id = 'GetLocalizationChanges'
+    component = 'LocalizationChanges'
+
+class StateChangesSchema(_AnnotationChangesSchema):
+    name = 'state'
+    operation_id = 'GetStateChanges'
+    component = 'StateChanges'
@@ -0,0 +1,64 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+
+class AnnotationEventsSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = 'GetAnnotationEvents'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Retrieve a subscription to annotation change events of a media.
+
+        The returned URL is a stream of server-sent events that can be opened with
+        `EventSource`. Each event is a JSON object with `type` (`localization` or
+        `state`), `action` (`create`, `update` or `delete`), `media`, `ids` and `user`.
+        Events are sent after the change is committed, and clients should fetch the
+        listed annotations to apply the change. The stream may be closed by the server
+        if the client falls behind, in which case all annotations should be reloaded.
+        The ticket is only checked when the stream is opened, which must happen within
+        an hour of this request. Browsers reconnect to a closed stream with the same
+        URL, so clients should close the stream on error and request a new
+        subscription instead.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = [{
+                'name': 'media_id',
+                'in': 'query',
+                'required': True,
+                'description': 'Unique integer identifying a media.',
+                'schema': {'type': 'integer'},
+            }]
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': 'Successful retrieval of event subscription.',
+                'content': {'application/json': {'schema': {
+                    '$ref': '#/components/schemas/AnnotationEvents',
+                }}},
+            }
+        return responses
@@ -0,0 +1,61 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+
+class AnnotationImportSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'POST':
+            operation['operationId'] = 'ImportAnnotations'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Start an annotation import.
+
+        Imports localizations or states from a newline delimited JSON or CSV file, which
+        may be gzip compressed. The file must be uploaded first using the key returned by
+        the `UploadInfo` endpoint. This endpoint only queues the import; the file is read
+        and written to the database in batches by a background worker.
+
+        Progress, including the number of rows processed and any rows that could not be
+        imported, may be retrieved via the `Job` or `JobGroup` endpoints. Imports may be
+        cancelled via the same endpoints, in which case batches that were already written
+        are kept.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        return []
+
+    def _get_request_body(self, path, method):
+        body = {}
+        if method == 'POST':
+            body = {
+                'required': True,
+                'content': {'application/json': {
+                'schema': {'$ref': '#/components/schemas/AnnotationImportSpec'},
+            }}}
+        return body
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'POST':
+            responses['201'] = {
+                'description': 'Successful queueing of the import.',
+                'content': {'application/json': {'schema': {
+                    '$ref': '#/components/schemas/AnnotationImport',
+                }}},
+            }
+        return responses
@@ -0,0 +1,80 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+
+class AnnotationSnapshotSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = 'GetAnnotationSnapshot'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Retrieve a snapshot of all annotations on a media.
+
+        The snapshot is a gzipped JSON object containing `localizations` and `states`,
+        each in the same form as a GET request to the `Localizations` or `States`
+        endpoint filtered by this media and version. Snapshots are built on first
+        request and reused until a localization or state on the media is created,
+        modified or deleted. The response contains a presigned URL to the snapshot and
+        its ETag, which clients can use to skip downloading a snapshot they have already
+        retrieved.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'id',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a media.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = [{
+                'name': 'version',
+                'in': 'query',
+                'required': False,
+                'description': 'Unique integer identifying a version. If not given, '
+                               'annotations from all versions are included.',
+                'schema': {'type': 'integer'},
+            }, {
+                'name': 'effective_version',
+                'in': 'query',
+                'required': False,
+                'description': 'Unique integer identifying a version. If given, the '
+                               'snapshot contains annotations from this version and all of '
+                               'its bases, excluding localizations that have been cloned '
+                               'into one of these versions.',
+                'schema': {'type': 'integer'},
+            }, {
+                'name': 'expiration',
+                'in': 'query',
+                'required': False,
+                'description': 'Expiration time of the presigned URL in seconds.',
+                'schema': {'type': 'integer',
+                           'minimum': 1,
+                           'maximum': 86400,
+                           'default': 86400},
+            }]
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': 'Successful retrieval of annotation snapshot.',
+                'content': {'application/json': {'schema': {
+                    '$ref': '#/components/schemas/AnnotationSnapshot',
+                }}},
+            }
+        return responses
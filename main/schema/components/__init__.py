@@ -11,6 +11,12 @@ from .algorithm import algorithm_manifest_spec
 from .analysis import analysis_spec
 from .analysis import analysis
 from .announcement import announcement
+from .annotation_import import annotation_import_spec
+from .annotation_import import annotation_import
+from .annotation_changes import localization_changes
+from .annotation_changes import state_changes
+from .annotation_events import annotation_events
+from .annotation_snapshot import annotation_snapshot
 from .attribute_type import (
     autocomplete_service,
     attribute_type,
@@ -40,6 +46,7 @@ from .invitation import (
     invitation,
 )
 from .job import job_node
+from .job import job_error
 from .job import job
 from .job_cluster import (
     job_cluster,
@@ -94,6 +101,8 @@ from .state import state
 from .state import state_id_query
 from .state import state_merge_update
 from .state import state_trim_update
+from .state_interpolation import state_interpolation
+from .state_timeline import state_interval
 from .state_type import state_type_spec
 from .state_type import state_type_update
 from .state_type import state_type
@@ -0,0 +1,51 @@
+watermark_properties = {
+    'since': {
+        'type': 'integer',
+        'nullable': True,
+        'description': 'Watermark to use in the next request.',
+    },
+    'since_id': {
+        'type': 'integer',
+        'nullable': True,
+        'description': 'Watermark ID to use in the next request.',
+    },
+    'more': {
+        'type': 'boolean',
+        'description': 'Whether more changes are available.',
+    },
+}
+
+deleted_properties = {
+    'deleted': {
+        'type': 'boolean',
+        'description': 'Whether the annotation has been deleted.',
+    },
+}
+
+localization_changes = {
+    'type': 'object',
+    'properties': {
+        'localizations': {
+            'type': 'array',
+            'items': {'allOf': [
+                {'$ref': '#/components/schemas/Localization'},
+                {'type': 'object', 'properties': deleted_properties},
+            ]},
+        },
+        **watermark_properties,
+    },
+}
+
+state_changes = {
+    'type': 'object',
+    'properties': {
+        'states': {
+            'type': 'array',
+            'items': {'allOf': [
+                {'$ref': '#/components/schemas/State'},
+                {'type': 'object', 'properties': deleted_properties},
+            ]},
+        },
+        **watermark_properties,
+    },
+}
@@ -0,0 +1,18 @@
+annotation_events = {
+    'type': 'object',
+    'properties': {
+        'ticket': {
+            'type': 'string',
+            'description': 'Signed ticket identifying the subscription.',
+        },
+        'url': {
+            'type': 'string',
+            'description': 'Relative URL of the event stream.',
+        },
+        'user': {
+            'type': 'integer',
+            'description': 'ID of the requesting user. Events caused by this user can be '
+                           'ignored.',
+        },
+    },
+}
@@ -0,0 +1,55 @@
+annotation_import_spec = {
+    'type': 'object',
+    'required': ['key', 'annotation_type'],
+    'properties': {
+        'key': {
+            'description': 'Object key of the uploaded file, as returned by the `UploadInfo` '
+                           'endpoint. The file may be gzip compressed.',
+            'type': 'string',
+        },
+        'annotation_type': {
+            'description': 'Whether the file contains localizations or states.',
+            'type': 'string',
+            'enum': ['localization', 'state'],
+        },
+        'format': {
+            'description': 'Format of the file. For `ndjson`, each line is a `LocalizationSpec` '
+                           'or `StateSpec` object. For `csv`, the header row contains field '
+                           'and attribute names, and list fields such as `media_ids` are '
+                           'given as JSON arrays.',
+            'type': 'string',
+            'enum': ['ndjson', 'csv'],
+            'default': 'ndjson',
+        },
+        'gid': {
+            'description': 'UUID of the job group. If not given, one is generated.',
+            'type': 'string',
+            'format': 'uuid',
+        },
+        'batch_size': {
+            'description': 'Number of rows written to the database at a time.',
+            'type': 'integer',
+            'minimum': 1,
+            'maximum': 100000,
+            'default': 10000,
+        },
+    },
+}
+
+annotation_import = {
+    'type': 'object',
+    'properties': {
+        'message': {
+            'type': 'string',
+            'description': 'Message indicating the import was queued successfully.',
+        },
+        'uid': {
+            'type': 'string',
+            'description': 'UUID identifying the job.',
+        },
+        'gid': {
+            'type': 'string',
+            'description': 'UUID identifying the job group.',
+        },
+    },
+}
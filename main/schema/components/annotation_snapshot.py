@@ -0,0 +1,22 @@
+annotation_snapshot = {
+    'type': 'object',
+    'properties': {
+        'url': {
+            'type': 'string',
+            'description': 'Presigned URL of the gzipped snapshot.',
+        },
+        'etag': {
+            'type': 'string',
+            'description': 'MD5 hash of the gzipped snapshot.',
+        },
+        'size': {
+            'type': 'integer',
+            'description': 'Size of the gzipped snapshot in bytes.',
+        },
+        'created_datetime': {
+            'type': 'string',
+            'format': 'date-time',
+            'description': 'Time the snapshot was built.',
+        },
+    },
+}
@@ -36,6 +36,21 @@ job_node = {
     }
 }
 
+job_error = {
+    'type': 'object',
+    'description': 'Describes a row that could not be imported.',
+    'properties': {
+        'line': {
+            'description': 'Line number of the row in the imported file.',
+            'type': 'integer',
+        },
+        'message': {
+            'description': 'Reason the row could not be imported.',
+            'type': 'string',
+        },
+    },
+}
+
 job = {
     'type': 'object',
     'properties': {
@@ -79,5 +94,28 @@ job = {
             'nullable': True,
             'format': 'date-time',
         },
+        'progress': {
+            'description': 'Fraction of the job that has completed, from 0 to 1. Only '
+                           'reported by annotation import jobs.',
+            'type': 'number',
+            'nullable': True,
+        },
+        'processed': {
+            'description': 'Number of rows processed. Only reported by annotation import jobs.',
+            'type': 'integer',
+            'nullable': True,
+        },
+        'created': {
+            'description': 'Number of annotations created. Only reported by annotation '
+                           'import jobs.',
+            'type': 'integer',
+            'nullable': True,
+        },
+        'errors': {
+            'description': 'Rows that could not be imported. Only reported by annotation '
+                           'import jobs.',
+            'type': 'array',
+            'items': {'$ref': '#/components/schemas/JobError'},
+        },
     },
 }
@@ -163,6 +163,14 @@ localization_bulk_update = {
             'type': 'array',
             'items': {'type': 'integer'},
         },
+        'updates': {
+            'description': 'Map of localization ID to values for that localization. Supports '
+                           'geometry, `frame` and `attributes`; attributes are merged into '
+                           'existing values. All IDs must match the query parameters. May '
+                           'not be combined with `attributes`.',
+            'type': 'object',
+            'additionalProperties': {'$ref': '#/components/schemas/LocalizationUpdate'},
+        },
     },
 }
 
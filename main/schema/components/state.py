@@ -104,6 +104,14 @@ state_bulk_update = {
             'type': 'array',
             'items': {'type': 'integer'},
         },
+        'updates': {
+            'description': 'Map of state ID to values for that state. Supports `frame` and '
+                           '`attributes`; attributes are merged into existing values. All IDs '
+                           'must match the query parameters. May not be combined with '
+                           '`attributes`.',
+            'type': 'object',
+            'additionalProperties': {'$ref': '#/components/schemas/StateUpdate'},
+        },
     },
 }
 
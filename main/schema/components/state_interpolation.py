@@ -0,0 +1,20 @@
+def _column(description, item_type):
+    return {
+        'description': description,
+        'type': 'array',
+        'items': {'type': item_type, 'nullable': item_type == 'number'},
+    }
+
+state_interpolation = {
+    'type': 'object',
+    'description': 'Per-frame geometry of tracks in columnar form. All arrays have the '
+                   'same length.',
+    'properties': {
+        'state': _column('Unique integer identifying the state of each row.', 'integer'),
+        'frame': _column('Frame number of each row.', 'integer'),
+        'x': _column('Normalized horizontal position of each row.', 'number'),
+        'y': _column('Normalized vertical position of each row.', 'number'),
+        'width': _column('Normalized width of each row.', 'number'),
+        'height': _column('Normalized height of each row.', 'number'),
+    },
+}
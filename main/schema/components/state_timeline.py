@@ -0,0 +1,33 @@
+state_interval = {
+    'type': 'object',
+    'properties': {
+        'id': {
+            'type': 'integer',
+            'description': 'Unique integer identifying the state.',
+        },
+        'media': {
+            'type': 'integer',
+            'description': 'Unique integer identifying the media.',
+        },
+        'frame': {
+            'type': 'integer',
+            'description': 'First frame of the interval (inclusive).',
+        },
+        'end_frame': {
+            'type': 'integer',
+            'description': 'Last frame of the interval (exclusive).',
+        },
+        'start_seconds': {
+            'type': 'number',
+            'nullable': True,
+            'description': 'Start of the interval in seconds, or null if the media has '
+                           'no frame rate.',
+        },
+        'end_seconds': {
+            'type': 'number',
+            'nullable': True,
+            'description': 'End of the interval in seconds, or null if the media has '
+                           'no frame rate.',
+        },
+    },
+}
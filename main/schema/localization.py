@@ -7,15 +7,16 @@ from ._message import message_with_id_list_schema
 from ._errors import error_responses
 from ._attributes import attribute_filter_parameter_schema
 from ._annotation_query import annotation_filter_parameter_schema
+from ._fields import fields_parameter_schema
 
 localization_filter_schema = [
     {
         'name': 'excludeParents',
         'in': 'query',
         'required': False,
-        'description': 'If a clone is present, do not send parent. This parameter will cause an '
-                       'exception if an Elasticsearch query is triggered and pagination parameters '
-                       '(start or stop) are included.',
+        'description': 'If a clone is present, do not send parent. Localizations are '
+                       'considered parents if any localization that is not deleted refers to '
+                       'them as its parent.',
         'schema': {'type': 'integer',
                    'minimum': 0,
                    'maximum': 1,
@@ -30,6 +31,22 @@ localization_filter_schema = [
                    'minimum': 0},
         'required': False,
     },
+    {
+        'name': 'frame_start',
+        'in': 'query',
+        'description': 'If given, only localizations on this frame or later are returned.',
+        'schema': {'type': 'integer',
+                   'minimum': 0},
+        'required': False,
+    },
+    {
+        'name': 'frame_stop',
+        'in': 'query',
+        'description': 'If given, only localizations before this frame are returned.',
+        'schema': {'type': 'integer',
+                   'minimum': 0},
+        'required': False,
+    },
 ]
 
 boilerplate = dedent("""\
@@ -74,7 +91,9 @@ class LocalizationListSchema(AutoSchema):
             short_desc = 'Update localiazation list.'
             long_desc = dedent("""\
             This method does a bulk update on all localizations matching a query. Only 
-            user-defined attributes may be bulk updated.
+            user-defined attributes may be bulk updated. Alternatively, `updates` may
+            be used to apply different values to each localization in a single
+            operation.
             """)
         elif method == 'DELETE':
             short_desc = 'Delete localiazation list.'
@@ -99,6 +118,8 @@ class LocalizationListSchema(AutoSchema):
         params = []
         if method in ['GET', 'PUT', 'PATCH', 'DELETE']:
             params = annotation_filter_parameter_schema + attribute_filter_parameter_schema + localization_filter_schema
+        if method in ['GET', 'PUT']:
+            params += fields_parameter_schema
         return params
 
     def _get_request_body(self, path, method):
@@ -244,6 +265,15 @@ class LocalizationListSchema(AutoSchema):
                             }
                         },
                     },
+                    'per_object': {
+                        'summary': 'Move boxes and update labels of many localizations',
+                        'value': {
+                            'updates': {
+                                '1': {'x': 0.1, 'y': 0.2, 'attributes': {'Species': 'Tuna'}},
+                                '2': {'width': 0.3, 'height': 0.4},
+                            }
+                        },
+                    },
                 }
             }}}
         if method == 'PUT':
@@ -305,7 +335,10 @@ class LocalizationDetailSchema(AutoSchema):
         }]
 
     def _get_filter_parameters(self, path, method):
-        return []
+        params = []
+        if method == 'GET':
+            params += fields_parameter_schema
+        return params
 
     def _get_request_body(self, path, method):
         body = {}
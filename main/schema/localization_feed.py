@@ -0,0 +1,67 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+from ._annotation_query import annotation_filter_parameter_schema
+from ._attributes import attribute_filter_parameter_schema
+from .localization import localization_filter_schema
+
+class LocalizationFeedSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = 'GetLocalizationFeed'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Retrieve localizations in a compact binary encoding.
+
+        This endpoint accepts the same query parameters as a GET request to the
+        `Localizations` endpoint. It is intended for clients that fetch localizations
+        in frame windows using `media_id`, `version`, `frame_start` and `frame_stop`.
+
+        The response begins with a little endian uint32 giving the length of a UTF-8
+        JSON header. The header contains `count`, `record_size`, `fields`, `attributes`
+        and `dictionary`, and is padded with trailing spaces so that the records start
+        at a byte offset that is a multiple of 8. It is followed by `count` records of
+        `record_size` bytes, sorted by frame and ID. Each record contains `id`, `type`
+        and `frame` as little endian uint32, `x`, `y`, `width` and `height` as little
+        endian float32 (lines store `u` and `v` in place of `width` and `height`,
+        missing values are NaN), then one uint32 per entry in `attributes` holding an
+        index into `dictionary`, or 4294967295 if the localization has no value for
+        that attribute.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = annotation_filter_parameter_schema + attribute_filter_parameter_schema \
+                   + localization_filter_schema
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': 'Binary encoded localizations corresponding to query.',
+                'content': {'application/octet-stream': {'schema': {
+                    'type': 'string',
+                    'format': 'binary',
+                }}}
+            }
+        return responses
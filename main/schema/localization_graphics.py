@@ -0,0 +1,98 @@
+from textwrap import dedent
+
+from ._errors import error_responses
+from .localization_graphic import LocalizationGraphicSchema
+
+class LocalizationGraphicsSchema(LocalizationGraphicSchema):
+    """ Gets images of many localizations at once.
+    """
+
+    # Parameters names
+    PARAMS_IMAGE_FORMAT = 'image_format'
+
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'PUT':
+            operation['operationId'] = 'GetLocalizationGraphics'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Get graphics of many localizations by ID.
+
+        Localizations are cropped with the same margin rules as `LocalizationGraphic`.
+        Each media is opened once and each distinct frame is decoded once, so this is
+        much faster than retrieving localization graphics one at a time. The response
+        is a zip file containing one image per localization named by localization ID,
+        or with `format=jpg` or `format=png` a single tiled image in request order.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'PUT':
+            params = super()._get_filter_parameters(path, 'GET') + [{
+                'name': self.PARAMS_IMAGE_FORMAT,
+                'in': 'query',
+                'required': False,
+                'description': 'Image format of entries in the zip file.',
+                'schema': {
+                    'type': 'string',
+                    'enum': ['jpg', 'png'],
+                    'default': 'jpg',
+                },
+            }]
+        return params
+
+    def _get_request_body(self, path, method):
+        body = {}
+        if method == 'PUT':
+            body = {
+                'required': True,
+                'content': {'application/json': {
+                    'schema': {
+                        'type': 'object',
+                        'required': ['ids'],
+                        'properties': {
+                            'ids': {
+                                'description': 'Array of localization IDs to retrieve.',
+                                'type': 'array',
+                                'items': {
+                                    'type': 'integer',
+                                    'minimum': 1,
+                                },
+                                'maxItems': 1000,
+                            },
+                        },
+                    },
+                }},
+            }
+        return body
+
+    def _get_responses(self, path, method):
+        responses = {}
+        if method == 'PUT':
+            responses = error_responses()
+            responses['200'] = {
+                'description': 'Successful retrieval of localization graphics.',
+                'content': {
+                    'application/zip': {'schema': {
+                        'type': 'string',
+                        'format': 'binary',
+                    }},
+                    'image/*': {'schema': {
+                        'type': 'string',
+                        'format': 'binary',
+                    }},
+                },
+            }
+        return responses
@@ -0,0 +1,57 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+from ._message import message_with_id_list_schema
+
+class LocalizationIngestSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'POST':
+            operation['operationId'] = 'IngestLocalizationList'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Create a large number of localizations.
+
+        This endpoint accepts the same `LocalizationSpec` objects as a POST request to the
+        `Localizations` endpoint, but is optimized for large imports. Localizations are
+        validated together, written with a single bulk copy, and recorded with one change
+        log entry for the whole request rather than one per localization. A maximum of
+        100000 localizations may be created in one request.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        return []
+
+    def _get_request_body(self, path, method):
+        body = {}
+        if method == 'POST':
+            body = {
+                'required': True,
+                'content': {'application/json': {
+                'schema': {
+                    'type': 'array',
+                    'items': {'$ref': '#/components/schemas/LocalizationSpec'},
+                    'maxItems': 100000,
+                },
+            }}}
+        return body
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'POST':
+            responses['201'] = message_with_id_list_schema('localization(s)')
+        return responses
@@ -7,6 +7,7 @@ from ._message import message_with_id_schema
 from ._errors import error_responses
 from ._media_query import media_filter_parameter_schema
 from ._attributes import attribute_filter_parameter_schema
+from ._fields import fields_parameter_schema
 
 boilerplate = dedent("""\
 A media may be an image or a video. Media are a type of entity in Tator,
@@ -87,7 +88,7 @@ class MediaListSchema(AutoSchema):
                 'schema': {'type': 'integer',
                            'minimum': 1,
                            'maximum': 86400},
-            }]
+            }] + fields_parameter_schema
         return params
 
     def _get_request_body(self, path, method):
@@ -190,7 +191,7 @@ class MediaDetailSchema(AutoSchema):
                 'schema': {'type': 'integer',
                            'minimum': 1,
                            'maximum': 86400},
-            }]
+            }] + fields_parameter_schema
         return params
 
     def _get_request_body(self, path, method):
@@ -7,6 +7,7 @@ from ._message import message_with_id_list_schema
 from ._message import message_schema
 from ._attributes import attribute_filter_parameter_schema
 from ._annotation_query import annotation_filter_parameter_schema
+from ._fields import fields_parameter_schema
 
 boilerplate = dedent("""\
 A state is a description of a collection of other objects. The objects a state describes
@@ -45,7 +46,9 @@ class StateListSchema(AutoSchema):
             short_desc = 'Update state list.'
             long_desc = dedent("""\
             This method does a bulk update on all states matching a query. Only 
-            user-defined attributes may be bulk updated.
+            user-defined attributes may be bulk updated. Alternatively, `updates` may
+            be used to apply different values to each state in a single
+            operation.
             """)
         elif method == 'DELETE':
             short_desc = 'Delete state list.'
@@ -70,6 +73,8 @@ class StateListSchema(AutoSchema):
         params = []
         if method in ['GET', 'PUT', 'PATCH', 'DELETE']:
             params = annotation_filter_parameter_schema + attribute_filter_parameter_schema
+        if method in ['GET', 'PUT']:
+            params += fields_parameter_schema
         return params
 
     def _get_request_body(self, path, method):
@@ -129,6 +134,15 @@ class StateListSchema(AutoSchema):
                             }
                         },
                     },
+                    'per_object': {
+                        'summary': 'Update labels of many states',
+                        'value': {
+                            'updates': {
+                                '1': {'attributes': {'Species': 'Tuna'}},
+                                '2': {'attributes': {'Species': 'Cod'}},
+                            }
+                        },
+                    },
                 }
             }}}
         if method == 'PUT':
@@ -190,7 +204,10 @@ class StateDetailSchema(AutoSchema):
         }]
 
     def _get_filter_parameters(self, path, method):
-        return []
+        params = []
+        if method == 'GET':
+            params += fields_parameter_schema
+        return params
 
     def _get_request_body(self, path, method):
         body = {}
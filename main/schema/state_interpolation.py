@@ -0,0 +1,92 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+from ._annotation_query import annotation_filter_parameter_schema
+from ._attributes import attribute_filter_parameter_schema
+
+class StateInterpolationSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = 'GetStateInterpolation'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Retrieve interpolated geometry of tracks.
+
+        This endpoint accepts the same query parameters as a GET request to the `States`
+        endpoint, and returns the position of each selected track at every frame
+        between its first and last localization. Interpolation uses the `interpolation`
+        setting of each state type unless `method` is given; methods other than `none`,
+        `latest`, `nearest` and `linear` are treated as `latest`.
+
+        By default the result is returned as a JSON object of parallel arrays. Set
+        `format=csv` for one row per frame, or `format=bin` for a compact binary
+        layout. The binary layout consists of the columns `state` and `frame` as
+        little endian int32 followed by `x`, `y`, `width` and `height` as little
+        endian float32, each column containing T values where T is the response
+        length divided by 24. Missing geometry is NaN in the binary layout and null
+        otherwise.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = annotation_filter_parameter_schema + attribute_filter_parameter_schema + [{
+                'name': 'state_id',
+                'in': 'query',
+                'required': False,
+                'description': 'Comma-separated list of state IDs.',
+                'explode': False,
+                'schema': {
+                    'type': 'array',
+                    'items': {'type': 'integer'},
+                },
+            }, {
+                'name': 'frame_start',
+                'in': 'query',
+                'required': False,
+                'description': 'First frame to return (inclusive).',
+                'schema': {'type': 'integer', 'minimum': 0},
+            }, {
+                'name': 'frame_stop',
+                'in': 'query',
+                'required': False,
+                'description': 'Last frame to return (exclusive).',
+                'schema': {'type': 'integer', 'minimum': 0},
+            }, {
+                'name': 'method',
+                'in': 'query',
+                'required': False,
+                'description': 'Interpolation method to use for all tracks. If not given, '
+                               'the interpolation method of the state type is used.',
+                'schema': {'type': 'string', 'enum': ['none', 'latest', 'nearest', 'linear']},
+            }]
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': 'Interpolated geometry of tracks corresponding to query.',
+                'content': {'application/json': {'schema': {
+                    '$ref': '#/components/schemas/StateInterpolation',
+                }}}
+            }
+        return responses
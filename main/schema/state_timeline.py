@@ -0,0 +1,57 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+from ._annotation_query import annotation_filter_parameter_schema
+from ._attributes import attribute_filter_parameter_schema
+
+class StateTimelineSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == 'GET':
+            operation['operationId'] = 'GetStateTimeline'
+        operation['tags'] = ['Tator']
+        return operation
+
+    def get_description(self, path, method):
+        return dedent("""\
+        Retrieve frame intervals of states.
+
+        This endpoint accepts the same query parameters as a GET request to the `States`
+        endpoint. Each state with a frame is assumed to hold until the next state of the
+        same type on the same media, and the last state on a media holds until the end
+        of the media. This matches `latest` interpolation of frame associated state
+        types. Intervals include the start frame and exclude the end frame. Set
+        `format=csv` to export the timeline with media names instead of IDs.
+        """)
+
+    def _get_path_parameters(self, path, method):
+        return [{
+            'name': 'project',
+            'in': 'path',
+            'required': True,
+            'description': 'A unique integer identifying a project.',
+            'schema': {'type': 'integer'},
+        }]
+
+    def _get_filter_parameters(self, path, method):
+        params = []
+        if method == 'GET':
+            params = annotation_filter_parameter_schema + attribute_filter_parameter_schema
+        return params
+
+    def _get_request_body(self, path, method):
+        return {}
+
+    def _get_responses(self, path, method):
+        responses = error_responses()
+        if method == 'GET':
+            responses['200'] = {
+                'description': 'Intervals of states corresponding to query.',
+                'content': {'application/json': {'schema': {
+                    'type': 'array',
+                    'items': {'$ref': '#/components/schemas/StateInterval'},
+                }}}
+            }
+        return responses
@@ -162,6 +162,7 @@ class TatorSearch:
                 '_treeleaf_path': {'type': 'text'},
                 '_annotation_version': {'type': 'integer'},
                 '_modified': {'type': 'boolean'},
+                '_has_children': {'type': 'boolean'},
                 '_modified_datetime': {'type': 'date'},
                 '_modified_by': {'type': 'keyword'},
                 '_created_datetime': {'type': 'date'},
@@ -556,6 +557,7 @@ class TatorSearch:
             if entity.version:
                 aux['_annotation_version'] = entity.version.pk
             aux['_modified'] = entity.modified
+            aux['_has_children'] = entity.has_children
             aux['_user'] = entity.user.pk
             aux['_email'] = entity.user.email
             aux['_meta'] = entity.meta.pk
@@ -9,6 +9,8 @@ class AnnotationData extends HTMLElement {
     this._dataByType = new Map();
     this._stateMediaIds = new Array();
     this._localizationMediaIds = new Array();
+    this._eventSources = new Map();
+    this._pendingReloads = new Map();
   }
 
   init(dataTypes, version, projectId, mediaId, update, allowNonTrackStateData) {
@@ -34,6 +36,7 @@ class AnnotationData extends HTMLElement {
 
     this._version = version;
     this._projectId = projectId;
+    this._subscribe(mediaId);
 
     if (update)
     {
@@ -257,6 +260,82 @@ class AnnotationData extends HTMLElement {
     }));
   }
 
+  // Subscribes to annotation change events of a media so that edits made by
+  // other users are shown without reloading the page.
+  _subscribe(mediaId) {
+    if (this._eventSources.has(mediaId)) {
+      return;
+    }
+    this._eventSources.set(mediaId, null);
+    this._openEvents(mediaId, false);
+  }
+
+  _openEvents(mediaId, reconnect) {
+    // Tickets are only valid for opening a stream, so request a new one for
+    // every connection.
+    fetchRetry("/rest/AnnotationEvents/" + this._projectId + "?media_id=" + mediaId, {
+      method: "GET",
+      credentials: "same-origin",
+      headers: {
+        "X-CSRFToken": getCookie("csrftoken"),
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+      },
+    })
+    .then(response => {
+      if (!response.ok) {
+        throw new Error("Status " + response.status);
+      }
+      return response.json();
+    })
+    .then(subscription => {
+      const source = new EventSource(subscription.url);
+      this._eventSources.set(mediaId, source);
+      source.onopen = () => {
+        if (reconnect) {
+          // Events may have been missed while disconnected.
+          this._reloadTypes(["localization", "state"]);
+        }
+      };
+      source.onmessage = evt => {
+        const event = JSON.parse(evt.data);
+        if (event.user != subscription.user) {
+          this._reloadTypes([event.type]);
+        }
+      };
+      source.onerror = () => {
+        // The browser would reconnect with the same ticket, which is rejected
+        // once it expires, so reconnect with a new ticket instead.
+        source.close();
+        setTimeout(() => this._openEvents(mediaId, true), 5000);
+      };
+    })
+    .catch(error => {
+      console.error("Failed to subscribe to annotation events: " + error);
+      setTimeout(() => this._openEvents(mediaId, reconnect), 5000);
+    });
+  }
+
+  // Fetches all data types of the given kinds (localization or state). Bursts of
+  // events are coalesced into one fetch per kind.
+  _reloadTypes(kinds) {
+    for (const kind of kinds) {
+      if (this._pendingReloads.has(kind)) {
+        continue;
+      }
+      this._pendingReloads.set(kind, setTimeout(() => {
+        this._pendingReloads.delete(kind);
+        for (const key in this._dataTypes) {
+          const dataType = this._dataTypes[key];
+          const isState = dataType.dtype == "state";
+          if (isState == (kind == "state") && this._updateUrls.has(dataType.id)) {
+            this.updateType(dataType, null, null);
+          }
+        }
+      }, 250));
+    }
+  }
+
   updateType(typeObj, callback, query) {
     const typeId = typeObj.id;
     if (this._updateUrls.has(typeId) == false) {
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
 from datetime import timedelta
 from enum import Enum
+import hashlib
 import json
 import os
 import logging
+import threading
 from typing import IO, List, Optional, Tuple, Union
 from urllib.parse import urlsplit, urlunsplit
 
@@ -15,6 +17,14 @@ from google.oauth2.service_account import Credentials
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of pooled connections of each S3 client. Clients are shared by all threads of
+# a process, so this bounds concurrent requests to a bucket.
+MAX_POOL_CONNECTIONS = int(os.getenv("STORAGE_MAX_POOL_CONNECTIONS", "32"))
+
+# Stores by bucket ID, each with the credentials hash it was created from.
+_store_registry = {}
+_store_registry_lock = threading.Lock()
+
 
 class ObjectStore(Enum):
     AWS = "AmazonS3"
@@ -475,11 +485,66 @@ class GCPStorage(TatorStorage):
         self._update_storage_class(path, desired_storage_class)
 
 
+def _credentials_hash(bucket) -> str:
+    """ Returns a hash of everything used to construct the store of a bucket. """
+    if bucket is None:
+        values = [
+            os.getenv(name)
+            for name in [
+                "OBJECT_STORAGE_HOST",
+                "OBJECT_STORAGE_REGION_NAME",
+                "OBJECT_STORAGE_ACCESS_KEY",
+                "OBJECT_STORAGE_SECRET_KEY",
+                "BUCKET_NAME",
+                "OBJECT_STORAGE_EXTERNAL_HOST",
+            ]
+        ]
+    else:
+        values = [
+            bucket.name,
+            bucket.endpoint_url,
+            bucket.region,
+            bucket.access_key,
+            bucket.secret_key,
+            bucket.gcs_key_info,
+        ]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+
 def get_tator_store(bucket=None) -> TatorStorage:
     """
     Determines the type of object store required by the given bucket and returns it. All returned
     objects are subclasses of the base class TatorStorage.
+
+    Stores are shared by all threads of a process and keyed by bucket ID and a hash of the bucket
+    credentials, so clients, their connection pools and server type detection are reused until the
+    bucket changes.
     """
+    if bucket is not None and bucket.pk is None:
+        return _create_tator_store(bucket)
+
+    bucket_id = None if bucket is None else bucket.pk
+    credentials_hash = _credentials_hash(bucket)
+    with _store_registry_lock:
+        entry = _store_registry.get(bucket_id)
+    if entry is not None and entry[0] == credentials_hash:
+        return entry[1]
+
+    # Stores are created outside of the lock, if two threads race the last one wins.
+    store = _create_tator_store(bucket)
+    with _store_registry_lock:
+        _store_registry[bucket_id] = (credentials_hash, store)
+    return store
+
+
+def invalidate_tator_store(bucket_id) -> None:
+    """ Removes the store of a bucket from the registry of this process. """
+    with _store_registry_lock:
+        _store_registry.pop(bucket_id, None)
+
+
+def _create_tator_store(bucket=None) -> TatorStorage:
+    """ Constructs a new store for the given bucket. """
     if bucket is None:
         endpoint = os.getenv("OBJECT_STORAGE_HOST")
         region = os.getenv("OBJECT_STORAGE_REGION_NAME")
@@ -506,8 +571,14 @@ def get_tator_store(bucket=None) -> TatorStorage:
     endpoint = endpoint.replace(f"{bucket_name}.", "")
 
     if endpoint:
-        config = Config(connect_timeout=5, read_timeout=5, retries={"max_attempts": 5})
-        client = boto3.client(
+        config = Config(
+            connect_timeout=5,
+            read_timeout=5,
+            retries={"max_attempts": 5},
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+        )
+        # Sessions are not thread safe, so each client gets its own.
+        client = boto3.session.Session().client(
             "s3",
             endpoint_url=f"{endpoint}",
             region_name=region,
@@ -517,7 +588,9 @@ def get_tator_store(bucket=None) -> TatorStorage:
         )
     else:
         # Client generator will not have env variables defined
-        client = boto3.client("s3")
+        client = boto3.session.Session().client(
+            "s3", config=Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+        )
 
     # Get the type of object store from bucket metadata
     try:
@@ -543,11 +616,12 @@ def get_storage_lookup(resources):
     buckets = resources.values_list("bucket", flat=True).distinct()
     # This is to avoid a circular import
     Bucket = resources.model._meta.get_field("bucket").related_model
+    bucket_objs = Bucket.objects.in_bulk([bucket for bucket in buckets if bucket])
     bucket_lookup = {
-        bucket: get_tator_store(Bucket.objects.get(pk=bucket)) if bucket else get_tator_store()
+        bucket: get_tator_store(bucket_objs[bucket]) if bucket else get_tator_store()
         for bucket in buckets
     }
     return {
-        resource.path: bucket_lookup[resource.bucket.pk] if resource.bucket else bucket_lookup[None]
-        for resource in list(resources)
+        resource.path: bucket_lookup[resource.bucket_id]
+        for resource in resources.only("path", "bucket")
     }
@@ -1,26 +1,55 @@
 import os
+import io
 import json
+import gzip
 import random
 import datetime
 import logging
 import string
 import functools
 import time
+import struct
 from uuid import uuid1
 from math import sin, cos, sqrt, atan2, radians
 import re
-
+import tempfile
+import threading
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import urlencode
+
+import numpy as np
+from PIL import Image
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.files.base import ContentFile
+from django.core import signing
+from django.db import connection
+from django.db.models import F
 from django.contrib.gis.geos import Point
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework.exceptions import Throttled
 from dateutil.parser import parse as dateutil_parse
 from botocore.errorfactory import ClientError
 
 from .models import *
+from .cache import TatorCache
+from .events import channel_from_ticket
 from .store import get_tator_store
 from .search import TatorSearch, ALLOWED_MUTATIONS
+from .rest._annotation_import import run_import
+from .rest._segment_index import SegmentIndex
+from .rest._media_util import MediaUtil
+from .rest import _media_util
+from .rest._fragment_cache import MAX_RANGE_BYTES, _coalesce, _evict
+from .rest import _render_cache
+from .rest.get_frame import GetFrameAPI
+from .rest.localization_graphics import MAX_GRAPHICS
+from .rest._frame_decoder import encode_tile
+from .rest import annotation_snapshot
+from .rest._render_limits import MAX_RENDERS_PER_USER, RETRY_AFTER
+from .rest import _fmp4
+from .rest._fmp4 import assemble_clip, _Fragment
 
 logger = logging.getLogger(__name__)
 
@@ -266,6 +295,16 @@ def random_datetime(start, end):
         seconds=random.randint(0, int((end - start).total_seconds())),
     )
 
+@contextmanager
+def run_on_commit_hooks():
+    """ Runs commit hooks registered inside the context. Test cases run in a
+        transaction that is never committed, so these hooks would not run otherwise.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    for _, hook in connection.run_on_commit[start:]:
+        hook()
+
 def random_latlon():
     return (random.uniform(-90.0, 90.0), random.uniform(-180.0, 180.0))
 
@@ -591,6 +630,31 @@ class AttributeMediaTestMixin:
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+class FieldsTestMixin:
+    def test_fields(self):
+        pk = self.entities[0].pk
+        response = self.client.patch(f'/rest/{self.detail_uri}/{pk}',
+                                     {'attributes': {'Int Test': 3, 'String Test': 'asdf'}},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            f'/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}'
+            f'&fields=id,attributes.Int Test&format=json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), len(self.entities))
+        for element in response.data:
+            self.assertEqual(set(element.keys()), {'id', 'attributes'})
+            if element['id'] == pk:
+                self.assertEqual(element['attributes'], {'Int Test': 3})
+        response = self.client.get(f'/rest/{self.detail_uri}/{pk}?fields=id&format=json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': pk})
+        response = self.client.get(
+            f'/rest/{self.list_uri}/{self.project.pk}?fields=asdf&format=json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class AttributeTestMixin:
     def test_query_no_attributes(self):
         response = self.client.get(
@@ -1183,6 +1247,7 @@ class VideoTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         PermissionListMembershipTestMixin,
         PermissionDetailMembershipTestMixin,
         PermissionDetailTestMixin):
@@ -1277,6 +1342,7 @@ class ImageTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         PermissionListMembershipTestMixin,
         PermissionDetailMembershipTestMixin,
         PermissionDetailTestMixin):
@@ -1311,6 +1377,7 @@ class LocalizationBoxTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         DefaultCreateTestMixin,
         PermissionCreateTestMixin,
         PermissionListTestMixin,
@@ -1370,10 +1437,234 @@ class LocalizationBoxTestCase(
     def tearDown(self):
         self.project.delete()
 
+    def test_bulk_update_map(self):
+        updates = {
+            str(entity.pk): {'x': 0.1 * idx / len(self.entities),
+                             'width': 0.01,
+                             'attributes': {'Int Test': str(idx)}}
+            for idx, entity in enumerate(self.entities)
+        }
+        response = self.client.patch(f'/rest/{self.list_uri}/{self.project.pk}',
+                                     {'updates': updates}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for idx, entity in enumerate(self.entities):
+            original = entity.attributes or {}
+            entity.refresh_from_db()
+            self.assertAlmostEqual(entity.x, 0.1 * idx / len(self.entities))
+            self.assertAlmostEqual(entity.width, 0.01)
+            # Values are stored as their converted type.
+            self.assertEqual(entity.attributes['Int Test'], idx)
+            for name, value in original.items():
+                if name != 'Int Test':
+                    self.assertEqual(entity.attributes[name], value)
+        self.assertEqual(ChangeLog.objects.filter(project=self.project).count(), 1)
+        # Invalid attribute values are rejected without applying any updates.
+        response = self.client.patch(f'/rest/{self.list_uri}/{self.project.pk}',
+                                     {'updates': {str(self.entities[0].pk): {
+                                         'attributes': {'Int Test': 'asdf'}}}},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ingest(self):
+        num_specs = random.randint(10, 20)
+        specs = [{**self.create_json[0], 'frame': idx, 'Int Test': str(idx)}
+                 for idx in range(num_specs)]
+        response = self.client.post(f'/rest/LocalizationIngest/{self.project.pk}',
+                                    specs, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ids = response.data['id']
+        self.assertEqual(len(ids), num_specs)
+        for idx, id_ in enumerate(ids):
+            loc = Localization.objects.get(pk=id_)
+            self.assertEqual(loc.frame, idx)
+            # Values are stored as their converted type.
+            self.assertEqual(loc.attributes['Int Test'], idx)
+            self.assertEqual(loc.version, self.membership.default_version
+                             or Version.objects.get(project=self.project, number=0))
+        self.assertEqual(ChangeLog.objects.filter(project=self.project).count(), 1)
+        # Out of range values are rejected without creating anything.
+        response = self.client.post(f'/rest/LocalizationIngest/{self.project.pk}',
+                                    [{**self.create_json[0], 'x': 1.5}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Localization.objects.filter(project=self.project).count(),
+                         len(self.entities) + num_specs)
+
+    def test_snapshot(self):
+        self.project.organization = create_test_organization()
+        self.project.save()
+        media = self.media_entities[0]
+        store = get_tator_store()
+        cache = TatorCache()
+        for frame in range(3):
+            create_test_box(self.user, self.entity_type, self.project, media, frame)
+        ids = sorted(Localization.objects.filter(media=media).values_list('id', flat=True))
+        response = self.client.get(f'/rest/AnnotationSnapshot/{media.pk}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.data['etag']
+        key = cache.get_snapshot(media.pk, 'all')['key']
+        snapshot = json.loads(gzip.decompress(store.get_object(key)))
+        self.assertEqual(sorted(loc['id'] for loc in snapshot['localizations']), ids)
+        # Snapshots are reused until they are invalidated.
+        response = self.client.get(f'/rest/AnnotationSnapshot/{media.pk}')
+        self.assertEqual(response.data['etag'], etag)
+        # Deleting through the REST API invalidates the snapshot.
+        with run_on_commit_hooks():
+            response = self.client.delete(f'/rest/Localization/{ids[0]}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/rest/AnnotationSnapshot/{media.pk}')
+        self.assertNotEqual(response.data['etag'], etag)
+        new_key = cache.get_snapshot(media.pk, 'all')['key']
+        self.assertNotEqual(new_key, key)
+        snapshot = json.loads(gzip.decompress(store.get_object(new_key)))
+        self.assertEqual(sorted(loc['id'] for loc in snapshot['localizations']), ids[1:])
+        # The previous snapshot is not overwritten.
+        snapshot = json.loads(gzip.decompress(store.get_object(key)))
+        self.assertEqual(sorted(loc['id'] for loc in snapshot['localizations']), ids)
+        # Replaced snapshots are deleted once their retention has passed.
+        with run_on_commit_hooks():
+            response = self.client.delete(f'/rest/Localization/{ids[1]}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with mock.patch.object(annotation_snapshot, 'SNAPSHOT_RETENTION', 0):
+            response = self.client.get(f'/rest/AnnotationSnapshot/{media.pk}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(store.check_key(new_key))
+        self.assertTrue(store.check_key(key))
+
+    def test_events(self):
+        media = self.media_entities[0]
+        response = self.client.get(f'/rest/AnnotationEvents/{self.project.pk}'
+                                   f'?media_id={media.pk}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(channel_from_ticket(response.data['ticket']),
+                         f'annotations_{self.project.pk}_{media.pk}')
+        self.assertEqual(response.data['user'], self.user.pk)
+        with self.assertRaises(signing.BadSignature):
+            channel_from_ticket(response.data['ticket'] + 'x')
+
+    def test_frame_window(self):
+        media = self.media_entities[0]
+        boxes = [create_test_box(self.user, self.entity_type, self.project, media, frame)
+                 for frame in range(5, 10)]
+        query = f'media_id={media.id}&frame_start=6&frame_stop=9'
+        response = self.client.get(f'/rest/Localizations/{self.project.pk}?{query}',
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([loc['id'] for loc in response.data], [box.id for box in boxes[1:4]])
+        response = self.client.get(f'/rest/LocalizationFeed/{self.project.pk}?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        header_len = int.from_bytes(response.content[:4], 'little')
+        header = json.loads(response.content[4:4 + header_len])
+        self.assertEqual(header['count'], 3)
+        # Records are aligned for typed array views.
+        self.assertEqual((4 + header_len) % 8, 0)
+        self.assertEqual(len(response.content), 4 + header_len + 3 * header['record_size'])
+        first_id = int.from_bytes(response.content[4 + header_len:8 + header_len], 'little')
+        self.assertEqual(first_id, boxes[1].id)
+
+    def test_changes(self):
+        # Rows written by the test transaction share its ID, so move existing changes
+        # to an earlier transaction.
+        qs = Localization.objects.filter(project=self.project)
+        qs.update(change_xid=F('change_xid') - 1)
+        url = f'/rest/LocalizationChanges/{self.project.pk}?limit=2'
+        ids = []
+        watermark = ''
+        more = True
+        while more:
+            response = self.client.get(url + watermark, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [loc['id'] for loc in response.data['localizations']]
+            watermark = '&' + urlencode({'since': response.data['since'],
+                                         'since_id': response.data['since_id']})
+            more = response.data['more']
+        self.assertEqual(sorted(ids), sorted(entity.id for entity in self.entities))
+        # Deletes are reported after the watermark.
+        qs.filter(pk=self.entities[0].pk).update(deleted=True)
+        response = self.client.get(url + watermark, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(loc['id'], loc['deleted']) for loc in response.data['localizations']],
+                         [(self.entities[0].pk, True)])
+        # Watermarks that were not returned by the endpoint are rejected.
+        response = self.client.get(url + '&since=2020-01-01T00:00:00Z', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exclude_parents(self):
+        parent = self.entities[0]
+        create_json = [{**self.create_json[0], 'media_id': parent.media.pk,
+                        'parent': parent.pk}]
+        response = self.client.post(f'/rest/Localizations/{self.project.pk}',
+                                    create_json, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        child_id = response.data['id'][0]
+        self.assertTrue(Localization.objects.get(pk=parent.pk).has_children)
+        url = f'/rest/Localizations/{self.project.pk}?media_id={parent.media.pk}&excludeParents=1'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [loc['id'] for loc in response.data]
+        self.assertIn(child_id, ids)
+        self.assertNotIn(parent.pk, ids)
+        # Pagination is supported.
+        response = self.client.get(url + '&stop=1', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        # Deleting the child restores the parent.
+        response = self.client.delete(f'/rest/Localization/{child_id}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Localization.objects.get(pk=parent.pk).has_children)
+        response = self.client.get(url, format='json')
+        self.assertIn(parent.pk, [loc['id'] for loc in response.data])
+
+    def test_effective_version(self):
+        base = self.project.version_set.all()[0]
+        layer = create_test_version('Layer', 'Patch to baseline', 1, self.project, None)
+        layer.bases.add(base)
+        parent = self.entities[0]
+        clone = create_test_box(self.user, self.entity_type, self.project, parent.media, 0)
+        clone.version = layer
+        clone.parent = parent
+        clone.save()
+        url = (f'/rest/Localizations/{self.project.pk}?media_id={parent.media.pk}'
+               f'&effective_version={layer.pk}')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = [entity.pk for entity in self.entities
+                    if entity.media.pk == parent.media.pk and entity.pk != parent.pk]
+        self.assertEqual(sorted(loc['id'] for loc in response.data),
+                         sorted(expected + [clone.pk]))
+        # Bases do not see annotations of layers built on them.
+        url = (f'/rest/Localizations/{self.project.pk}?media_id={parent.media.pk}'
+               f'&effective_version={base.pk}')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(clone.pk, [loc['id'] for loc in response.data])
+        self.assertIn(parent.pk, [loc['id'] for loc in response.data])
+
+    def test_conditional_get(self):
+        media_id = self.entities[0].media.pk
+        url = f'/rest/Localizations/{self.project.pk}?media_id={media_id}'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Pagination and format are part of the validator.
+        response = self.client.get(url + '&stop=1', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        count_url = f'/rest/LocalizationCount/{self.project.pk}?media_id={media_id}'
+        response = self.client.get(count_url, format='json')
+        count_etag = response['ETag']
+        # Deleting a localization changes the validator.
+        Localization.objects.filter(pk=self.entities[0].pk).update(deleted=True)
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(count_url, format='json', HTTP_IF_NONE_MATCH=count_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 class LocalizationLineTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         DefaultCreateTestMixin,
         PermissionCreateTestMixin,
         PermissionListTestMixin,
@@ -1437,6 +1728,7 @@ class LocalizationDotTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         DefaultCreateTestMixin,
         PermissionCreateTestMixin,
         PermissionListTestMixin,
@@ -1498,6 +1790,7 @@ class StateTestCase(
         APITestCase,
         AttributeTestMixin,
         AttributeMediaTestMixin,
+        FieldsTestMixin,
         DefaultCreateTestMixin,
         PermissionCreateTestMixin,
         PermissionListTestMixin,
@@ -1562,6 +1855,70 @@ class StateTestCase(
     def tearDown(self):
         self.project.delete()
 
+    def test_segments(self):
+        self.assertEqual(compute_segments([5, 1, 2, 2, 3, 7, 8]), [[1, 3], [5, 5], [7, 8]])
+        self.assertEqual(compute_segments([]), [])
+        loc_type = LocalizationType.objects.create(project=self.project,
+                                                   name='loc_type',
+                                                   dtype='box',
+                                                   attribute_types=[])
+        media = self.media_entities[0]
+        state = self.entities[0]
+        # Segments are computed when the transaction commits, which does not happen
+        # inside a test case, so compute them explicitly.
+        for frame in [0, 1, 2, 10, 11]:
+            state.localizations.add(create_test_box(self.user, loc_type, self.project,
+                                                    media, frame))
+        # Localizations without a media are ignored.
+        orphan = create_test_box(self.user, loc_type, self.project, media, 20)
+        Localization.objects.filter(pk=orphan.pk).update(media=None)
+        state.localizations.add(orphan)
+        State.objects.filter(pk=state.pk).update(change_xid=0)
+        update_state_segments([state.id])
+        state.refresh_from_db()
+        self.assertEqual(state.segments, [[0, 2], [10, 11]])
+        self.assertEqual(list(state.media.values_list('id', flat=True)), [media.id])
+        # Segment changes are reported by the changes endpoint.
+        self.assertNotEqual(state.change_xid, 0)
+
+    def test_interpolation(self):
+        loc_type = LocalizationType.objects.create(project=self.project,
+                                                   name='loc_type',
+                                                   dtype='box',
+                                                   attribute_types=[])
+        media = self.media_entities[0]
+        state = self.entities[0]
+        boxes = [create_test_box(self.user, loc_type, self.project, media, frame)
+                 for frame in [0, 4]]
+        state.localizations.add(*boxes)
+        url = f'/rest/StateInterpolation/{self.project.pk}?state_id={state.id}&method=linear'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['frame'], [0, 1, 2, 3, 4])
+        self.assertEqual(response.data['state'], [state.id] * 5)
+        self.assertAlmostEqual(response.data['x'][2], (boxes[0].x + boxes[1].x) / 2)
+        response = self.client.get(url + '&method=none&frame_start=1', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['frame'], [4])
+
+    def test_timeline(self):
+        media = self.media_entities[0]
+        media.num_frames = 100
+        media.save()
+        states = []
+        for frame in [30, 0, 60]:
+            state = self.create_entity(frame=frame)
+            state.media.add(media)
+            states.append(state)
+        response = self.client.get(f'/rest/StateTimeline/{self.project.pk}'
+                                   f'?media_id={media.id}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        intervals = [(row['id'], row['frame'], row['end_frame']) for row in response.data]
+        self.assertEqual(intervals, [(states[1].id, 0, 30),
+                                     (states[0].id, 30, 60),
+                                     (states[2].id, 60, 100)])
+        self.assertEqual(response.data[0]['end_seconds'], 1.0)
+
 class LeafTestCase(
         APITestCase,
         AttributeTestMixin,
@@ -1918,6 +2275,100 @@ class TranscodeTestCase(
     def tearDown(self):
         self.project.delete()
 
+class AnnotationImportTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(self.user)
+        self.organization = create_test_organization()
+        self.project = create_test_project(self.user, self.organization)
+        self.membership = create_test_membership(self.user, self.project)
+        media_entity_type = MediaType.objects.create(
+            name="video",
+            dtype='video',
+            project=self.project,
+        )
+        self.entity_type = LocalizationType.objects.create(
+            name="boxes",
+            dtype='box',
+            project=self.project,
+            attribute_types=create_test_attribute_types(),
+        )
+        self.entity_type.media.add(media_entity_type)
+        self.media = create_test_video(self.user, 'asdf', media_entity_type, self.project)
+        self.store = get_tator_store()
+
+    def tearDown(self):
+        self.project.delete()
+
+    def test_import(self):
+        specs = [{
+            'type': self.entity_type.pk,
+            'media_id': self.media.pk,
+            'frame': idx,
+            'x': 0.1,
+            'y': 0.1,
+            'width': 0.5,
+            'height': 0.5,
+            'Bool Test': True,
+            'Int Test': idx,
+            'Float Test': 0.0,
+            'Enum Test': 'enum_val1',
+            'String Test': 'asdf',
+            'Datetime Test': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'Geoposition Test': [179.0, -89.0],
+        } for idx in range(5)]
+        lines = [json.dumps(spec) for spec in specs] + ['not json']
+        key = f"{self.organization.pk}/{self.project.pk}/upload/{uuid1()}"
+        self.store.put_string(key, gzip.compress('\n'.join(lines).encode()))
+        response = self.client.post(f'/rest/AnnotationImports/{self.project.pk}',
+                                    {'key': key, 'annotation_type': 'localization',
+                                     'batch_size': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        uid = response.data['uid']
+        response = self.client.get(f'/rest/Job/{uid}')
+        self.assertEqual(response.data['status'], 'Pending')
+        run_import(uid)
+        response = self.client.get(f'/rest/Job/{uid}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'Succeeded')
+        self.assertEqual(response.data['processed'], 6)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertEqual(response.data['errors'][0]['line'], 6)
+        self.assertEqual(Localization.objects.filter(project=self.project).count(), 5)
+        # Keys outside of the project upload prefix are rejected.
+        response = self.client.post(f'/rest/AnnotationImports/{self.project.pk}',
+                                    {'key': 'asdf', 'annotation_type': 'localization'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancel(self):
+        spec = {
+            'type': self.entity_type.pk,
+            'media_id': self.media.pk,
+            'frame': 0,
+            'x': 0.1,
+            'y': 0.1,
+            'width': 0.5,
+            'height': 0.5,
+        }
+        key = f"{self.organization.pk}/{self.project.pk}/upload/{uuid1()}"
+        self.store.put_string(key, json.dumps(spec).encode())
+        response = self.client.post(f'/rest/AnnotationImports/{self.project.pk}',
+                                    {'key': key, 'annotation_type': 'localization'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        uid = response.data['uid']
+        response = self.client.delete(f'/rest/Job/{uid}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/rest/Job/{uid}')
+        self.assertEqual(response.data['status'], 'Cancelled')
+        run_import(uid)
+        response = self.client.get(f'/rest/Job/{uid}')
+        self.assertEqual(response.data['status'], 'Cancelled')
+        self.assertFalse(TatorCache().job_cancelled(uid))
+        self.assertEqual(Localization.objects.filter(project=self.project).count(), 0)
+
 class AnalysisCountTestCase(
         APITestCase,
         PermissionCreateTestMixin,
@@ -2251,6 +2702,14 @@ class BucketTestCase(
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.affiliation.save()
 
+    def test_store_registry(self):
+        bucket = self.entities[0]
+        store = get_tator_store(bucket)
+        self.assertIs(get_tator_store(Bucket.objects.get(pk=bucket.pk)), store)
+        bucket.secret_key = 'asdf1'
+        bucket.save()
+        self.assertIsNot(get_tator_store(bucket), store)
+
 class ImageFileTestCase(APITestCase, FileMixin):
     def setUp(self):
         self.user = create_test_user()
@@ -2909,3 +3368,416 @@ class JobClusterTestCase(APITestCase):
     def tearDown(self):
         self.entity.delete()
         self.organization.delete()
+
+class SegmentIndexTestCase(APITestCase):
+    def setUp(self):
+        # Three fragments of ten frames each, with a gap between the second and third.
+        segments = [{'name': 'ftyp', 'offset': 0, 'size': 32},
+                    {'name': 'moov', 'offset': 32, 'size': 100}]
+        offset = 132
+        for frame_start in [10, 20, 40]:
+            segments.append({'name': 'moof', 'offset': offset, 'size': 50,
+                             'frame_start': frame_start, 'frame_samples': 10})
+            segments.append({'name': 'mdat', 'offset': offset + 50, 'size': 1000})
+            offset += 1050
+        self.index = SegmentIndex.from_segment_info({'segments': segments})
+
+    def test_impacted_segments(self):
+        # Frames before the first fragment or after the last are omitted, frames in
+        # the gap only need the header.
+        self.assertEqual(self.index.get_impacted_segments([5, 12, 25, 35, 45, 60]),
+                         [(12, [0, 1, 2, 3]), (25, [0, 1, 4, 5]), (35, [0, 1]),
+                          (45, [0, 1, 6, 7])])
+        self.assertEqual(self.index.get_impacted_segments([]), [])
+
+    def test_decode_runs(self):
+        # Contiguous fragments share a run, the gap starts a new one.
+        self.assertEqual(self.index.get_decode_runs([45, 5, 12, 15, 25, 35, 12]),
+                         [([0, 1, 2, 3, 4, 5], 10, [12, 15, 25]), ([0, 1, 6, 7], 40, [45])])
+        # Runs are split when they would cover more than max_fragments fragments.
+        self.assertEqual(self.index.get_decode_runs([12, 15, 25, 45], max_fragments=1),
+                         [([0, 1, 2, 3], 10, [12, 15]), ([0, 1, 4, 5], 20, [25]),
+                          ([0, 1, 6, 7], 40, [45])])
+        # The binary form round trips.
+        index = SegmentIndex.from_bytes(self.index.to_bytes())
+        self.assertEqual(index.get_decode_runs([12, 25]), [([0, 1, 2, 3, 4, 5], 10, [12, 25])])
+
+class RenderImagesTestCase(APITestCase):
+    def setUp(self):
+        # Two contiguous fragments of ten frames each.
+        segments = [{'name': 'ftyp', 'offset': 0, 'size': 32},
+                    {'name': 'moov', 'offset': 32, 'size': 100}]
+        for idx, frame_start in enumerate([10, 20]):
+            offset = 132 + idx * 1050
+            segments.append({'name': 'moof', 'offset': offset, 'size': 50,
+                             'frame_start': frame_start, 'frame_samples': 10})
+            segments.append({'name': 'mdat', 'offset': offset + 50, 'size': 1000})
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.media_util = MediaUtil.__new__(MediaUtil)
+        self.media_util._segment_index = SegmentIndex.from_segment_info({'segments': segments})
+        self.media_util._storage = None
+        self.media_util._video_file = 'video.mp4'
+        self.media_util._width = 6
+        self.media_util._height = 4
+
+    def _get_fragments(self, storage, path, fragments):
+        paths = {}
+        for offset, size in fragments:
+            paths[(offset, size)] = os.path.join(self.temp_dir, str(offset))
+            with open(paths[(offset, size)], 'wb') as f_p:
+                f_p.write(b'\0' * size)
+        return paths
+
+    @staticmethod
+    def _decode_frames(buf, offsets):
+        # Pixel values identify the offset of a frame from the start of its run.
+        for offset in sorted(set(offsets)):
+            yield offset, np.full((4, 6, 3), offset, dtype=np.uint8)
+
+    def _render(self, frames, **kwargs):
+        with mock.patch.object(_media_util, 'get_fragments', self._get_fragments), \
+             mock.patch.object(_media_util, 'decode_frames', self._decode_frames):
+            return self.media_util._render_images(frames, **kwargs)
+
+    def test_order(self):
+        # Images are returned in request order, including duplicates.
+        images = self._render([25, 12, 25, 15])
+        self.assertEqual([image.getpixel((0, 0))[0] for image in images], [15, 2, 15, 5])
+        # Each image is cropped to its own ROI, then scaled if requested.
+        rois = [(0.5, 0.5, 0.5, 0.5), (1.0, 1.0, 0.0, 0.0)]
+        images = self._render([25, 12], rois=rois)
+        self.assertEqual([image.size for image in images], [(3, 2), (6, 4)])
+        images = self._render([25, 12], rois=rois, force_scale=(2, 2))
+        self.assertEqual([image.size for image in images], [(2, 2), (2, 2)])
+
+    def test_missing_frame(self):
+        # Frames outside of the video are not decoded.
+        with self.assertRaises(ValueError):
+            self._render([12, 35])
+
+class FragmentCacheTestCase(APITestCase):
+    def test_coalesce(self):
+        self.assertEqual(_coalesce([(100, 10), (0, 50), (50, 50), (200, 5)]),
+                         [[(0, 50), (50, 50), (100, 10)], [(200, 5)]])
+        # Contiguous fragments are split when a range would exceed the maximum size.
+        size = MAX_RANGE_BYTES // 2 + 1
+        self.assertEqual(_coalesce([(0, size), (size, size)]), [[(0, size)], [(size, size)]])
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            now = time.time()
+            for name, age in [('a', 1000), ('b', 500), ('c', 0)]:
+                fragment_path = os.path.join(cache_dir, name)
+                with open(fragment_path, 'wb') as f_p:
+                    f_p.write(b'x' * 100)
+                os.utime(fragment_path, (now - age, now - age))
+            # Least recently used files are removed until the cache is below 90%.
+            _evict(cache_dir, max_bytes=250)
+            self.assertEqual(sorted(os.listdir(cache_dir)), ['b', 'c'])
+            # Idle files are removed regardless of size.
+            _evict(cache_dir, max_bytes=250, max_idle=100)
+            self.assertEqual(sorted(os.listdir(cache_dir)), ['c'])
+            # Recently used files are never removed.
+            _evict(cache_dir, max_bytes=50)
+            self.assertEqual(sorted(os.listdir(cache_dir)), ['c'])
+
+class LocalizationGraphicsTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(self.user)
+        self.project = create_test_project(self.user)
+        self.membership = create_test_membership(self.user, self.project)
+        self.url = f'/rest/LocalizationGraphics/{self.project.pk}'
+
+    def _create_box(self, project):
+        media_type = MediaType.objects.create(name="video", dtype='video', project=project)
+        loc_type = LocalizationType.objects.create(project=project, name='loc_type',
+                                                   dtype='box', attribute_types=[])
+        video = create_test_video(self.user, 'asdf', media_type, project)
+        return create_test_box(self.user, loc_type, project, video, 0)
+
+    def test_ids(self):
+        response = self.client.put(self.url, {'ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        ids = list(range(1, MAX_GRAPHICS + 2))
+        response = self.client.put(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Localizations must belong to the project in the URL.
+        other_project = create_test_project(self.user)
+        create_test_membership(self.user, other_project)
+        box = self._create_box(self.project)
+        other_box = self._create_box(other_project)
+        response = self.client.put(self.url, {'ids': [box.id, other_box.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_encode_tile(self):
+        images = [Image.new('RGB', (2, 2), (255, 0, 0)),
+                  Image.new('RGB', (4, 3), (0, 255, 0)),
+                  Image.new('RGB', (3, 1), (0, 0, 255))]
+        # Cells are the size of the largest crop and images are placed at their corners.
+        tile = Image.open(io.BytesIO(encode_tile(images, 2, 2, 'png')))
+        self.assertEqual(tile.size, (8, 6))
+        self.assertEqual(tile.getpixel((0, 0)), (255, 0, 0))
+        self.assertEqual(tile.getpixel((3, 2)), (0, 0, 0))
+        self.assertEqual(tile.getpixel((4, 0)), (0, 255, 0))
+        self.assertEqual(tile.getpixel((0, 3)), (0, 0, 255))
+        self.assertEqual(tile.getpixel((0, 4)), (0, 0, 0))
+        # A single image is returned at its own size.
+        tile = Image.open(io.BytesIO(encode_tile(images[2:], 1, 1, 'png')))
+        self.assertEqual(tile.size, (3, 1))
+
+class RenderCacheTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(self.user)
+        self.project = create_test_project(self.user)
+        self.membership = create_test_membership(self.user, self.project)
+        self.entity_type = MediaType.objects.create(
+            name="video",
+            dtype='video',
+            project=self.project,
+        )
+        self.video = create_test_video(self.user, 'asdf', self.entity_type, self.project)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        patcher = mock.patch.object(_render_cache, 'CACHE_DIR', temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_render_key(self):
+        key = _render_cache.render_key(self.video, params={'frames': [0]}, format='png')
+        self.assertEqual(key, _render_cache.render_key(self.video, params={'frames': [0]},
+                                                       format='png'))
+        self.assertNotEqual(key, _render_cache.render_key(self.video, params={'frames': [1]},
+                                                          format='png'))
+        self.assertNotEqual(key, _render_cache.render_key(self.video, params={'frames': [0]},
+                                                          format='jpg'))
+        # A re-transcode produces new keys.
+        self.video.media_files = {'streaming': [{'path': 'new.mp4'}]}
+        self.assertNotEqual(key, _render_cache.render_key(self.video, params={'frames': [0]},
+                                                          format='png'))
+
+    def test_round_trip(self):
+        key = uuid1().hex
+        self.assertIsNone(_render_cache.get_render(key))
+        # Renders may contain newlines, only the first one separates the format.
+        _render_cache.set_render(key, b'\x89PNG\r\n\x1a\ndata', 'png')
+        self.assertEqual(_render_cache.get_render(key), (b'\x89PNG\r\n\x1a\ndata', 'png'))
+
+    def test_cached_response(self):
+        key = uuid1().hex
+        _render_cache.set_render(key, b'data', 'jpg')
+        url = f'/rest/GetFrame/{self.video.pk}?frames=0'
+        with mock.patch.object(GetFrameAPI, '_get_render_key', return_value=key):
+            # Cached renders are returned in their stored format.
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, b'data')
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            self.assertEqual(response['ETag'], f'"{key}"')
+            self.assertEqual(response['Cache-Control'],
+                             f'private, max-age={_render_cache.CLIENT_MAX_AGE}')
+            # A matching If-None-Match returns 304.
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", "{key}"')
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], f'"{key}"')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class RenderOnceTestCase(APITestCase):
+    def setUp(self):
+        self.cache = TatorCache()
+        self.key = uuid1().hex
+
+    def _fail(self):
+        raise AssertionError("Render should not be computed by this worker!")
+
+    def test_compute(self):
+        result = _render_cache.render_once(self.key, lambda: (b'data', 'png'))
+        self.assertEqual(result, (b'data', 'png'))
+        self.assertEqual(_render_cache.get_render(self.key), (b'data', 'png'))
+        self.assertFalse(self.cache.render_lock_held(self.key))
+
+    def test_waiters(self):
+        # Another worker holds the lock and shares its outcome when it finishes.
+        lock = self.cache.acquire_render_lock(self.key, 10)
+        def _finish():
+            time.sleep(0.2)
+            self.cache.set_render_outcome(self.key, b'ok\npng\ndata')
+            lock.release()
+        thread = threading.Thread(target=_finish)
+        thread.start()
+        result = _render_cache.render_once(self.key, self._fail)
+        thread.join()
+        self.assertEqual(result, (b'data', 'png'))
+
+    def test_failure(self):
+        def _compute():
+            raise Exception("boom")
+        with self.assertRaisesRegex(Exception, 'boom'):
+            _render_cache.render_once(self.key, _compute)
+        self.assertFalse(self.cache.render_lock_held(self.key))
+        # Waiting workers raise the same error instead of computing.
+        lock = self.cache.acquire_render_lock(self.key, 10)
+        try:
+            with self.assertRaisesRegex(Exception, 'boom'):
+                _render_cache.render_once(self.key, self._fail)
+        finally:
+            lock.release()
+
+    def test_timeout(self):
+        lock = self.cache.acquire_render_lock(self.key, 10)
+        try:
+            with mock.patch.object(_render_cache, 'RENDER_WAIT_TIMEOUT', 0.2):
+                with self.assertRaisesRegex(Exception, 'Timed out'):
+                    _render_cache.render_once(self.key, self._fail)
+        finally:
+            lock.release()
+
+    def test_extend(self):
+        # The lock is extended while a render takes longer than the lock timeout.
+        def _compute():
+            time.sleep(1.5)
+            self.assertTrue(self.cache.render_lock_held(self.key))
+            return b'data', 'png'
+        with mock.patch.object(_render_cache, 'RENDER_LOCK_TIMEOUT', 1), \
+             mock.patch.object(_render_cache, 'RENDER_LOCK_EXTEND_INTERVAL', 0.2):
+            result = _render_cache.render_once(self.key, _compute)
+        self.assertEqual(result, (b'data', 'png'))
+        self.assertFalse(self.cache.render_lock_held(self.key))
+
+    def test_throttled(self):
+        # Throttled computations are not shared, so that a waiter can take over.
+        def _compute():
+            raise Throttled(wait=2)
+        with self.assertRaises(Throttled):
+            _render_cache.render_once(self.key, _compute)
+        self.assertIsNone(self.cache.get_render_outcome(self.key))
+        result = _render_cache.render_once(self.key, lambda: (b'data', 'png'))
+        self.assertEqual(result, (b'data', 'png'))
+
+class RenderSlotTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(self.user)
+        self.project = create_test_project(self.user)
+        self.membership = create_test_membership(self.user, self.project)
+        self.entity_type = MediaType.objects.create(
+            name="video",
+            dtype='video',
+            project=self.project,
+        )
+        self.video = create_test_video(self.user, 'asdf', self.entity_type, self.project)
+        self.cache = TatorCache()
+
+    def test_acquire(self):
+        pools = [uuid1().hex, uuid1().hex]
+        limits = {pools[0]: 2, pools[1]: 1}
+        self.assertTrue(self.cache.acquire_render_slot('first', limits, 600))
+        # The second pool is full, so no slot is taken in the first pool either.
+        self.assertFalse(self.cache.acquire_render_slot('second', limits, 600))
+        self.assertEqual(self.cache.rds.zcard(f'render_slots_{pools[0]}'), 1)
+        self.cache.release_render_slot('first', pools)
+        self.assertTrue(self.cache.acquire_render_slot('second', limits, 600))
+        self.cache.release_render_slot('second', pools)
+        # Slots held past the timeout are discarded.
+        self.assertTrue(self.cache.acquire_render_slot('leaked', limits, 1))
+        time.sleep(1.1)
+        self.assertTrue(self.cache.acquire_render_slot('third', limits, 1))
+        self.assertEqual(self.cache.rds.zcard(f'render_slots_{pools[1]}'), 1)
+        self.cache.release_render_slot('third', pools)
+
+    def test_throttled(self):
+        tokens = [uuid1().hex for _ in range(MAX_RENDERS_PER_USER)]
+        limits = {f'user_{self.user.id}': MAX_RENDERS_PER_USER}
+        for token in tokens:
+            self.assertTrue(self.cache.acquire_render_slot(token, limits, 600))
+        try:
+            response = self.client.get(f'/rest/GetFrame/{self.video.pk}?frames=0')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response['Retry-After'], str(RETRY_AFTER))
+        finally:
+            for token in tokens:
+                self.cache.release_render_slot(token, limits.keys())
+
+def _box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def _full_box(box_type, flags, payload, version=0):
+    return _box(box_type, struct.pack('>I', (version << 24) | flags) + payload)
+
+class Fmp4TestCase(APITestCase):
+    def setUp(self):
+        # Movie timescale 1000, media timescale 30000 and a trex default sample
+        # duration of 1001.
+        mvhd = _full_box(b'mvhd', 0, struct.pack('>IIII', 0, 0, 1000, 0) + b'\0' * 80)
+        tkhd = _full_box(b'tkhd', 0, struct.pack('>III', 0, 0, 1) + b'\0' * 68)
+        mdhd = _full_box(b'mdhd', 0, struct.pack('>IIII', 0, 0, 30000, 0) + b'\0' * 4)
+        mvex = _box(b'mvex', _full_box(b'mehd', 0, struct.pack('>I', 0))
+                    + _full_box(b'trex', 0, struct.pack('>IIIII', 1, 1, 1001, 0, 0)))
+        moov = _box(b'moov', mvhd + _box(b'trak', tkhd + _box(b'mdia', mdhd)) + mvex)
+        self.header = [_box(b'ftyp', b'isom\0\0\0\0'), moov]
+
+    def _moof(self, decode_time, tfhd_duration=None, sample_durations=None, samples=30):
+        tfhd_flags = 0x020000
+        tfhd_payload = struct.pack('>I', 1)
+        if tfhd_duration is not None:
+            tfhd_flags |= 0x000008
+            tfhd_payload += struct.pack('>I', tfhd_duration)
+        if sample_durations is None:
+            trun = _full_box(b'trun', 0x000001, struct.pack('>Ii', samples, 0))
+        else:
+            trun = _full_box(b'trun', 0x000301, struct.pack('>Ii', len(sample_durations), 0)
+                             + b''.join(struct.pack('>II', duration, 10)
+                                        for duration in sample_durations))
+        traf = _box(b'traf', _full_box(b'tfhd', tfhd_flags, tfhd_payload)
+                    + _full_box(b'tfdt', 0, struct.pack('>Q', decode_time), version=1)
+                    + trun)
+        return _box(b'moof', _full_box(b'mfhd', 0, struct.pack('>I', 99)) + traf)
+
+    def test_fragment_rewrite(self):
+        moof = self._moof(90090, sample_durations=[1001, 2002])
+        fragment = _Fragment(moof, {1: 1001})
+        self.assertEqual(fragment.tracks[1][2:], (90090, 3003))
+        rewritten = _Fragment(fragment.rewrite(7, {1: -90090}), {1: 1001})
+        self.assertEqual(rewritten.tracks[1][2:], (0, 3003))
+        mfhd = _fmp4._find(rewritten.data, [b'moof', b'mfhd'])[0][0]
+        self.assertEqual(struct.unpack_from('>I', rewritten.data, mfhd + 4)[0], 7)
+        self.assertEqual(len(rewritten.data), len(moof))
+
+    def test_assemble_clip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def _write(name, data):
+                path = os.path.join(temp_dir, name)
+                with open(path, 'wb') as f_p:
+                    f_p.write(data)
+                return path
+            header_paths = [_write(f'header{idx}', data) for idx, data in enumerate(self.header)]
+            mdat = _write('mdat', _box(b'mdat', b'x' * 10))
+            # Durations come from trex defaults, tfhd defaults and per sample trun
+            # durations respectively.
+            first = _write('first', self._moof(90090))
+            second = _write('second', self._moof(300300, tfhd_duration=2002, samples=3))
+            third = _write('third', self._moof(306306, sample_durations=[1001, 1001]))
+            out = io.BytesIO()
+            assemble_clip(out, header_paths, [[first, mdat], [second, mdat, third, mdat]])
+            data = out.getvalue()
+            fragments = [_Fragment(data[start:end], {1: 1001})
+                         for box_type, start, _, end in _fmp4._boxes(data)
+                         if box_type == b'moof']
+            sequence_numbers = [
+                struct.unpack_from('>I', fragment.data,
+                                   _fmp4._find(fragment.data, [b'moof', b'mfhd'])[0][0] + 4)[0]
+                for fragment in fragments]
+            self.assertEqual(sequence_numbers, [1, 2, 3])
+            self.assertEqual([fragment.tracks[1][2:] for fragment in fragments],
+                             [(0, 30030), (30030, 6006), (36036, 2002)])
+            # The fragment duration is converted to the movie timescale.
+            mehd = _fmp4._find(data, [b'moov', b'mvex', b'mehd'])[0][0]
+            self.assertEqual(struct.unpack_from('>I', data, mehd + 4)[0],
+                             38038 * 1000 // 30000)
+            # Ranges must start with a moof box.
+            with self.assertRaises(ValueError):
+                assemble_clip(io.BytesIO(), header_paths, [[mdat, first]])
@@ -121,6 +121,18 @@ urlpatterns += [
         'rest/Analysis/<int:id>',
         AnalysisDetailAPI.as_view(),
     ),
+    path(
+        'rest/AnnotationEvents/<int:project>',
+        AnnotationEventsAPI.as_view(),
+    ),
+    path(
+        'rest/AnnotationImports/<int:project>',
+        AnnotationImportAPI.as_view(),
+    ),
+    path(
+        'rest/AnnotationSnapshot/<int:id>',
+        AnnotationSnapshotAPI.as_view(),
+    ),
     path(
         'rest/Announcements',
         AnnouncementListAPI.as_view(),
@@ -252,6 +264,18 @@ urlpatterns += [
         'rest/LocalizationCount/<int:project>',
         LocalizationCountAPI.as_view(),
     ),
+    path(
+        'rest/LocalizationIngest/<int:project>',
+        LocalizationIngestAPI.as_view(),
+    ),
+    path(
+        'rest/LocalizationChanges/<int:project>',
+        LocalizationChangesAPI.as_view(),
+    ),
+    path(
+        'rest/LocalizationFeed/<int:project>',
+        LocalizationFeedAPI.as_view(),
+    ),
     path(
         'rest/LocalizationTypes/<int:project>',
         LocalizationTypeListAPI.as_view(),
@@ -264,6 +288,11 @@ urlpatterns += [
          LocalizationGraphicAPI.as_view(),
          name='LocalizationGraphic',
          ),
+    path(
+        'rest/LocalizationGraphics/<int:project>',
+        LocalizationGraphicsAPI.as_view(),
+        name='LocalizationGraphics'
+    ),
     path(
         'rest/Medias/<int:project>',
         MediaListAPI.as_view(),
@@ -380,6 +409,18 @@ urlpatterns += [
         'rest/TrimStateEnd/<int:id>',
         TrimStateEndAPI.as_view(),
     ),
+    path(
+        'rest/StateInterpolation/<int:project>',
+        StateInterpolationAPI.as_view(),
+    ),
+    path(
+        'rest/StateTimeline/<int:project>',
+        StateTimelineAPI.as_view(),
+    ),
+    path(
+        'rest/StateChanges/<int:project>',
+        StateChangesAPI.as_view(),
+    ),
     path(
         'rest/StateTypes/<int:project>',
         StateTypeListAPI.as_view(),